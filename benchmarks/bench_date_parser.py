@@ -0,0 +1,59 @@
+"""
+Micro-benchmark: partition date parsing throughput (names per second).
+
+Compares per-file utils.extract_actual_date with the batch utils.parse_partition_dates.
+
+    python benchmarks/bench_date_parser.py [--days 30] [--files-per-day 20000]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+from utils import extract_actual_date, parse_partition_dates
+
+def make_names(days, files_per_day, unparseable_ratio):
+    start = date(2025, 1, 1)
+    names = []
+    for d in range(days):
+        day = start + timedelta(days=d)
+        base = f"impressions-v4-parquet/year={day.year}/month={day.month:02d}/day={day.day:02d}/"
+        names.extend(f"{base}part-{i:05d}.snappy.parquet" for i in range(files_per_day))
+    bad_every = int(1 / unparseable_ratio) if unparseable_ratio else 0
+    if bad_every:
+        for i in range(0, len(names), bad_every):
+            names[i] = f"impressions-v4-parquet/_tmp/part-{i}.parquet"
+    return names
+
+def bench(label, func, names):
+    start = time.perf_counter()
+    func(names)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(names) / elapsed:>14,.0f} names/s  ({elapsed:.3f}s)")
+    return elapsed
+
+def per_file(names):
+    # Per-file prints go to a buffer so terminal speed does not dominate the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [extract_actual_date(name) for name in names]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--files-per-day", type=int, default=20_000)
+    parser.add_argument("--unparseable-ratio", type=float, default=0.01)
+    args = parser.parse_args()
+
+    names = make_names(args.days, args.files_per_day, args.unparseable_ratio)
+    print(f"{len(names):,} names, {args.unparseable_ratio:.1%} unparseable")
+    before = bench("extract_actual_date (before)", per_file, names)
+    after = bench("parse_partition_dates (after)", parse_partition_dates, names)
+    print(f"speedup: {before / after:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Import-time benchmark for the DAG files and pipeline modules.
+
+Each target is imported in a fresh interpreter with `python -X importtime`; the table
+shows the wall time, the cumulative import time reported by CPython and which heavy
+stacks (google-cloud, pandas, NumPy, pyarrow) were loaded. Parsing a DAG file must load
+none of them. DAG files are only measured when Airflow is installed.
+
+    python benchmarks/bench_import_time.py
+"""
+import importlib.util
+import os
+import re
+import subprocess
+import sys
+import time
+
+from tabulate import tabulate
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src'))
+DAG_DIR = os.path.dirname(SRC_DIR)
+
+HEAVY_MODULES = ("google.cloud.bigquery", "google.cloud.storage", "google.cloud.pubsub_v1", "pandas", "numpy", "pyarrow")
+
+def measure(code, setup=""):
+    script = f"import sys\nsys.path.insert(0, {SRC_DIR!r})\n{setup}\n{code}\nprint(','.join(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", script], capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+
+    # Top-level entries of -X importtime: "import time: self | cumulative | name"
+    cumulative_us = sum(
+        int(match.group(1)) for match in re.finditer(r"^import time:\s+\d+ \|\s+(\d+) \| (\S.*)$", output.stderr, re.M)
+    )
+    heavy = output.stdout.strip().splitlines()[-1:] or [""]
+    return wall, cumulative_us / 1e6, heavy[0] or "-"
+
+def main():
+    targets = [("config", "import config", "")]
+    if importlib.util.find_spec("airflow"):
+        for dag_file in ("dag_gcs_monitoring.py", "dag_feed_events.py"):
+            path = os.path.join(DAG_DIR, dag_file)
+            targets.append((dag_file, f"exec(compile(open({path!r}).read(), {path!r}, 'exec'), {{'__name__': 'dag'}})",
+                            "import airflow.decorators, airflow.models"))
+    else:
+        print("Airflow is not installed, DAG files are skipped.")
+    targets.append(("main (task runtime)", "import main", ""))
+
+    rows = []
+    for name, code, setup in targets:
+        wall, cumulative, heavy = measure(code, setup)
+        rows.append([name, f"{wall:.3f}", f"{cumulative:.3f}", heavy])
+    print(tabulate(rows, headers=["Target", "Wall (s)", "Import time (s)", "Heavy stacks loaded"], tablefmt="github"))
+
+if __name__ == "__main__":
+    main()
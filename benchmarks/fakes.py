@@ -0,0 +1,291 @@
+"""
+In-process stand-ins for the GCS and BigQuery clients used by the benchmarks.
+
+Buckets are synthetic: object names, sizes and timestamps are generated on the fly from
+the requested prefix, so a bucket with tens of millions of 'year=/month=/day=' parquet
+objects costs no memory until something materializes the listing. Every API call can be
+given a fixed latency and is counted.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from datetime import date, datetime, timedelta, timezone
+
+PAGE_SIZE = 1000
+
+class CallCounter:
+    """
+    Thread-safe API call counters.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = Counter()
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counts[name] += value
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+
+class FakeBlob:
+    __slots__ = ("name", "size", "updated", "generation", "md5_hash", "crc32c")
+
+    def __init__(self, name, size, updated, generation, crc32c=None):
+        self.name = name
+        self.size = size
+        self.updated = updated
+        self.generation = generation
+        self.md5_hash = None
+        self.crc32c = crc32c
+
+class SyntheticBucket:
+    """
+    A bucket holding `files_per_day` parquet objects per day partition under `prefix`.
+
+    Args:
+        prefix (str): The feed prefix.
+        start_date (date): First day partition.
+        end_date (date): Last day partition.
+        files_per_day (int): Objects per day partition.
+        file_size (int): Base object size in bytes (sizes vary deterministically around it).
+    """
+
+    def __init__(self, prefix, start_date, end_date, files_per_day, file_size=50_000_000):
+        self.prefix = prefix.rstrip("/") + "/"
+        self.start_date = start_date
+        self.end_date = end_date
+        self.files_per_day = files_per_day
+        self.file_size = file_size
+
+    @property
+    def object_count(self):
+        return ((self.end_date - self.start_date).days + 1) * self.files_per_day
+
+    def _day_prefix(self, day):
+        return f"{self.prefix}year={day.year:04d}/month={day.month:02d}/day={day.day:02d}/"
+
+    def _days_for(self, prefix):
+        """
+        Day partitions whose objects can match the prefix, in lexicographic order.
+        """
+        match = re.search(r"year=(\d{4})/month=(\d{2})/day=(\d{2})/?$", prefix)
+        if match:
+            day = date(*map(int, match.groups()))
+            if self.start_date <= day <= self.end_date:
+                return [day]
+            return []
+
+        days = []
+        day = self.start_date
+        while day <= self.end_date:
+            if self._day_prefix(day).startswith(prefix) or prefix.startswith(self._day_prefix(day)):
+                days.append(day)
+            day += timedelta(days=1)
+        return days
+
+    def iter_objects(self, prefix):
+        for day in self._days_for(prefix or ""):
+            day_prefix = self._day_prefix(day)
+            updated = datetime(day.year, day.month, day.day, 6, tzinfo=timezone.utc)
+            width = len(str(self.files_per_day))
+            partial = not day_prefix.startswith(prefix or "")
+            for i in range(self.files_per_day):
+                name = f"{day_prefix}part-{i:0{width}d}.snappy.parquet"
+                if partial and not name.startswith(prefix):
+                    continue
+                size = self.file_size + (i * 7919) % (self.file_size // 10 or 1)
+                # Every object has distinct content
+                yield FakeBlob(name, size, updated, 1_700_000_000_000_000 + i, f"{day.toordinal()}-{i}")
+
+class FakeStorageClient:
+    """
+    Minimal google.cloud.storage.Client stand-in supporting list_blobs.
+
+    Args:
+        buckets (dict): Bucket name -> SyntheticBucket.
+        page_latency (float): Seconds slept per page of results (one Class A request each).
+        counter (CallCounter): Counter shared with the caller.
+    """
+
+    def __init__(self, buckets, page_latency=0.0, counter=None):
+        self.buckets = buckets
+        self.page_latency = page_latency
+        self.counter = counter or CallCounter()
+
+    def list_blobs(self, bucket_or_name, prefix=None, fields=None, page_size=None, **kwargs):
+        bucket = self.buckets[bucket_or_name]
+        self.counter.add("gcs.list_blobs")
+        return self._paginate(bucket.iter_objects(prefix), page_size or PAGE_SIZE)
+
+    def _paginate(self, objects, page_size):
+        page = []
+        for blob in objects:
+            page.append(blob)
+            if len(page) == page_size:
+                yield from self._page(page)
+                page = []
+        # Every listing costs at least one request, even when empty
+        yield from self._page(page)
+
+    def _page(self, page):
+        self.counter.add("gcs.pages")
+        self.counter.add("gcs.objects", len(page))
+        if self.page_latency:
+            time.sleep(self.page_latency)
+        return page
+
+class FakeRow(dict):
+    """
+    Query result row supporting both row["name"] and row[index] access.
+    """
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return list(self.values())[key]
+        return super().__getitem__(key)
+
+class FakeJob:
+    def __init__(self, rows):
+        self._rows = rows
+        self.total_bytes_processed = 0
+        self.slot_millis = 0
+
+    def result(self):
+        return iter(self._rows)
+
+class FakeBigQueryClient:
+    """
+    Minimal google.cloud.bigquery.Client stand-in backed by an in-memory metrics table.
+
+    It understands the statements issued by bq_client: MERGE of @rows, the single-feed
+    baseline AVG, the batched baseline over @baseline_requests and the daily
+    metrics read of a date range.
+
+    Args:
+        job_latency (float): Seconds slept per query job.
+        metadata_latency (float): Seconds slept per get_dataset/get_table call.
+        counter (CallCounter): Counter shared with the caller.
+    """
+
+    def __init__(self, job_latency=0.0, metadata_latency=0.0, counter=None):
+        self.job_latency = job_latency
+        self.metadata_latency = metadata_latency
+        self.counter = counter or CallCounter()
+        self.table = {}
+        self.table_metadata = SimpleNamespace(schema=[], time_partitioning=SimpleNamespace(field="date"))
+        self.staged = {}
+        self._lock = threading.Lock()
+
+    def get_dataset(self, dataset_ref):
+        self.counter.add("bq.metadata_calls")
+        time.sleep(self.metadata_latency)
+
+    def get_table(self, table_ref):
+        self.counter.add("bq.metadata_calls")
+        time.sleep(self.metadata_latency)
+        return self.table_metadata
+
+    def update_table(self, table, fields):
+        self.counter.add("bq.metadata_calls")
+        self.table_metadata = table
+        return table
+
+    def create_table(self, table):
+        return table
+
+    def load_table_from_json(self, rows, destination, job_config=None):
+        self.counter.add("bq.load_jobs")
+        if self.job_latency:
+            time.sleep(self.job_latency)
+        with self._lock:
+            self.staged[str(destination)] = list(rows)
+        return FakeJob([])
+
+    def delete_table(self, table, not_found_ok=False):
+        with self._lock:
+            self.staged.pop(str(table), None)
+
+    def insert_rows_json(self, table, rows):
+        self.counter.add("bq.streaming_inserts")
+        self.counter.add("bq.rows_inserted", len(rows))
+        return []
+
+    def query(self, query, job_config=None):
+        self.counter.add("bq.jobs")
+        if self.job_latency:
+            time.sleep(self.job_latency)
+
+        params = {p.name: p for p in (job_config.query_parameters if job_config else [])}
+        if query.lstrip().startswith("MERGE"):
+            if "rows" in params:
+                return FakeJob(self._merge([value.struct_values for value in params["rows"].values]))
+            staging = re.search(r"FROM `([^`]+_staging_[^`]+)`", query).group(1)
+            return FakeJob(self._merge(self.staged.get(staging, [])))
+        if "baseline_requests" in params:
+            return FakeJob(self._baselines(params["baseline_requests"].values))
+        if "feed_labels" in params:
+            return FakeJob(self._daily_metrics(params))
+        return FakeJob(self._baseline(params))
+
+    def _merge(self, rows):
+        with self._lock:
+            for row in rows:
+                self.table[(_as_date(row["date"]), row["datafeed"])] = (row["filecount"], row["filesize"])
+        self.counter.add("bq.rows_merged", len(rows))
+        return []
+
+    def _daily_metrics(self, params):
+        start_date, end_date = _as_date(params["start_date"].value), _as_date(params["end_date"].value)
+        labels = set(params["feed_labels"].values)
+        with self._lock:
+            return [FakeRow(date=d, datafeed=feed, filecount=v[0], filesize=v[1])
+                    for (d, feed), v in sorted(self.table.items())
+                    if start_date <= d <= end_date and (not labels or feed in labels)]
+
+    def _average(self, feed_label, start_date, end_date):
+        with self._lock:
+            values = [v for (d, feed), v in self.table.items() if feed == feed_label and start_date <= d <= end_date]
+        if not values:
+            return None
+        return (sum(v[0] for v in values) / len(values), sum(v[1] for v in values) / len(values))
+
+    def _baseline(self, params):
+        average = self._average(
+            params["feed_label"].value,
+            _as_date(params["start_date"].value),
+            _as_date(params["end_date"].value),
+        )
+        return [FakeRow(avg_count=average[0] if average else None, avg_size=average[1] if average else None)]
+
+    def _baselines(self, values):
+        rows = []
+        for value in values:
+            request = value.struct_values
+            average = self._average(request["datafeed"], _as_date(request["start_date"]), _as_date(request["end_date"]))
+            if average:
+                rows.append(FakeRow(datafeed=request["datafeed"], expected_date=_as_date(request["expected_date"]),
+                                    avg_count=average[0], avg_size=average[1]))
+        return rows
+
+    def seed_history(self, feed_labels, start_date, end_date, file_count, file_size_mb):
+        """
+        Fill the metrics table with constant history for the given feeds.
+        """
+        with self._lock:
+            day = start_date
+            while day <= end_date:
+                for feed_label in feed_labels:
+                    self.table[(day, feed_label)] = (file_count, file_size_mb)
+                day += timedelta(days=1)
+
+def _as_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(value)
@@ -0,0 +1,204 @@
+"""
+Offline benchmark suite for the monitoring pipeline.
+
+Runs list_gcs_metadata, the columnar catalog, the streaming aggregation, the BigQuery upserts and backfill load, analyze_feed and
+main.run against in-process fake GCS/BigQuery clients (benchmarks/fakes.py) with injected
+per-call latency, and main.run against a SQLite metrics store holding years of history. Each stage runs in its own forked process and reports wall time, peak
+RSS and API-call counts. No network or GCP credentials are needed.
+
+    python benchmarks/run_benchmarks.py --files-per-day 10000 --history-days 365
+    python benchmarks/run_benchmarks.py --stages list_window aggregate_window --files-per-day 100000
+"""
+import argparse
+import contextlib
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+from fakes import CallCounter, FakeBigQueryClient, FakeStorageClient, SyntheticBucket
+
+import bq_client
+import clients
+import main
+import metrics_store
+from aggregator import aggregate_daily_metrics
+from analyzer import analyze_feed
+from config import FEEDS
+from gcs_client import iter_gcs_metadata, list_gcs_catalog, list_gcs_metadata
+from tabulate import tabulate
+
+def install_fakes(args, counter):
+    """
+    Build the synthetic buckets and fake clients for a stage and wire them into the pipeline.
+    """
+    today = date.today()
+    history_start = today - timedelta(days=args.history_days - 1)
+    buckets = {
+        feed["bucket"]: SyntheticBucket(feed["prefix"], history_start, today, args.files_per_day)
+        for feed in FEEDS.values()
+    }
+
+    fake_storage = FakeStorageClient(buckets, page_latency=args.page_latency, counter=counter)
+    fake_bigquery = FakeBigQueryClient(job_latency=args.job_latency, metadata_latency=args.metadata_latency,
+                                       counter=counter)
+    fake_bigquery.seed_history([feed["label"] for feed in FEEDS.values()], today - timedelta(days=60), today,
+                               args.files_per_day, args.files_per_day * 50.0)
+
+    clients.set_clients(bigquery_client=fake_bigquery, storage_client=fake_storage)
+    bq_client._verified_table_ref = None
+    return fake_storage, fake_bigquery
+
+def run_window():
+    actual_date = date.today() - timedelta(days=6)
+    return date.today() - timedelta(days=13), actual_date
+
+def first_feed():
+    return next(iter(FEEDS.values()))
+
+def stage_list_full(args):
+    feed = first_feed()
+    return len(list_gcs_metadata(feed["bucket"], feed["prefix"]))
+
+def stage_catalog_full(args):
+    feed = first_feed()
+    catalog = list_gcs_catalog(feed["bucket"], feed["prefix"])
+    catalog.group_by_date()
+    return len(catalog)
+
+def stage_list_window(args):
+    feed = first_feed()
+    start, end = run_window()
+    return len(list_gcs_metadata(feed["bucket"], feed["prefix"], start_date=start, end_date=end))
+
+def stage_aggregate_window(args):
+    feed = first_feed()
+    start, end = run_window()
+    return len(aggregate_daily_metrics(iter_gcs_metadata(feed["bucket"], feed["prefix"], start_date=start, end_date=end)))
+
+def metric_rows():
+    start, end = run_window()
+    rows = []
+    for feed in FEEDS.values():
+        day = start
+        while day <= end:
+            rows.append({"feed_label": feed["label"], "event_date": day, "file_count": 10, "file_size": 100.0})
+            day += timedelta(days=1)
+    return rows
+
+def stage_upsert_per_day(args):
+    rows = metric_rows()
+    for row in rows:
+        bq_client.upsert_feed_metrics(row["feed_label"], row["event_date"], row["file_count"], row["file_size"])
+    return len(rows)
+
+def stage_upsert_bulk(args):
+    rows = metric_rows()
+    bq_client.upsert_feed_metrics_bulk(rows)
+    return len(rows)
+
+def stage_analyze_per_feed(args):
+    _, actual_date = run_window()
+    daily_metrics = {actual_date: {"file_count": 10, "total_bytes": 10**9, "min_size": 1, "max_size": 1}}
+    return len([analyze_feed(feed["label"], daily_metrics, actual_date) for feed in FEEDS.values()])
+
+def stage_analyze_batched(args):
+    _, actual_date = run_window()
+    daily_metrics = {actual_date: {"file_count": 10, "total_bytes": 10**9, "min_size": 1, "max_size": 1}}
+    baselines = bq_client.query_historical_baselines([(feed["label"], actual_date) for feed in FEEDS.values()])
+    return len([analyze_feed(feed["label"], daily_metrics, actual_date, baseline=baselines[(feed["label"], actual_date)])
+                for feed in FEEDS.values()])
+
+def stage_backfill(args):
+    import backfill
+    end = date.today() - timedelta(days=1)
+    start = end - timedelta(days=args.history_days - 2)
+    backfill.backfill_feed_metrics(start, end)
+    return len(FEEDS) * (args.history_days - 1)
+
+def stage_main_run(args):
+    main.STATE_DIR = tempfile.mkdtemp(prefix="gcs-monitoring-bench-")
+    main.run(slack_webhook="")
+    return len(FEEDS)
+
+def stage_main_run_sqlite(args):
+    # Ten years of daily history per feed in a local store (seeding takes a few ms)
+    store = metrics_store.SQLiteMetricsStore(":memory:")
+    today = date.today()
+    store.upsert_feed_metrics_bulk([
+        {"feed_label": feed["label"], "event_date": today - timedelta(days=i), "file_count": args.files_per_day,
+         "file_size": args.files_per_day * 50.0}
+        for feed in FEEDS.values() for i in range(1, 3650)
+    ])
+    metrics_store.set_metrics_store(store)
+    main.STATE_DIR = tempfile.mkdtemp(prefix="gcs-monitoring-bench-")
+    main.run(slack_webhook="")
+    return len(FEEDS)
+
+STAGES = {
+    "list_full_prefix": stage_list_full,
+    "catalog_full_prefix": stage_catalog_full,
+    "list_window": stage_list_window,
+    "aggregate_window": stage_aggregate_window,
+    "upsert_per_day": stage_upsert_per_day,
+    "upsert_bulk": stage_upsert_bulk,
+    "analyze_per_feed": stage_analyze_per_feed,
+    "analyze_batched": stage_analyze_batched,
+    "main_run": stage_main_run,
+    "main_run_sqlite": stage_main_run_sqlite,
+    "backfill_history": stage_backfill,
+}
+
+def run_stage(name, args, connection):
+    counter = CallCounter()
+    install_fakes(args, counter)
+
+    # Pipeline logging is not part of the measurement
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        items = STAGES[name](args)
+        elapsed = time.perf_counter() - start
+
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    connection.send({"stage": name, "items": items, "wall_s": elapsed, "peak_rss_mb": peak_rss_mb,
+                     "calls": counter.snapshot()})
+    connection.close()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--history-days", type=int, default=365, help="Day partitions per synthetic bucket")
+    parser.add_argument("--files-per-day", type=int, default=1000, help="Objects per day partition")
+    parser.add_argument("--page-latency", type=float, default=0.02, help="Seconds per GCS list page")
+    parser.add_argument("--job-latency", type=float, default=0.5, help="Seconds per BigQuery job")
+    parser.add_argument("--metadata-latency", type=float, default=0.1, help="Seconds per BigQuery metadata call")
+    args = parser.parse_args()
+
+    print(f"Synthetic buckets: {len(FEEDS)} x {args.history_days} days x {args.files_per_day:,} objects/day "
+          f"({args.history_days * args.files_per_day:,} objects per bucket)")
+
+    context = multiprocessing.get_context("fork")
+    results = []
+    for name in args.stages:
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=run_stage, args=(name, args, sender))
+        process.start()
+        sender.close()
+        results.append(receiver.recv())
+        process.join()
+
+    table = [
+        [r["stage"], r["items"], f"{r['wall_s']:.3f}", f"{r['peak_rss_mb']:.0f}",
+         ", ".join(f"{k}={v}" for k, v in sorted(r["calls"].items()))]
+        for r in results
+    ]
+    print(tabulate(table, headers=["Stage", "Items", "Wall (s)", "Peak RSS (MB)", "API calls"], tablefmt="github"))
+
+if __name__ == "__main__":
+    main_cli()
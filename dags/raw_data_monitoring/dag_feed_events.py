@@ -0,0 +1,33 @@
+from airflow.decorators import dag, task
+from datetime import datetime, timedelta
+import sys
+import pytz
+
+# Directory path src to import the consumer
+sys.path.append("/home/airflow/gcs/dags/raw_data_monitoring/src")
+
+from config import EVENT_TRACKING_ENABLED  # Plain constants, safe to import at parse time
+
+@dag(
+    dag_id="gcs_feed_events",
+    schedule="*/10 * * * *", # Every 10 minutes
+    start_date=datetime.now(pytz.timezone("US/Central")) - timedelta(days=1),
+    catchup=False,
+    max_active_runs=1, # Counter files have a single writer
+    tags=["raw-data-monitoring", "gcs", "pubsub"],
+)
+def GCSFeedEventsDag():
+
+    # Pull pending GCS notifications and update the per-feed, per-day counters
+    @task(task_id="consume_feed_events", execution_timeout=timedelta(minutes=9))
+    def consume_feed_events():
+        from config import FEEDS, STATE_DIR, EVENT_SUBSCRIPTION  # Local import inside task context
+        from feed_events import PubSubEventSource, consume_events
+        from main import run_window
+        _, upsert_start, _ = run_window()
+        consume_events(PubSubEventSource(EVENT_SUBSCRIPTION), STATE_DIR, FEEDS, seed_start=upsert_start, max_batches=50)
+
+    consume_feed_events()
+
+if EVENT_TRACKING_ENABLED:
+    dag = GCSFeedEventsDag()
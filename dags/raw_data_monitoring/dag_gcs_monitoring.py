@@ -8,6 +8,36 @@ import pytz
 # Directory path src to import run function
 sys.path.append("/home/airflow/gcs/dags/raw_data_monitoring/src")
 
+from config import FEEDS  # Plain constants, safe to import at parse time
+import re
+
+# Run metrics are keyed by feed label ("Web Impressions"); stat names use the feed key ("web")
+FEED_KEYS_BY_LABEL = {feed["label"]: key for key, feed in FEEDS.items()}
+
+def stat_name(*parts):
+    """
+    Build a StatsD name from parts, keeping only the characters Airflow accepts in stat names.
+    """
+    return ".".join(re.sub(r"[^A-Za-z0-9_-]", "_", str(part)) for part in ("gcs_feed_monitoring",) + parts)
+
+def emit_run_metrics(run_metrics):
+    """
+    Emit a run's per-feed/per-stage timings and counters as Airflow task metrics.
+    """
+    from airflow.stats import Stats
+    for feed, stages in run_metrics["timings"].items():
+        for stage, seconds in stages.items():
+            Stats.timing(stat_name(FEED_KEYS_BY_LABEL.get(feed, feed), stage), seconds * 1000)
+    for feed, counters in run_metrics["counters"].items():
+        for name, value in counters.items():
+            Stats.gauge(stat_name(FEED_KEYS_BY_LABEL.get(feed, feed), name), value)
+
+def report_entry(feed_result):
+    """
+    The report entry without the metrics, which are emitted as task metrics and need not go to XCom.
+    """
+    return {key: value for key, value in feed_result.items() if key != "run_metrics"}
+
 @dag(
     dag_id="gcs_feed_monitoring",
     schedule=  "0 4 * * *", # 4 AM UTC - 10 PM UTC
@@ -17,12 +47,34 @@ sys.path.append("/home/airflow/gcs/dags/raw_data_monitoring/src")
 )
 def GCSMonitoringDag():
 
-    @task(task_id="run_monitoring_script")
-    def run_function():
-        from main import run  # Local import inside task context
+    # One mapped task per feed: listing and aggregation, metric upsert and analysis
+    @task(task_id="monitor_feed", retries=2, retry_delay=timedelta(minutes=5))
+    def monitor_feed(feed_key, run_id=None):
+        from airflow.operators.python import get_current_context
+        from main import process_feed, UpsertFailedError  # Local import inside task context
+        from profiling import PROFILE_VARIABLE
+        # Set the Variable to "true" to profile the next runs (profiling.py)
+        profile = Variable.get(PROFILE_VARIABLE, default_var=None)
+        try:
+            feed_result = process_feed(feed_key, run_id=run_id, profile=profile)
+        except UpsertFailedError as e:
+            # The analysis still reaches the report if every retry fails; the task fails so the
+            # retry redoes the upsert (listing and analysis are restored from the checkpoint)
+            emit_run_metrics(e.feed_result["run_metrics"])
+            get_current_context()["ti"].xcom_push(key="return_value", value=report_entry(e.feed_result))
+            raise
+        run_metrics = feed_result.get("run_metrics") if isinstance(feed_result, dict) else None
+        if isinstance(run_metrics, dict):
+            emit_run_metrics(run_metrics)
+        return report_entry(feed_result)
+
+    # Fan-in: runs even if some feeds failed, which are reported as errors
+    @task(task_id="send_slack_report", trigger_rule="all_done")
+    def send_slack_report(feed_results):
+        from main import send_report  # Local import inside task context
         slack_webhook = Variable.get("slack_webhook", default_var=None)
-        run(slack_webhook=slack_webhook)
+        send_report(list(feed_results), slack_webhook=slack_webhook)
 
-    run_function()
+    send_slack_report(monitor_feed.expand(feed_key=list(FEEDS)))
 
-dag = GCSMonitoringDag()
\ No newline at end of file
+dag = GCSMonitoringDag()
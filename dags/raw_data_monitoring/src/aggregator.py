@@ -0,0 +1,69 @@
+from datetime import date
+from typing import Iterable
+
+from size_sketch import SizeSketch, bucket_index
+
+def aggregate_daily_metrics(file_metadata: Iterable[dict]) -> dict[date, dict]:
+    """
+    Aggregate file metadata into per-date running totals in a single pass.
+
+    Only one small dictionary per date is kept, so the input can be a streaming iterator
+    (e.g. gcs_client.iter_gcs_metadata) and memory does not grow with the number of files.
+    Files without an actual date are ignored.
+
+    Args:
+        file_metadata (iterable): File metadata dictionaries with "size" and "actual_date" keys,
+            or a catalog.ObjectCatalog.
+
+    Returns:
+        dict: A dictionary where keys are dates and values contain file_count, total_bytes,
+              min_size and max_size (sizes in bytes), and a size_sketch.SizeSketch of the sizes.
+    """
+    # A catalog.ObjectCatalog aggregates its columns directly
+    if hasattr(file_metadata, "group_by_date"):
+        return file_metadata.group_by_date()
+
+    daily_metrics = {}
+    for file in file_metadata:
+        actual_date = file.get("actual_date")
+        if not actual_date:
+            continue
+
+        size = file["size"] or 0
+        totals = daily_metrics.get(actual_date)
+        if totals is None:
+            sketch = SizeSketch()
+            sketch.counts[bucket_index(size)] += 1
+            daily_metrics[actual_date] = {
+                "file_count": 1,
+                "total_bytes": size,
+                "min_size": size,
+                "max_size": size,
+                "size_sketch": sketch,
+            }
+        else:
+            totals["size_sketch"].counts[bucket_index(size)] += 1
+            totals["file_count"] += 1
+            totals["total_bytes"] += size
+            if size < totals["min_size"]:
+                totals["min_size"] = size
+            if size > totals["max_size"]:
+                totals["max_size"] = size
+
+    return daily_metrics
+
+def get_daily_totals(daily_metrics: dict[date, dict], day: date) -> tuple[int, float]:
+    """
+    Get the file count and total size in MB for a single date.
+
+    Args:
+        daily_metrics (dict): Per-date totals from aggregate_daily_metrics.
+        day (date): The date to look up.
+
+    Returns:
+        tuple: The file count and the total size in MB (0 and 0.0 if nothing was delivered).
+    """
+    totals = daily_metrics.get(day)
+    if not totals:
+        return 0, 0.0
+    return totals["file_count"], totals["total_bytes"] / 1_000_000
@@ -1,27 +1,238 @@
 import requests
+import hashlib
 import json
-from config import FEEDS, ALERT_RECIPIENTS, LOOKER_LINK
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from requests.adapters import HTTPAdapter
+from config import (FEEDS, ALERT_RECIPIENTS, LOOKER_LINK, STATE_DIR, SLACK_TIMEOUT_SECONDS, SLACK_MAX_ATTEMPTS,
+                    SLACK_MAX_MESSAGE_CHARS, SLACK_SUPPRESSION_HOURS)
 from tabulate import tabulate
+import instrumentation
 
-def send_alert_to_team(webhook_url, alert_message):
+# Longest wait honored between two attempts (Retry-After or backoff)
+MAX_RETRY_WAIT_SECONDS = 60
+
+_session = None
+_session_lock = Lock()
+
+# Single worker so the chunks of consecutive reports are posted in order
+_delivery_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slack")
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide pooled HTTP session used for Slack webhooks.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            _session.headers.update({"Content-Type": "application/json"})
+        return _session
+
+def split_message(message: str, max_chars: int = SLACK_MAX_MESSAGE_CHARS) -> list[str]:
+    """
+    Split a message into Slack-sized chunks on line boundaries.
+
+    A code block (```) cut by a chunk boundary is closed at the end of the chunk and
+    reopened at the start of the next one, so tables keep their formatting.
+
+    Args:
+        message (str): The full message.
+        max_chars (int): Maximum characters per chunk.
+
+    Returns:
+        list: The chunks, in order.
+    """
+    fence = "```"
+    # Room for closing/reopening a code block
+    budget = max(max_chars - 2 * (len(fence) + 1), 1)
+
+    chunks = []
+    current = []
+    current_len = 0
+    in_code = False
+    chunk_starts_in_code = False
+
+    def flush():
+        nonlocal current, current_len, chunk_starts_in_code
+        if not current:
+            return
+        text = "\n".join(current)
+        if chunk_starts_in_code:
+            text = f"{fence}\n{text}"
+        if in_code:
+            text = f"{text}\n{fence}"
+        chunks.append(text)
+        current, current_len = [], 0
+        chunk_starts_in_code = in_code
+
+    for line in message.split("\n"):
+        # Lines longer than a whole chunk are cut
+        pieces = [line[i:i + budget] for i in range(0, len(line), budget)] or [""]
+        for piece in pieces:
+            if current and current_len + len(piece) + 1 > budget:
+                flush()
+            current.append(piece)
+            current_len += len(piece) + 1
+        if line.count(fence) % 2:
+            in_code = not in_code
+
+    flush()
+    return chunks
+
+def parse_retry_after(value: str | None, default: float) -> float:
+    """
+    Seconds to wait from a Retry-After header, given either as seconds or as an HTTP date.
+
+    Returns:
+        float: The delay, or `default` if the header is missing or cannot be parsed.
+    """
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+class SlackDelivery:
+    """
+    Posts messages to a Slack webhook with retries, chunking and duplicate suppression.
+
+    Each chunk is posted through the pooled session with a timeout, retried with exponential
+    backoff on connection errors and 5xx responses, and after the Retry-After delay on 429
+    responses. Chunks are keyed on the whole message and their position in it: the chunks of a
+    message delivered within the last SLACK_SUPPRESSION_HOURS are not posted again, so an
+    Airflow retry of the reporting task resumes after the last delivered chunk instead of
+    repeating alerts, while any change to the report posts it in full.
+
+    Args:
+        webhook_url (str): The Slack webhook URL.
+        suppression_path (str): JSON file of recently delivered chunk keys (None to disable).
+        session (requests.Session): HTTP session (default: the pooled session).
+    """
+
+    def __init__(self, webhook_url: str, suppression_path: str | None = None, session: requests.Session | None = None,
+                 timeout: float = SLACK_TIMEOUT_SECONDS, max_attempts: int = SLACK_MAX_ATTEMPTS,
+                 max_chars: int = SLACK_MAX_MESSAGE_CHARS, suppression_hours: float = SLACK_SUPPRESSION_HOURS):
+        self.webhook_url = webhook_url
+        self.suppression_path = suppression_path
+        self.session = session or get_session()
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.max_chars = max_chars
+        self.suppression_hours = suppression_hours
+
+    def send(self, message: str) -> bool:
+        """
+        Post a message, split into chunks if needed.
+
+        Returns:
+            bool: True if every chunk was delivered (or had already been).
+        """
+        with instrumentation.timed("slack_delivery"):
+            sent = self._load_sent()
+            delivered = True
+            message_hash = hashlib.sha256(f"{self.webhook_url}\n{message}".encode("utf-8")).hexdigest()
+            for index, chunk in enumerate(split_message(message, self.max_chars)):
+                key = f"{message_hash}:{index}"
+                if key in sent:
+                    print("[INFO] Skipping Slack message already delivered recently")
+                    instrumentation.count("slack_suppressed")
+                    continue
+                if not self._post(chunk):
+                    delivered = False
+                    # Later chunks would be out of context without this one
+                    break
+                sent[key] = datetime.now(timezone.utc).isoformat()
+                self._save_sent(sent)
+            return delivered
+
+    def _post(self, text: str) -> bool:
+        payload = json.dumps({"text": text, "mrkdwn": True})
+        for attempt in range(1, self.max_attempts + 1):
+            wait = min(2 ** attempt, MAX_RETRY_WAIT_SECONDS)
+            try:
+                response = self.session.post(self.webhook_url, data=payload, timeout=self.timeout)
+                instrumentation.count("slack_requests")
+                if response.status_code == 200:
+                    return True
+                if response.status_code == 429:
+                    wait = min(parse_retry_after(response.headers.get("Retry-After"), wait), MAX_RETRY_WAIT_SECONDS)
+                elif response.status_code < 500:
+                    print(f"[ERROR] Error sending message: {response.status_code} {response.text}")
+                    return False
+                error = f"{response.status_code} {response.text}"
+            except requests.RequestException as e:
+                error = str(e)
+
+            if attempt < self.max_attempts:
+                print(f"[WARN] Slack delivery attempt {attempt} failed ({error}), retrying in {wait:.0f}s")
+                time.sleep(wait)
+
+        print(f"[ERROR] Error sending message after {self.max_attempts} attempts: {error}")
+        return False
+
+    def _load_sent(self) -> dict:
+        if not self.suppression_path or not os.path.exists(self.suppression_path):
+            return {}
+        try:
+            with open(self.suppression_path, encoding="utf-8") as f:
+                sent = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Could not read Slack suppression cache: {e}")
+            return {}
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=self.suppression_hours)
+        return {key: sent_at for key, sent_at in sent.items() if datetime.fromisoformat(sent_at) >= cutoff}
+
+    def _save_sent(self, sent: dict):
+        if not self.suppression_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.suppression_path) or ".", exist_ok=True)
+            tmp_path = f"{self.suppression_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(sent, f)
+            os.replace(tmp_path, self.suppression_path)
+        except OSError as e:
+            print(f"[WARN] Could not save Slack suppression cache: {e}")
+
+def send_alert_to_team(webhook_url, alert_message) -> bool:
     """   
-    Sends an alert message to the team via a Slack webhook.
+    Sends an alert message to the team via a Slack webhook (see SlackDelivery).
     
     Args:
         webhook_url (str): The Slack webhook URL to send the alert to.
         alert_message (str): The message to send as an alert.
+
+    Returns:
+        bool: True if the message was delivered.
     """
+    if not webhook_url:
+        print("[WARN] No Slack webhook configured, alert not sent.")
+        return False
 
-    headers = {'Content-Type': 'application/json'}
-    payload = {
-        "text": alert_message,
-        "mrkdwn": True
-        }
+    delivery = SlackDelivery(webhook_url, suppression_path=os.path.join(STATE_DIR, "slack_sent.json"))
+    return delivery.send(alert_message)
 
-    response = requests.post(webhook_url, data=json.dumps(payload), headers=headers)
-    
-    if response.status_code != 200:
-        print(f"Error sending message: {response.text}")
+def send_alert_async(webhook_url, alert_message) -> Future:
+    """
+    Sends an alert message in the background; the returned future resolves to send_alert_to_team's result.
+    """
+    # In a copy of the caller's context, so the delivery is timed in the caller's run
+    return _delivery_executor.submit(copy_context().run, send_alert_to_team, webhook_url, alert_message)
 
 def format_overview_table(results: list[tuple[str, str, str]]) -> str:
     """
@@ -60,6 +271,8 @@ def format_alert_details(feed_label, result):
     lines.append(f"Expected Date: {result['date']}")
     lines.append(f"File Count: {result['file_count']} (Baseline: {result['monthly_avg_count']:.1f})")
     lines.append(f"Size: {result['file_size_mb']:.2f} MB (Baseline: {result['monthly_avg_size_mb']:.2f} MB)")
+    if result.get("row_count") is not None:
+        lines.append(f"Rows: {result['row_count']:,}")
 
     # Append details of issues if any
     if result['issues']:
@@ -67,4 +280,53 @@ def format_alert_details(feed_label, result):
        for issue in result['issues']:
            lines.append(f" - {issue}")
 
-    return "\n".join(lines)
\ No newline at end of file
+    return "\n".join(lines)
+
+def format_error_details(feed_label, error):
+    """
+    Formats the details of a feed whose monitoring run failed into a Slack message.
+
+    Args:
+        feed_label (str): The label of the feed.
+        error (str): Description of the error raised while processing the feed.
+
+    Returns:
+        str: A formatted string containing the error details.
+    """
+
+    lines = [f"*Feed:* {FEEDS[feed_label]['label']}"]
+    user_mentions = " ".join(f"<@{uid}>" for uid in ALERT_RECIPIENTS.get(feed_label, []))
+    if user_mentions:
+        lines.append(user_mentions)
+    lines.append("\n===== MONITORING ERROR =====")
+    lines.append(f"Monitoring failed: {error}")
+
+    return "\n".join(lines)
+
+
+def format_delivery_changes(feed_label, changes):
+    """
+    Formats the already listed partitions whose files changed into a Slack message.
+
+    Args:
+        feed_label (str): The label of the feed.
+        changes (dict): {"partitions": [...]} with each partition's date, [before, after]
+            file_count and total_bytes, and added, removed and rewritten file counts.
+
+    Returns:
+        str: A formatted string summarizing the changes.
+    """
+
+    partitions = changes["partitions"]
+    added, removed, rewritten = (sum(p[kind] for p in partitions) for kind in ("added", "removed", "rewritten"))
+    lines = [f"*Feed:* {FEEDS[feed_label]['label']}"]
+    lines.append(f"Changed partitions: {len(partitions)} | Files added: {added}, removed: {removed}, rewritten: {rewritten}")
+
+    # Show a few partitions
+    for partition in partitions[:5]:
+        (count_before, count_after), (bytes_before, bytes_after) = partition["file_count"], partition["total_bytes"]
+        lines.append(f" - {partition['date']}: +{partition['added']} / -{partition['removed']} / "
+                     f"~{partition['rewritten']} files ({count_before} → {count_after}), "
+                     f"{bytes_before / 1_000_000:.2f} → {bytes_after / 1_000_000:.2f} MB")
+
+    return "\n".join(lines)
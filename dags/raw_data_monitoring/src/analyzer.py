@@ -1,6 +1,29 @@
-from bq_client import query_historical_baseline
-from datetime import datetime, date, timedelta
-from collections import defaultdict
+from metrics_store import query_historical_baseline, query_daily_metrics
+from aggregator import aggregate_daily_metrics, get_daily_totals
+from size_sketch import SizeSketch
+from utils import baseline_window
+from datetime import date, timedelta
+from numpy.lib.stride_tricks import sliding_window_view
+import numpy as np
+import pandas as pd
+
+STATUS_OK = "OK ✅"
+STATUS_WARNING = "WARNING ❗️"
+STATUS_CRITICAL = "CRITICAL 🚨"
+
+# Relative deviation from the baseline that raises a warning
+DEVIATION_THRESHOLD = 0.25
+
+# Median or p99 file size moving by this factor (either way) against the earlier days raises a warning
+SIZE_SHIFT_FACTOR = 2.0
+# Files needed on the day and in the earlier days before size quantiles are compared
+SIZE_SHIFT_MIN_FILES = 5
+
+# Earlier days of daily_metrics the day rules see in a nightly run (main.run_window upserts the
+# analysis date and the 7 days before it); analyze_history replays them over the same span
+DAY_RULES_LOOKBACK_DAYS = 7
+
+_SEVERITY = {STATUS_OK: 0, STATUS_WARNING: 1, STATUS_CRITICAL: 2}
 
 def calculate_baseline(historical_data: dict[date, list[dict]]) -> tuple[float, float]:
     """   
@@ -32,55 +55,61 @@ def calculate_baseline(historical_data: dict[date, list[dict]]) -> tuple[float,
     
     return avg_count, avg_size_mb
 
-def analyze_feed(feed_label:str, file_metadata: list[dict], expected_date: date) -> dict:
+def analyze_feed(feed_label:str, file_metadata: "list[dict] | dict[date, dict] | ObjectCatalog", expected_date: date,
+                 baseline: tuple[float, float] | None = None) -> dict:
     """   
     Analyze the file metadata for a specific feed and compare it against historical baselines.
     
     Args:
         feed_label (str): The label of the feed to analyze.
-        file_metadata (list): List of dictionaries containing file metadata.
+        file_metadata (list | dict | ObjectCatalog): Per-date totals from aggregator.aggregate_daily_metrics,
+            a list of dictionaries containing file metadata, or a catalog.ObjectCatalog.
         expected_date (date): The date for which the analysis is being performed.
+        baseline (tuple): Optional precomputed (avg_count, avg_size_mb), e.g. from
+            metrics_store.query_historical_baselines. Queried from the metrics store when omitted.
     
     Returns:
         dict: A dictionary containing the analysis result, including status, file count, size, and any issues detected.
     """
 
-    # Group files by their actual date
-    files_by_date = defaultdict(list)
-    for file in file_metadata:
-        actual_date = file.get("actual_date")
-        if actual_date:
-            files_by_date[actual_date].append(file)
+    # Per-date totals (raw file metadata is aggregated first)
+    if isinstance(file_metadata, dict):
+        daily_metrics = file_metadata
+    else:
+        daily_metrics = aggregate_daily_metrics(file_metadata)
 
     # Historical data for the previous 30 days
-    end_date = expected_date - timedelta(days=1)
-    start_date = end_date - timedelta(days=31)
-    avg_count, avg_size_mb = query_historical_baseline(feed_label, start_date, end_date)
+    if baseline is None:
+        start_date, end_date = baseline_window(expected_date)
+        baseline = query_historical_baseline(feed_label, start_date, end_date)
+    avg_count, avg_size_mb = baseline
     #avg_count, avg_size_mb = calculate_baseline(files_by_date)
     
     # Today's file delivery
-    today_files = files_by_date.get(expected_date, [])
-    today_count = len(today_files)
-    today_size_mb = sum(file["size"] for file in today_files) / 1_000_000 if today_files else 0.0
+    today_count, today_size_mb = get_daily_totals(daily_metrics, expected_date)
 
     
     # Baseline comparison
-    status = "OK ✅"
+    status = STATUS_OK
     issues = []
 
     if today_count == 0 or today_size_mb == 0:
-        status = "CRITICAL 🚨"
+        status = STATUS_CRITICAL
         issues.append("No data received.")
     
     else:
-        if avg_count > 0 and abs(today_count - avg_count) / avg_count > 0.25:
+        if avg_count > 0 and abs(today_count - avg_count) / avg_count > DEVIATION_THRESHOLD:
             issues.append(f"File count deviates ≥25%: {today_count} vs baseline {avg_count:.1f}")
-            status = "WARNING ❗️"
+            status = STATUS_WARNING
 
-        if avg_size_mb > 0 and abs(today_size_mb - avg_size_mb) / avg_size_mb > 0.25:
+        size_deviates = avg_size_mb > 0 and abs(today_size_mb - avg_size_mb) / avg_size_mb > DEVIATION_THRESHOLD
+        if size_deviates:
             issues.append(f"Size deviates ≥25%: {today_size_mb:.2f} MB vs baseline {avg_size_mb:.2f} MB")
-            if status != "CRITICAL 🚨":
-                status = "WARNING ❗️"
+            if status != STATUS_CRITICAL:
+                status = STATUS_WARNING
+
+        status, day_issues = apply_day_rules(daily_metrics, expected_date, status, size_deviates)
+        issues.extend(day_issues)
 
     return {
         "status": status,
@@ -89,7 +118,276 @@ def analyze_feed(feed_label:str, file_metadata: list[dict], expected_date: date)
         "file_size_mb": today_size_mb,
         "monthly_avg_count": avg_count,
         "monthly_avg_size_mb": avg_size_mb,
+        "row_count": daily_metrics.get(expected_date, {}).get("row_count"),
         "issues": issues
     }
 
+def apply_day_rules(daily_metrics: dict[date, dict], expected_date: date, status: str = STATUS_OK,
+                    size_deviates: bool = False) -> tuple[str, list[str]]:
+    """
+    Run DAY_RULES on a day that received data, after the baseline comparison.
+
+    Args:
+        daily_metrics (dict): Per-date totals of the day and the days before it.
+        expected_date (date): The day to check.
+        status (str): The status so far; the most severe status wins.
+        size_deviates (bool): Whether the total size already deviates from the baseline; the
+            file-size shape check only covers deliveries whose totals look normal, so it is skipped.
+
+    Returns:
+        tuple: (status, issues), the issues in DAY_RULES order.
+    """
+    issues = []
+    for rule in DAY_RULES:
+        if size_deviates and rule is check_size_distribution:
+            continue
+        rule_status, rule_issues = rule(daily_metrics, expected_date)
+        issues.extend(rule_issues)
+        if _SEVERITY[rule_status] > _SEVERITY[status]:
+            status = rule_status
+    return status, issues
+
+def check_duplicates(daily_metrics: dict[date, dict], expected_date: date) -> tuple[str, list[str]]:
+    """
+    Flag content re-delivered under new names on a day (main.flag_duplicates).
+
+    Returns:
+        tuple: (status, issues); STATUS_OK with no issues when the day has no duplicate_count.
+    """
+    duplicates = daily_metrics.get(expected_date, {}).get("duplicate_count")
+    if not duplicates:
+        return STATUS_OK, []
+    duplicate_mb = daily_metrics[expected_date].get("duplicate_bytes", 0) / 1_000_000
+    return STATUS_WARNING, [f"{duplicates} duplicate file(s) ({duplicate_mb:.2f} MB) re-delivered under new names"]
+
+def check_size_distribution(daily_metrics: dict[date, dict], expected_date: date) -> tuple[str, list[str]]:
+    """
+    Compare the median and p99 file size of a day with those of the earlier days of daily_metrics.
+
+    Catches deliveries whose totals look normal but whose shape changed, e.g. thousands of
+    tiny files or a single giant one. The earlier days' size sketches are merged into one.
+
+    Args:
+        daily_metrics (dict): Per-date totals with size_sketch (size_sketch.SizeSketch) entries.
+        expected_date (date): The day to check.
+
+    Returns:
+        tuple: (status, issues); STATUS_OK with no issues when the sketches are missing or hold too few files.
+    """
+    today = daily_metrics.get(expected_date, {}).get("size_sketch")
+    if today is None or today.count < SIZE_SHIFT_MIN_FILES:
+        return STATUS_OK, []
+
+    baseline = SizeSketch()
+    for day, totals in daily_metrics.items():
+        if day < expected_date and totals.get("size_sketch") is not None:
+            baseline.merge(totals["size_sketch"])
+    if baseline.count < SIZE_SHIFT_MIN_FILES:
+        return STATUS_OK, []
+
+    # The p99 is only reported when the median did not move (all files shrinking moves both)
+    for name, q in (("Median", 0.5), ("p99", 0.99)):
+        size, usual = today.quantile(q), baseline.quantile(q)
+        if usual and (size / usual >= SIZE_SHIFT_FACTOR or usual / max(size, 1) >= SIZE_SHIFT_FACTOR):
+            return STATUS_WARNING, [f"{name} file size changed: {size / 1_000_000:.2f} MB vs {usual / 1_000_000:.2f} MB on previous days"]
+    return STATUS_OK, []
+
+def check_row_counts(daily_metrics: dict[date, dict], expected_date: date) -> tuple[str, list[str]]:
+    """
+    Check the Parquet footer totals of a day (main.add_row_counts) against the other days of daily_metrics.
+
+    Args:
+        daily_metrics (dict): Per-date totals, with row_count, unreadable_files and schema_fingerprints
+            for feeds with row counts enabled.
+        expected_date (date): The day to check.
+
+    Returns:
+        tuple: (status, issues); STATUS_OK with no issues when the day has no row counts.
+    """
+    today = daily_metrics.get(expected_date, {})
+    row_count = today.get("row_count")
+    if row_count is None:
+        return STATUS_OK, []
+
+    status = STATUS_OK
+    issues = []
+    if today.get("unreadable_files"):
+        issues.append(f"{today['unreadable_files']} file(s) without a readable Parquet footer (truncated?)")
+        status = STATUS_WARNING
+
+    if row_count == 0 and not today.get("unreadable_files"):
+        return STATUS_CRITICAL, issues + ["Files contain no rows."]
+
+    previous = [totals for day, totals in daily_metrics.items()
+                if day < expected_date and totals.get("row_count") is not None]
+    if previous:
+        avg_rows = sum(totals["row_count"] for totals in previous) / len(previous)
+        if avg_rows > 0 and abs(row_count - avg_rows) / avg_rows > DEVIATION_THRESHOLD:
+            issues.append(f"Row count deviates ≥25%: {row_count} vs {avg_rows:.0f} on previous days")
+            status = STATUS_WARNING
+
+    fingerprints = today.get("schema_fingerprints") or []
+    earlier_layouts = [daily_metrics[day]["schema_fingerprints"] for day in sorted(daily_metrics)
+                       if day < expected_date and daily_metrics[day].get("schema_fingerprints")]
+    if len(fingerprints) > 1 or (fingerprints and earlier_layouts and fingerprints != earlier_layouts[-1]):
+        issues.append("Schema changed: files with a different column layout than the previous day")
+        status = STATUS_WARNING
+
+    return status, issues
+
+# Rules on the per-day totals, run after the baseline comparison by analyze_feed and replayed
+# by analyze_history; each takes (daily_metrics, expected_date) and returns (status, issues)
+DAY_RULES = [check_duplicates, check_size_distribution, check_row_counts]
+
+def analyze_history(daily_metrics: pd.DataFrame, start_date: date | None = None, end_date: date | None = None) -> pd.DataFrame:
+    """
+    Score many feeds on many dates at once with the same rules as analyze_feed.
+
+    For every feed and every date in the range, the baseline is the average of the rows
+    present in the baseline window (utils.baseline_window), exactly like the BigQuery AVG,
+    and the date's own row (zero when missing) is compared against it. Baselines, deviations
+    and statuses are computed with NumPy over a dense date x feed grid.
+
+    DAY_RULES are then replayed on the dates that received data, over the date and the
+    DAY_RULES_LOOKBACK_DAYS before it, from the stored rowcount and sizesketch columns.
+    Inputs the table does not keep (duplicates, unreadable files, schema fingerprints) are
+    only checked in the live run.
+
+    Args:
+        daily_metrics (DataFrame): Rows with date, datafeed, filecount and filesize (MB)
+            columns, and optionally rowcount and sizesketch, i.e. the layout of the monitoring table.
+        start_date (date): First date to score (default: first date in the frame).
+        end_date (date): Last date to score (default: last date in the frame).
+
+    Returns:
+        DataFrame: One row per feed and date with datafeed, date, status, file_count,
+                   file_size_mb, monthly_avg_count, monthly_avg_size_mb, row_count and issues.
+    """
+    columns = ["datafeed", "date", "status", "file_count", "file_size_mb",
+               "monthly_avg_count", "monthly_avg_size_mb", "row_count", "issues"]
+    if daily_metrics.empty:
+        return pd.DataFrame(columns=columns)
+
+    frame = daily_metrics.assign(date=pd.to_datetime(daily_metrics["date"]))
+    frame = frame.drop_duplicates(["datafeed", "date"], keep="last")
+    start = pd.Timestamp(start_date) if start_date else frame["date"].min()
+    end = pd.Timestamp(end_date) if end_date else frame["date"].max()
+
+    # Window offsets relative to the scored date (e.g. 32 days ending the day before)
+    window_start, window_end = baseline_window(start.date())
+    lead = (start.date() - window_start).days
+    window = (window_end - window_start).days + 1
+
+    grid = pd.date_range(start - pd.Timedelta(days=lead), end, freq="D")
+    count_grid = frame.pivot(index="date", columns="datafeed", values="filecount").reindex(grid)
+    feeds = count_grid.columns
+    size_grid = frame.pivot(index="date", columns="datafeed", values="filesize").reindex(index=grid, columns=feeds)
+    counts = count_grid.to_numpy(dtype=float)
+    sizes = size_grid.to_numpy(dtype=float)
+
+    # Baseline: average of the rows present in each date's window
+    present = ~np.isnan(counts)
+    scored = len(grid) - lead
+    count_sums = sliding_window_view(np.nan_to_num(counts), window, axis=0)[:scored].sum(axis=-1)
+    size_sums = sliding_window_view(np.nan_to_num(sizes), window, axis=0)[:scored].sum(axis=-1)
+    row_counts = sliding_window_view(present, window, axis=0)[:scored].sum(axis=-1)
+    avg_count = np.divide(count_sums, row_counts, out=np.zeros_like(count_sums), where=row_counts > 0)
+    avg_size = np.divide(size_sums, row_counts, out=np.zeros_like(size_sums), where=row_counts > 0)
 
+    today_count = np.nan_to_num(counts[lead:])
+    today_size = np.nan_to_num(sizes[lead:])
+
+    # Same rules as analyze_feed
+    critical = (today_count == 0) | (today_size == 0)
+    count_deviation = np.divide(np.abs(today_count - avg_count), avg_count, out=np.zeros_like(avg_count), where=avg_count > 0)
+    size_deviation = np.divide(np.abs(today_size - avg_size), avg_size, out=np.zeros_like(avg_size), where=avg_size > 0)
+    count_issue = ~critical & (avg_count > 0) & (count_deviation > DEVIATION_THRESHOLD)
+    size_issue = ~critical & (avg_size > 0) & (size_deviation > DEVIATION_THRESHOLD)
+    status = np.where(critical, STATUS_CRITICAL, np.where(count_issue | size_issue, STATUS_WARNING, STATUS_OK))
+
+    # Long format, feed-major so each feed's history is contiguous
+    result = pd.DataFrame({
+        "datafeed": np.repeat(feeds.to_numpy(), scored),
+        "date": np.tile(grid[lead:].date, len(feeds)),
+        "status": status.T.ravel(),
+        "file_count": today_count.T.ravel().astype(int),
+        "file_size_mb": today_size.T.ravel(),
+        "monthly_avg_count": avg_count.T.ravel(),
+        "monthly_avg_size_mb": avg_size.T.ravel(),
+    })
+
+    # Issue texts are only built for the flagged rows
+    flags = zip(critical.T.ravel(), count_issue.T.ravel(), size_issue.T.ravel())
+    result["issues"] = [
+        _format_issues(row, *flag) if any(flag) else []
+        for row, flag in zip(result.itertuples(index=False), flags)
+    ]
+
+    # The day rules, on the totals the table stores; only days that received data are checked
+    stored = _stored_day_metrics(frame)
+    statuses, issues, row_counts = result["status"].tolist(), result["issues"].tolist(), [None] * len(result)
+    size_issues = size_issue.T.ravel()
+    for i, (feed, day) in enumerate(zip(result["datafeed"], result["date"])):
+        series = stored.get(feed)
+        if not series or day not in series:
+            continue
+        row_counts[i] = series[day].get("row_count")
+        if statuses[i] == STATUS_CRITICAL:
+            continue
+        days = (day - timedelta(days=n) for n in range(DAY_RULES_LOOKBACK_DAYS, -1, -1))
+        statuses[i], day_issues = apply_day_rules({d: series[d] for d in days if d in series}, day, statuses[i],
+                                                     bool(size_issues[i]))
+        issues[i] = issues[i] + day_issues
+    result["status"], result["issues"] = statuses, issues
+    result["row_count"] = pd.Series(row_counts, index=result.index, dtype=object)  # None when unknown, like analyze_feed
+    return result[columns]
+
+def _stored_day_metrics(frame: pd.DataFrame) -> dict[str, dict[date, dict]]:
+    """
+    The rowcount and sizesketch columns of a history frame as per-feed daily_metrics
+    (row_count, size_sketch), for the rows that have either.
+    """
+    stored = {}
+    if "rowcount" not in frame.columns and "sizesketch" not in frame.columns:
+        return stored
+
+    row_counts = frame["rowcount"] if "rowcount" in frame.columns else [None] * len(frame)
+    sketches = frame["sizesketch"] if "sizesketch" in frame.columns else [None] * len(frame)
+    for feed, day, row_count, sketch in zip(frame["datafeed"], frame["date"].dt.date, row_counts, sketches):
+        totals = {}
+        if row_count is not None and not pd.isna(row_count):
+            totals["row_count"] = int(row_count)
+        if isinstance(sketch, str):
+            totals["size_sketch"] = SizeSketch.deserialize(sketch)
+        if totals:
+            stored.setdefault(feed, {})[day] = totals
+    return stored
+
+def _format_issues(row, critical: bool, count_issue: bool, size_issue: bool) -> list[str]:
+    if critical:
+        return ["No data received."]
+
+    issues = []
+    if count_issue:
+        issues.append(f"File count deviates ≥25%: {row.file_count} vs baseline {row.monthly_avg_count:.1f}")
+    if size_issue:
+        issues.append(f"Size deviates ≥25%: {row.file_size_mb:.2f} MB vs baseline {row.monthly_avg_size_mb:.2f} MB")
+    return issues
+
+def rescore_history(start_date: date, end_date: date, feed_labels: list[str] | None = None) -> pd.DataFrame:
+    """
+    Backfill mode: re-score every feed and date in a range from the monitoring table,
+    e.g. after changing thresholds. Reads the history (plus the baseline lead-in) in one query.
+
+    Args:
+        start_date (date): First date to score.
+        end_date (date): Last date to score.
+        feed_labels (list): Optional feed labels to restrict to.
+
+    Returns:
+        DataFrame: The output of analyze_history.
+    """
+    history_start, _ = baseline_window(start_date)
+    rows = query_daily_metrics(history_start, end_date, feed_labels)
+    frame = pd.DataFrame(rows, columns=["date", "datafeed", "filecount", "filesize", "rowcount", "sizesketch"])
+    return analyze_history(frame, start_date, end_date)
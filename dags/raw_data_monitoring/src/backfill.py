@@ -0,0 +1,78 @@
+"""
+Rebuild the raw_data_monitoring table for an arbitrary date range and set of feeds.
+
+Each feed prefix is listed once for the whole range (one listing bounded by the range's first
+and last partitions, not one per day), bucketed per day, and all rows are written with one
+load job into a staging table followed by a single MERGE.
+
+    python backfill.py --start 2024-01-01 --end 2025-06-30
+    python backfill.py --start 2025-01-01 --end 2025-01-31 --feeds geo web --rescore rescored.csv
+"""
+import argparse
+from datetime import date, timedelta
+
+from gcs_client import iter_gcs_metadata, iter_range_metadata
+from aggregator import aggregate_daily_metrics
+from metrics_store import load_feed_metrics
+from config import FEEDS
+from main import build_metric_rows, invalidate_baseline_cache
+
+def backfill_feed_metrics(start_date: date, end_date: date, feed_keys: list[str] | None = None) -> bool:
+    """
+    List, aggregate and load the daily metrics of the given feeds for a date range.
+
+    Args:
+        start_date (date): First day to rebuild.
+        end_date (date): Last day to rebuild.
+        feed_keys (list): Feed keys from FEEDS (default: all feeds).
+
+    Returns:
+        bool: True if the metrics were written.
+    """
+    metric_rows = []
+    for key in feed_keys or list(FEEDS):
+        feed = FEEDS[key]
+        print(f"[INFO] Listing {feed['label']} from {start_date} to {end_date}")
+
+        if feed.get("partitioned", True):
+            listing = iter_range_metadata(feed["bucket"], feed["prefix"], start_date, end_date)
+        else:
+            listing = iter_gcs_metadata(feed["bucket"], feed["prefix"])
+
+        daily_metrics = aggregate_daily_metrics(listing)
+        metric_rows.extend(build_metric_rows(feed, daily_metrics, start_date, end_date))
+
+    print(f"[INFO] Writing {len(metric_rows)} feed/day rows")
+    if not load_feed_metrics(metric_rows):
+        return False
+
+    # Cached baselines may hold the old rows
+    for key in feed_keys or list(FEEDS):
+        invalidate_baseline_cache(key)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today() - timedelta(days=1),
+                        help="Last day (YYYY-MM-DD, default: yesterday)")
+    parser.add_argument("--feeds", nargs="+", choices=list(FEEDS), help="Feed keys (default: all)")
+    parser.add_argument("--rescore", metavar="CSV", help="Also re-score the range and write the results to CSV")
+    args = parser.parse_args()
+
+    if args.start > args.end:
+        parser.error("--start must not be after --end")
+
+    if not backfill_feed_metrics(args.start, args.end, args.feeds):
+        raise SystemExit(1)
+
+    if args.rescore:
+        from analyzer import rescore_history
+        feed_labels = [FEEDS[key]["label"] for key in args.feeds or FEEDS]
+        rescored = rescore_history(args.start, args.end, feed_labels)
+        rescored.to_csv(args.rescore, index=False)
+        print(f"[INFO] Wrote {len(rescored)} scored rows to {args.rescore}")
+        print(rescored["status"].value_counts().to_string())
+
+if __name__ == "__main__":
+    main()
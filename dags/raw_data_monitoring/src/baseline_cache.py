@@ -0,0 +1,233 @@
+import gzip
+import json
+import os
+from datetime import date, timedelta
+from threading import Lock
+
+class BaselineCache:
+    """
+    Local copy of a feed's recent daily metrics with running sums over the baseline window.
+
+    The cache keeps the feed's (file count, size MB) series for every day in `covered`, the
+    contiguous range of days whose rows are known to match the BigQuery table (days without
+    a row are simply absent, like in the table). Running sums over the last requested
+    baseline window are updated incrementally: moving the window adds the new days and
+    evicts the old ones, and write-through rows that rewrite a day inside the window only
+    apply their delta. Averages are therefore the same as the BigQuery AVG over the window.
+
+    The cache is seeded (and periodically refreshed) from BigQuery with seed(); it is
+    stored as gzipped JSON, one file per feed.
+    """
+
+    def __init__(self, path: str, feed_label: str, data: dict | None = None):
+        self.path = path
+        self.feed_label = feed_label
+        data = data or {}
+        self.series = {date.fromisoformat(d): tuple(values) for d, values in data.get("series", {}).items()}
+        self.covered = _date_range(data.get("covered"))
+        self.refreshed = date.fromisoformat(data["refreshed"]) if data.get("refreshed") else None
+        self.window = _date_range(data.get("window"))
+        self.sums = data.get("sums", [0, 0.0, 0])
+        self._lock = Lock()
+
+    @classmethod
+    def load(cls, path: str, feed_label: str) -> "BaselineCache":
+        """
+        Load a feed's cache from disk, or start an empty one if the file does not exist.
+
+        Args:
+            path (str): Path of the gzipped JSON cache.
+            feed_label (str): The feed label (datafeed column).
+
+        Returns:
+            BaselineCache: The loaded cache.
+        """
+        if not os.path.exists(path):
+            return cls(path, feed_label)
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("feed_label") != feed_label:
+            return cls(path, feed_label)
+        return cls(path, feed_label, data)
+
+    def save(self):
+        """
+        Write the cache to disk atomically.
+        """
+        with self._lock:
+            data = {
+                "version": 1,
+                "feed_label": self.feed_label,
+                "series": {d.isoformat(): list(values) for d, values in sorted(self.series.items())},
+                "covered": _range_to_json(self.covered),
+                "refreshed": self.refreshed.isoformat() if self.refreshed else None,
+                "window": _range_to_json(self.window),
+                "sums": self.sums,
+            }
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def covers(self, start_date: date, end_date: date) -> bool:
+        """
+        Return True if every day from start_date to end_date is known to the cache.
+        """
+        return self.covered is not None and self.covered[0] <= start_date and end_date <= self.covered[1]
+
+    def needs_refresh(self, start_date: date, end_date: date, today: date, refresh_days: int) -> bool:
+        """
+        Return True if the window is not covered or the cache was last seeded more than refresh_days ago.
+        """
+        if not self.covers(start_date, end_date):
+            return True
+        return self.refreshed is None or (today - self.refreshed).days >= refresh_days
+
+    def seed(self, rows: list[dict], start_date: date, end_date: date, today: date):
+        """
+        Replace the cached range with rows read from BigQuery.
+
+        Args:
+            rows (list): Rows of this feed with date, filecount and filesize keys (metrics_store.query_daily_metrics).
+            start_date (date): First day that was read.
+            end_date (date): Last day that was read.
+            today (date): The run date, recorded as the refresh date.
+        """
+        with self._lock:
+            self.series = {
+                _as_date(row["date"]): (int(row["filecount"] or 0), float(row["filesize"] or 0.0))
+                for row in rows if start_date <= _as_date(row["date"]) <= end_date
+            }
+            self.covered = (start_date, end_date)
+            self.refreshed = today
+            self.window = None
+
+    def apply_rows(self, rows: list[dict]):
+        """
+        Write through rows that were just upserted (upsert_feed_metrics_bulk format).
+
+        Days inside the current window adjust the running sums by their delta. Rows that are
+        not contiguous with the covered range leave a gap, so the cache is invalidated instead.
+        """
+        rows = [row for row in rows if row["feed_label"] == self.feed_label]
+        if not rows:
+            return
+
+        days = [row["event_date"] for row in rows]
+        first, last = min(days), max(days)
+        with self._lock:
+            if self.covered is None or first > self.covered[1] + timedelta(days=1) or last < self.covered[0] - timedelta(days=1):
+                self._invalidate()
+                return
+
+            for row in rows:
+                day = row["event_date"]
+                values = (int(row["file_count"]), float(row["file_size"]))
+                previous = self.series.get(day)
+                self.series[day] = values
+                if self.window and self.window[0] <= day <= self.window[1]:
+                    self._remove_from_sums(previous)
+                    self._add_to_sums(values)
+
+            self.covered = (min(first, self.covered[0]), max(last, self.covered[1]))
+
+    def baseline(self, start_date: date, end_date: date) -> tuple[float, float] | None:
+        """
+        Average file count and size (MB) over the stored rows of a window.
+
+        Args:
+            start_date (date): The start date of the window (inclusive).
+            end_date (date): The end date of the window (inclusive).
+
+        Returns:
+            tuple: (avg_count, avg_size_mb), (0.0, 0.0) if the window has no rows, or None
+                   if the cache does not cover the window.
+        """
+        if not self.covers(start_date, end_date):
+            return None
+
+        with self._lock:
+            self._move_window(start_date, end_date)
+            count_sum, size_sum, rows = self.sums
+
+        if not rows:
+            return 0.0, 0.0
+        return count_sum / rows, size_sum / rows
+
+    def evict(self, before: date):
+        """
+        Drop every day older than `before`.
+        """
+        with self._lock:
+            for day in [d for d in self.series if d < before]:
+                del self.series[day]
+            if self.covered is not None:
+                if self.covered[1] < before:
+                    self._invalidate()
+                else:
+                    self.covered = (max(self.covered[0], before), self.covered[1])
+            if self.window is not None and self.window[0] < before:
+                self.window = None
+
+    def invalidate(self):
+        """
+        Forget everything, e.g. after the table was rewritten by another process.
+        """
+        with self._lock:
+            self._invalidate()
+
+    def _invalidate(self):
+        self.series = {}
+        self.covered = None
+        self.refreshed = None
+        self.window = None
+        self.sums = [0, 0.0, 0]
+
+    def _move_window(self, start_date: date, end_date: date):
+        """
+        Slide the running sums to a new window, recomputing them if the windows do not overlap.
+        """
+        if self.window == (start_date, end_date):
+            return
+
+        if self.window is None or start_date > self.window[1] or end_date < self.window[0]:
+            self.sums = [0, 0.0, 0]
+            for day in _days(start_date, end_date):
+                self._add_to_sums(self.series.get(day))
+        else:
+            old_start, old_end = self.window
+            for day in _days(old_start, min(old_end, start_date - timedelta(days=1))):
+                self._remove_from_sums(self.series.get(day))
+            for day in _days(max(old_start, end_date + timedelta(days=1)), old_end):
+                self._remove_from_sums(self.series.get(day))
+            for day in _days(start_date, min(end_date, old_start - timedelta(days=1))):
+                self._add_to_sums(self.series.get(day))
+            for day in _days(max(start_date, old_end + timedelta(days=1)), end_date):
+                self._add_to_sums(self.series.get(day))
+        self.window = (start_date, end_date)
+
+    def _add_to_sums(self, values):
+        if values is not None:
+            self.sums = [self.sums[0] + values[0], self.sums[1] + values[1], self.sums[2] + 1]
+
+    def _remove_from_sums(self, values):
+        if values is not None:
+            self.sums = [self.sums[0] - values[0], self.sums[1] - values[1], self.sums[2] - 1]
+
+def _days(start_date: date, end_date: date):
+    day = start_date
+    while day <= end_date:
+        yield day
+        day += timedelta(days=1)
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+def _date_range(value) -> tuple[date, date] | None:
+    return (date.fromisoformat(value[0]), date.fromisoformat(value[1])) if value else None
+
+def _range_to_json(value) -> list[str] | None:
+    return [value[0].isoformat(), value[1].isoformat()] if value else None
@@ -1,15 +1,84 @@
 from google.cloud import bigquery
 from google.api_core.exceptions import NotFound
-from datetime import date 
-from config import PROJECT_ID, DATASET_ID, TABLE_ID
+from datetime import date, datetime, timedelta, timezone
+from threading import Lock
+import time
+import uuid
+from config import PROJECT_ID, DATASET_ID, TABLE_ID, RUN_METRICS_TABLE_ID
+from utils import baseline_window
+from clients import get_bigquery_client
+import instrumentation
 
-client = bigquery.Client(project = PROJECT_ID)
+# Schema of the monitoring table; columns added later must be NULLABLE (see ensure_dataset_and_table_exist)
+METRICS_SCHEMA = [
+    bigquery.SchemaField("date", "DATE", mode="REQUIRED"),
+    bigquery.SchemaField("datafeed", "STRING", mode="REQUIRED"),
+    bigquery.SchemaField("filesize", "FLOAT64", mode="REQUIRED"),
+    bigquery.SchemaField("filecount", "INT64", mode="REQUIRED"),
+    bigquery.SchemaField("rowcount", "INT64", mode="NULLABLE"),
+    bigquery.SchemaField("sizesketch", "STRING", mode="NULLABLE"),
+]
+
+# Daily partitions on date, clustered by datafeed, so queries only scan the days (and feeds) they filter on
+PARTITION_FIELD = "date"
+CLUSTERING_FIELDS = ["datafeed"]
+
+# Attempts for a MERGE that conflicts with a concurrent one on the same table
+MERGE_MAX_ATTEMPTS = 3
+
+# Table reference cached once the dataset/table checks have passed in this process
+_verified_table_ref = None
+_verified_table_lock = Lock()
+
+def get_verified_table_ref():
+    """
+    Return the table reference, running the dataset/table checks only once per process.
+
+    Returns:
+        TableReference: The monitoring table, or None if the dataset does not exist.
+    """
+    global _verified_table_ref
+
+    with _verified_table_lock:
+        if _verified_table_ref is None:
+            _verified_table_ref = ensure_dataset_and_table_exist()
+        return _verified_table_ref
+
+def run_query(query: str, job_config: bigquery.QueryJobConfig | None = None):
+    """
+    Run a query job, wait for it and record its job count, bytes and slot time in the current run metrics.
+
+    Returns:
+        RowIterator: The query results.
+    """
+    query_job = get_bigquery_client().query(query, job_config=job_config)
+    result = query_job.result()  # Waits for job to complete
+
+    instrumentation.count("bq_jobs")
+    instrumentation.count("bq_bytes_processed", getattr(query_job, "total_bytes_processed", None) or 0)
+    instrumentation.count("bq_bytes_billed", getattr(query_job, "total_bytes_billed", None) or 0)
+    instrumentation.count("bq_slot_ms", getattr(query_job, "slot_millis", None) or 0)
+    return result
+
+def build_metrics_table(table_ref) -> bigquery.Table:
+    """
+    Table definition of the monitoring table: METRICS_SCHEMA, partitioned by day on date and clustered by datafeed.
+    """
+    table = bigquery.Table(table_ref, schema=METRICS_SCHEMA)
+    table.time_partitioning = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY, field=PARTITION_FIELD)
+    table.clustering_fields = CLUSTERING_FIELDS
+    return table
 
 def ensure_dataset_and_table_exist():
     """
     Ensure the BigQuery dataset and table exist, creating them if necessary. 
+
+    New tables are partitioned and clustered (build_metrics_table); an existing unpartitioned
+    table keeps working but should be converted once with migrate_table.py.
     """
 
+    client = get_bigquery_client()
+
     # Define dataset and table references
     dataset_ref = bigquery.DatasetReference(PROJECT_ID, DATASET_ID)
     table_ref = dataset_ref.table(TABLE_ID)
@@ -23,21 +92,27 @@ def ensure_dataset_and_table_exist():
 
     # Check/create table
     try:
-        client.get_table(table_ref)
+        table = client.get_table(table_ref)
     except NotFound:
-        schema = [
-            bigquery.SchemaField("date", "DATE", mode="REQUIRED"),
-            bigquery.SchemaField("datafeed", "STRING", mode="REQUIRED"),
-            bigquery.SchemaField("filesize", "FLOAT64", mode="REQUIRED"),
-            bigquery.SchemaField("filecount", "INT64", mode="REQUIRED"),
-        ]
-        table = bigquery.Table(table_ref, schema=schema)
-        table = client.create_table(table)
+        table = client.create_table(build_metrics_table(table_ref))
         print(f"[INFO] Created table {TABLE_ID}.")
+        return table_ref
+
+    if getattr(table, "time_partitioning", None) is None:
+        print(f"[WARN] Table {TABLE_ID} is not partitioned: every query scans its full history. "
+              f"Convert it with migrate_table.py.")
+
+    # Add the columns introduced after the table was created
+    existing = {field.name for field in table.schema}
+    missing = [field for field in METRICS_SCHEMA if field.name not in existing]
+    if missing:
+        table.schema = list(table.schema) + missing
+        client.update_table(table, ["schema"])
+        print(f"[INFO] Added columns {', '.join(field.name for field in missing)} to {TABLE_ID}.")
     
     return table_ref
 
-def upsert_feed_metrics(feed_label: str, event_date: date, file_count: int, file_size: float):
+def upsert_feed_metrics(feed_label: str, event_date: date, file_count: int, file_size: float) -> bool:
     """
     Upsert feed metrics into BigQuery table.
     
@@ -46,50 +121,183 @@ def upsert_feed_metrics(feed_label: str, event_date: date, file_count: int, file
         event_date (date): The date of the event.
         file_count (int): The number of files processed.
         file_size (float): The total size of files in MB.
+
+    Returns:
+        bool: True if the row was written.
+    """
+    return upsert_feed_metrics_bulk([{
+        "feed_label": feed_label,
+        "event_date": event_date,
+        "file_count": file_count,
+        "file_size": file_size,
+    }])
+
+def upsert_feed_metrics_bulk(rows: list[dict]) -> bool:
     """
+    Upsert many feed/day metrics into BigQuery table with a single MERGE job.
+
+    The rows are passed as one ARRAY<STRUCT> query parameter, so staging and merging
+    all feeds and days of a run costs one job. If the same feed and date appear more
+    than once, the last row wins.
+
+    Args:
+        rows (list): Dictionaries with feed_label, event_date, file_count and file_size (MB) keys,
+            and optional row_count and size_sketch (serialized; None keeps the stored value).
+
+    Returns:
+        bool: True if the rows were merged (or there were none), False if the table is
+              missing or the MERGE failed.
+    """
+    if not rows:
+        return True
+
     # Ensure dataset and table exist, if not no upsert will be performed
-    table_ref = ensure_dataset_and_table_exist()
+    table_ref = get_verified_table_ref()
     if table_ref is None:
         print("[WARN] Skipping BigQuery insert due to missing dataset.")
-        return
-    
+        return False
+
+    # MERGE allows a single source row per target row
+    unique_rows = {(row["feed_label"], row["event_date"]): row for row in rows}
+
+    # Configure the query job with parameters
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter("rows", "STRUCT", [
+                bigquery.StructQueryParameter(
+                    None,
+                    bigquery.ScalarQueryParameter("date", "DATE", row["event_date"].isoformat()),
+                    bigquery.ScalarQueryParameter("datafeed", "STRING", row["feed_label"]),
+                    bigquery.ScalarQueryParameter("filecount", "INT64", row["file_count"]),
+                    bigquery.ScalarQueryParameter("filesize", "FLOAT64", row["file_size"]),
+                    bigquery.ScalarQueryParameter("rowcount", "INT64", row.get("row_count")),
+                    bigquery.ScalarQueryParameter("sizesketch", "STRING", row.get("size_sketch")),
+                )
+                for row in unique_rows.values()
+            ]),
+        ]
+    )
+
+    feeds = sorted({feed_label for feed_label, _ in unique_rows})
+    days = [event_date for _, event_date in unique_rows]
+    return merge_metrics(table_ref, "SELECT date, datafeed, filecount, filesize, rowcount, sizesketch FROM UNNEST(@rows)",
+                         job_config, f"{len(unique_rows)} rows ({', '.join(feeds)})", min(days), max(days))
+
+def merge_metrics(table_ref, source: str, job_config: bigquery.QueryJobConfig | None, description: str,
+                  start_date: date, end_date: date) -> bool:
+    """
+    MERGE the rows selected by `source` (date, datafeed, filecount, filesize, rowcount, sizesketch) into the
+    monitoring table. NULL row counts and size sketches keep the stored values.
+
+    The target is filtered on the source's date range with constant parameters, so only
+    those partitions of the table are read.
+
+    Args:
+        table_ref (TableReference): The monitoring table.
+        source (str): SQL selecting the source rows.
+        job_config (QueryJobConfig): Job configuration holding the source's parameters, if any.
+        description (str): What is being merged, for logging.
+        start_date (date): First date of the source rows.
+        end_date (date): Last date of the source rows.
+
+    Returns:
+        bool: True if the MERGE succeeded.
+    """
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=list(job_config.query_parameters if job_config else []) + [
+            bigquery.ScalarQueryParameter("merge_start", "DATE", start_date.isoformat()),
+            bigquery.ScalarQueryParameter("merge_end", "DATE", end_date.isoformat()),
+        ]
+    )
+
     # Prepare the MERGE query for both updating and inserting data
     query = f"""
     MERGE `{table_ref}` T
     USING (
-      SELECT @event_date AS date,
-             @feed_label AS datafeed,
-             @file_count AS filecount,
-             @file_size AS filesize
+      {source}
     ) S
-    ON T.date = S.date AND T.datafeed = S.datafeed
+    ON T.date = S.date AND T.datafeed = S.datafeed AND T.date BETWEEN @merge_start AND @merge_end
     WHEN MATCHED THEN
       UPDATE SET
         T.filecount = S.filecount,
-        T.filesize = S.filesize
+        T.filesize = S.filesize,
+        T.rowcount = COALESCE(S.rowcount, T.rowcount),
+        T.sizesketch = COALESCE(S.sizesketch, T.sizesketch)
     WHEN NOT MATCHED THEN
-      INSERT (date, datafeed, filecount, filesize)
-      VALUES (S.date, S.datafeed, S.filecount, S.filesize)
+      INSERT (date, datafeed, filecount, filesize, rowcount, sizesketch)
+      VALUES (S.date, S.datafeed, S.filecount, S.filesize, S.rowcount, S.sizesketch)
     """
 
-    # Configure the query job with parameters
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ScalarQueryParameter("event_date", "DATE", event_date.isoformat()),
-            bigquery.ScalarQueryParameter("feed_label", "STRING", feed_label),
-            bigquery.ScalarQueryParameter("file_count", "INT64", file_count),
-            bigquery.ScalarQueryParameter("file_size", "FLOAT64", file_size),
-        ]
+    for attempt in range(1, MERGE_MAX_ATTEMPTS + 1):
+        try:
+            run_query(query, job_config)
+            print(f"[INFO] MERGE complete for {description}")
+            return True
+        except Exception as e:
+            # Per-feed tasks may MERGE into the table at the same time
+            if "concurrent update" in str(e) and attempt < MERGE_MAX_ATTEMPTS:
+                print(f"[WARN] MERGE conflicted with a concurrent update, retrying ({attempt}/{MERGE_MAX_ATTEMPTS})")
+                time.sleep(2 ** attempt)
+                continue
+            print(f"[ERROR] BigQuery MERGE failed for {description}: {e}")
+            return False
+
+def load_feed_metrics(rows: list[dict]) -> bool:
+    """
+    Write a large number of feed/day metrics with a load job into a staging table and one MERGE.
+
+    Meant for backfills: the rows are loaded as newline-delimited JSON (free, no DML quota),
+    merged into the monitoring table in a single job, and the staging table is dropped.
+
+    Args:
+        rows (list): Dictionaries with feed_label, event_date, file_count and file_size (MB) keys.
+
+    Returns:
+        bool: True if the rows were merged.
+    """
+    if not rows:
+        return True
+
+    table_ref = get_verified_table_ref()
+    if table_ref is None:
+        print("[WARN] Skipping BigQuery load due to missing dataset.")
+        return False
+
+    # MERGE allows a single source row per target row
+    unique_rows = {(row["feed_label"], row["event_date"]): row for row in rows}
+
+    staging_ref = bigquery.DatasetReference(PROJECT_ID, DATASET_ID).table(f"{TABLE_ID}_staging_{uuid.uuid4().hex[:12]}")
+    load_config = bigquery.LoadJobConfig(
+        schema=METRICS_SCHEMA,
+        source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
     )
+    json_rows = [
+        {"date": row["event_date"].isoformat(), "datafeed": row["feed_label"],
+         "filesize": row["file_size"], "filecount": row["file_count"], "rowcount": row.get("row_count"),
+         "sizesketch": row.get("size_sketch")}
+        for row in unique_rows.values()
+    ]
 
+    client = get_bigquery_client()
     try:
-        query_job = client.query(query, job_config=job_config)
-        query_job.result()  # Waits for job to complete
-        print(f"[INFO] MERGE complete for {feed_label} on {event_date}")
-    except Exception as e:
-        print(f"[ERROR] BigQuery MERGE failed for {feed_label} on {event_date}: {e}")
+        # The staging table expires on its own if it cannot be dropped below
+        staging_table = bigquery.Table(staging_ref, schema=METRICS_SCHEMA)
+        staging_table.expires = datetime.now(timezone.utc) + timedelta(days=1)
+        client.create_table(staging_table)
 
+        client.load_table_from_json(json_rows, staging_ref, job_config=load_config).result()
+        instrumentation.count("bq_load_jobs")
+        print(f"[INFO] Loaded {len(json_rows)} rows into {staging_ref.table_id}")
 
+        days = [event_date for _, event_date in unique_rows]
+        return merge_metrics(table_ref, f"SELECT date, datafeed, filecount, filesize, rowcount, sizesketch FROM `{staging_ref}`", None,
+                             f"{len(json_rows)} staged rows", min(days), max(days))
+    except Exception as e:
+        print(f"[ERROR] BigQuery load failed for {len(json_rows)} rows: {e}")
+        return False
+    finally:
+        client.delete_table(staging_ref, not_found_ok=True)
 
 def query_historical_baseline(feed_label: str, start_date: date, end_date: date):
     """
@@ -121,8 +329,7 @@ def query_historical_baseline(feed_label: str, start_date: date, end_date: date)
         ]
     )
 
-    query_job = client.query(query, job_config=job_config)
-    result = query_job.result()
+    result = run_query(query, job_config)
 
     row = next(result, None)
     if row:
@@ -131,3 +338,133 @@ def query_historical_baseline(feed_label: str, start_date: date, end_date: date)
         print(f"[WARN] No historical data for {feed_label} between {start_date} and {end_date}")
         return 0.0, 0.0
 
+def query_historical_baselines(baseline_requests: list[tuple[str, date]]) -> dict[tuple[str, date], tuple[float, float]]:
+    """
+    Query the historical baselines of many feeds and expected dates with a single query.
+
+    Each (feed_label, expected_date) pair is averaged over its own baseline window
+    (utils.baseline_window), exactly like query_historical_baseline, but all pairs are
+    evaluated in one BigQuery job grouped by feed and expected date.
+
+    Args:
+        baseline_requests (list): Tuples of (feed_label, expected_date).
+
+    Returns:
+        dict: Maps (feed_label, expected_date) to (average file count, average size in MB).
+              Pairs without history map to (0.0, 0.0).
+    """
+    if not baseline_requests:
+        return {}
+
+    table_ref = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
+
+    # Average file count and size per requested feed/date over each request's own window
+    query = f"""
+    SELECT r.datafeed, r.expected_date, AVG(t.filecount) AS avg_count, AVG(t.filesize) AS avg_size
+    FROM UNNEST(@baseline_requests) r
+    JOIN `{table_ref}` t
+      ON t.datafeed = r.datafeed AND t.date BETWEEN r.start_date AND r.end_date
+    WHERE t.date BETWEEN @window_start AND @window_end
+    GROUP BY r.datafeed, r.expected_date
+    """
+
+    struct_values = []
+    windows = []
+    for feed_label, expected_date in dict.fromkeys(baseline_requests):
+        start_date, end_date = baseline_window(expected_date)
+        windows.append((start_date, end_date))
+        struct_values.append(bigquery.StructQueryParameter(
+            None,
+            bigquery.ScalarQueryParameter("datafeed", "STRING", feed_label),
+            bigquery.ScalarQueryParameter("expected_date", "DATE", expected_date.isoformat()),
+            bigquery.ScalarQueryParameter("start_date", "DATE", start_date.isoformat()),
+            bigquery.ScalarQueryParameter("end_date", "DATE", end_date.isoformat()),
+        ))
+
+    # Configure the query job with parameters
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ArrayQueryParameter("baseline_requests", "STRUCT", struct_values),
+            # Constant bounds of all windows, so only those partitions are scanned
+            bigquery.ScalarQueryParameter("window_start", "DATE", min(start for start, _ in windows).isoformat()),
+            bigquery.ScalarQueryParameter("window_end", "DATE", max(end for _, end in windows).isoformat()),
+        ]
+    )
+
+    baselines = {}
+    for row in run_query(query, job_config):
+        baselines[(row["datafeed"], row["expected_date"])] = (row["avg_count"], row["avg_size"])
+
+    for feed_label, expected_date in baseline_requests:
+        if (feed_label, expected_date) not in baselines:
+            print(f"[WARN] No historical data for {feed_label} before {expected_date}")
+            baselines[(feed_label, expected_date)] = (0.0, 0.0)
+
+    return baselines
+
+def insert_run_metrics(rows: list[dict], run_date: date):
+    """
+    Append a run's instrumentation rows (instrumentation.RunMetrics.to_rows) to the companion
+    run metrics table, creating it if necessary. Does nothing when RUN_METRICS_TABLE_ID is not set.
+
+    Args:
+        rows (list): Dictionaries with run_id, datafeed, metric and value keys.
+        run_date (date): The date of the run.
+    """
+    if not RUN_METRICS_TABLE_ID or not rows:
+        return
+
+    client = get_bigquery_client()
+    table_ref = bigquery.DatasetReference(PROJECT_ID, DATASET_ID).table(RUN_METRICS_TABLE_ID)
+    try:
+        client.get_table(table_ref)
+    except NotFound:
+        schema = [
+            bigquery.SchemaField("run_id", "STRING", mode="REQUIRED"),
+            bigquery.SchemaField("run_date", "DATE", mode="REQUIRED"),
+            bigquery.SchemaField("datafeed", "STRING", mode="REQUIRED"),
+            bigquery.SchemaField("metric", "STRING", mode="REQUIRED"),
+            bigquery.SchemaField("value", "FLOAT64", mode="REQUIRED"),
+        ]
+        table = bigquery.Table(table_ref, schema=schema)
+        table.time_partitioning = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY, field="run_date")
+        client.create_table(table)
+        print(f"[INFO] Created table {RUN_METRICS_TABLE_ID}.")
+
+    errors = client.insert_rows_json(table_ref, [{**row, "run_date": run_date.isoformat()} for row in rows])
+    if errors:
+        print(f"[ERROR] Inserting run metrics failed: {errors}")
+    else:
+        print(f"[INFO] Recorded {len(rows)} run metrics in {RUN_METRICS_TABLE_ID}")
+
+def query_daily_metrics(start_date: date, end_date: date, feed_labels: list[str] | None = None) -> list[dict]:
+    """
+    Read the stored daily metrics of a date range.
+
+    Args:
+        start_date (date): The start date (inclusive).
+        end_date (date): The end date (inclusive).
+        feed_labels (list): Optional feed labels to restrict to.
+
+    Returns:
+        list: Dictionaries with date, datafeed, filecount, filesize, rowcount and sizesketch keys.
+    """
+    table_ref = f"{PROJECT_ID}.{DATASET_ID}.{TABLE_ID}"
+
+    query = f"""
+    SELECT date, datafeed, filecount, filesize, rowcount, sizesketch
+    FROM `{table_ref}`
+    WHERE date BETWEEN @start_date AND @end_date
+      AND (ARRAY_LENGTH(@feed_labels) = 0 OR datafeed IN UNNEST(@feed_labels))
+    ORDER BY datafeed, date
+    """
+
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("start_date", "DATE", start_date.isoformat()),
+            bigquery.ScalarQueryParameter("end_date", "DATE", end_date.isoformat()),
+            bigquery.ArrayQueryParameter("feed_labels", "STRING", feed_labels or []),
+        ]
+    )
+
+    return [dict(row.items()) for row in run_query(query, job_config)]
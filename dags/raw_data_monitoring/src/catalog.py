@@ -0,0 +1,264 @@
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable
+import numpy as np
+
+from size_sketch import NUM_BUCKETS, SizeSketch, bucket_indices
+from utils import PartitionDateParser
+
+# date.toordinal() of 1970-01-01, to convert ordinals to Arrow date32 days
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+class ObjectCatalog:
+    """
+    Compact columnar listing of a feed's objects for per-file analytics.
+
+    Instead of one dictionary per object, the catalog keeps one column per field:
+
+    - directories: interned partition paths, referenced by index from `dir_index`
+    - basenames: UTF-8 bytes of the file names, concatenated, with `name_offsets`
+    - sizes (bytes), generations and updated (microseconds since epoch) as int64
+    - partition dates as int32 ordinals (0 when the path has no date)
+
+    Columns are stdlib arrays while the catalog is built and are exposed to NumPy without
+    copying (see column()), so a million objects take tens of MB instead of hundreds.
+    """
+
+    def __init__(self):
+        self.directories = []
+        self._directory_ids = {}
+        self._directory_dates = []
+        self.dir_index = array("i")
+        self.basenames = bytearray()
+        self.name_offsets = array("q", [0])
+        self.sizes = array("q")
+        self.date_ordinals = array("i")
+        self.updated = array("q")
+        self.generations = array("q")
+        self._date_parser = PartitionDateParser()
+
+    @classmethod
+    def from_metadata(cls, file_metadata: Iterable[dict]) -> "ObjectCatalog":
+        """
+        Build a catalog from file metadata dictionaries (e.g. gcs_client.iter_gcs_metadata).
+
+        The input is consumed one object at a time, so it can be a streaming listing.
+        """
+        catalog = cls()
+        for file in file_metadata:
+            catalog.append(file["name"], file["size"], file.get("updated"), file.get("generation"))
+        return catalog
+
+    def append(self, name: str, size: int | None, updated: datetime | None = None, generation: int | None = None):
+        """
+        Add one object. Its partition date is parsed once per directory.
+        """
+        slash = name.rfind("/") + 1
+        directory = name[:slash]
+        directory_id = self._directory_ids.get(directory)
+        if directory_id is None:
+            directory_id = len(self.directories)
+            self._directory_ids[directory] = directory_id
+            self.directories.append(directory)
+            actual_date = self._date_parser.parse(directory) if directory else None
+            self._directory_dates.append(actual_date.toordinal() if actual_date else 0)
+
+        actual_ordinal = self._directory_dates[directory_id]
+        if not actual_ordinal:
+            # The partition may end in the file name itself
+            actual_date = self._date_parser.parse(name)
+            actual_ordinal = actual_date.toordinal() if actual_date else 0
+
+        self.dir_index.append(directory_id)
+        self.basenames += name[slash:].encode("utf-8")
+        self.name_offsets.append(len(self.basenames))
+        self.sizes.append(size or 0)
+        self.date_ordinals.append(actual_ordinal)
+        self.updated.append(_to_micros(updated))
+        self.generations.append(generation or 0)
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        NumPy view (no copy) of a column: dir_index, sizes, date_ordinals, updated or generations.
+        """
+        values = getattr(self, name)
+        return np.frombuffer(values, dtype=np.int32 if values.typecode == "i" else np.int64)
+
+    def name(self, i: int) -> str:
+        """
+        Full object name of row i.
+        """
+        basename = self.basenames[self.name_offsets[i]:self.name_offsets[i + 1]].decode("utf-8")
+        return self.directories[self.dir_index[i]] + basename
+
+    def names(self, indices: Iterable[int] | None = None) -> list[str]:
+        """
+        Full object names of the given rows (default: all rows).
+        """
+        return [self.name(i) for i in (range(len(self)) if indices is None else indices)]
+
+    def group_by_date(self) -> dict[date, dict]:
+        """
+        Per-date totals in aggregator.aggregate_daily_metrics format (objects without a date are ignored).
+        """
+        ordinals = self.column("date_ordinals")
+        sizes = self.column("sizes")
+        dated = ordinals > 0
+        if not dated.any():
+            return {}
+
+        days, inverse = np.unique(ordinals[dated], return_inverse=True)
+        dated_sizes = sizes[dated]
+        counts = np.bincount(inverse, minlength=len(days))
+        totals = np.zeros(len(days), dtype=np.int64)
+        np.add.at(totals, inverse, dated_sizes)
+        minimums = np.full(len(days), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(minimums, inverse, dated_sizes)
+        maximums = np.zeros(len(days), dtype=np.int64)
+        np.maximum.at(maximums, inverse, dated_sizes)
+        # One size histogram per day from a single bincount over (day, bucket) pairs
+        histograms = np.bincount(inverse * NUM_BUCKETS + bucket_indices(dated_sizes),
+                                 minlength=len(days) * NUM_BUCKETS).reshape(len(days), NUM_BUCKETS)
+
+        return {
+            date.fromordinal(int(day)): {
+                "file_count": int(count),
+                "total_bytes": int(total),
+                "min_size": int(minimum),
+                "max_size": int(maximum),
+                "size_sketch": SizeSketch(histogram.tolist()),
+            }
+            for day, count, total, minimum, maximum, histogram in zip(days, counts, totals, minimums, maximums, histograms)
+        }
+
+    def mask(self, start_date: date | None = None, end_date: date | None = None,
+             min_size: int | None = None, max_size: int | None = None) -> np.ndarray:
+        """
+        Boolean row mask for a partition date range and/or a size range (bounds inclusive).
+        """
+        keep = np.ones(len(self), dtype=bool)
+        ordinals = self.column("date_ordinals")
+        sizes = self.column("sizes")
+        if start_date is not None:
+            keep &= ordinals >= start_date.toordinal()
+        if end_date is not None:
+            keep &= (ordinals > 0) & (ordinals <= end_date.toordinal())
+        if min_size is not None:
+            keep &= sizes >= min_size
+        if max_size is not None:
+            keep &= sizes <= max_size
+        return keep
+
+    def filter(self, mask: np.ndarray | None = None, **bounds) -> "ObjectCatalog":
+        """
+        Return a new catalog with the rows selected by a boolean mask or by mask() bounds.
+
+        Examples:
+            catalog.filter(start_date=day, end_date=day)
+            catalog.filter(max_size=1_000_000)  # small files
+        """
+        if mask is None:
+            mask = self.mask(**bounds)
+        return self.take(np.flatnonzero(mask))
+
+    def take(self, indices: np.ndarray) -> "ObjectCatalog":
+        """
+        Return a new catalog with the given rows (directory strings are shared, not copied).
+        """
+        subset = ObjectCatalog()
+        subset.directories = list(self.directories)
+        subset._directory_ids = dict(self._directory_ids)
+        subset._directory_dates = list(self._directory_dates)
+
+        offsets = self.column("name_offsets")
+        starts, ends = offsets[indices], offsets[np.asarray(indices) + 1]
+        basenames = bytearray()
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            basenames += self.basenames[start:end]
+        subset.basenames = basenames
+        subset.name_offsets = array("q", [0])
+        subset.name_offsets.frombytes(np.cumsum(ends - starts, dtype=np.int64).tobytes())
+
+        for name in ("dir_index", "sizes", "date_ordinals", "updated", "generations"):
+            values = getattr(self, name)
+            setattr(subset, name, array(values.typecode, self.column(name)[indices].tobytes()))
+        return subset
+
+    def to_arrow(self):
+        """
+        Convert to a pyarrow Table (directory dictionary-encoded, date32 dates, UTC timestamps).
+        """
+        import pyarrow as pa  # Only needed for snapshots
+
+        offsets = pa.array(self.column("name_offsets"), type=pa.int64())
+        ordinals = self.column("date_ordinals")
+        dates = np.where(ordinals > 0, ordinals - EPOCH_ORDINAL, 0).astype(np.int32)
+        return pa.table({
+            "directory": pa.DictionaryArray.from_arrays(
+                pa.array(self.column("dir_index"), type=pa.int32()), pa.array(self.directories, type=pa.string())
+            ),
+            "basename": pa.LargeStringArray.from_buffers(len(self), offsets.buffers()[1], pa.py_buffer(bytes(self.basenames))),
+            "size": pa.array(self.column("sizes"), type=pa.int64()),
+            "actual_date": pa.array(dates, type=pa.int32(), mask=ordinals == 0).cast(pa.date32()),
+            "updated": pa.array(self.column("updated"), type=pa.int64()).cast(pa.timestamp("us", tz="UTC")),
+            "generation": pa.array(self.column("generations"), type=pa.int64()),
+        })
+
+    @classmethod
+    def from_arrow(cls, table) -> "ObjectCatalog":
+        """
+        Rebuild a catalog from a table written by to_arrow.
+        """
+        import pyarrow as pa  # Only needed for snapshots
+
+        catalog = cls()
+        directory = table.column("directory").combine_chunks()
+        if not pa.types.is_dictionary(directory.type):
+            directory = directory.dictionary_encode()
+        catalog.directories = directory.dictionary.to_pylist()
+        catalog._directory_ids = {path: i for i, path in enumerate(catalog.directories)}
+        catalog._directory_dates = []
+        for path in catalog.directories:
+            actual_date = catalog._date_parser.parse(path) if path else None
+            catalog._directory_dates.append(actual_date.toordinal() if actual_date else 0)
+        catalog.dir_index = array("i", directory.indices.to_numpy(zero_copy_only=False).astype(np.int32).tobytes())
+
+        basenames = table.column("basename").combine_chunks().cast(pa.large_string())
+        offsets = np.frombuffer(basenames.buffers()[1], dtype=np.int64)[basenames.offset:basenames.offset + len(basenames) + 1]
+        catalog.basenames = bytearray(basenames.buffers()[2].to_pybytes()[offsets[0]:offsets[-1]])
+        catalog.name_offsets = array("q", (offsets - offsets[0]).tobytes())
+
+        # Missing dates become ordinal 0
+        dates = table.column("actual_date").cast(pa.int32()).fill_null(-EPOCH_ORDINAL).to_numpy()
+        catalog.date_ordinals = array("i", (dates + EPOCH_ORDINAL).astype(np.int32).tobytes())
+        catalog.sizes = array("q", table.column("size").to_numpy().astype(np.int64).tobytes())
+        catalog.updated = array("q", table.column("updated").cast(pa.int64()).to_numpy().astype(np.int64).tobytes())
+        catalog.generations = array("q", table.column("generation").to_numpy().astype(np.int64).tobytes())
+        return catalog
+
+    def save_parquet(self, path: str):
+        """
+        Write a Parquet snapshot of the catalog.
+        """
+        import pyarrow.parquet as pq  # Only needed for snapshots
+        pq.write_table(self.to_arrow(), path, compression="zstd")
+
+    @classmethod
+    def load_parquet(cls, path: str) -> "ObjectCatalog":
+        """
+        Read a Parquet snapshot written by save_parquet.
+        """
+        import pyarrow.parquet as pq  # Only needed for snapshots
+        return cls.from_arrow(pq.read_table(path))
+
+def _to_micros(updated: datetime | None) -> int:
+    if updated is None:
+        return 0
+    if updated.tzinfo is None:
+        updated = updated.replace(tzinfo=timezone.utc)
+    return (updated - EPOCH) // MICROSECOND
@@ -0,0 +1,185 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+from array import array
+from datetime import date
+from threading import Lock
+from typing import Iterable, Iterator
+
+import numpy as np
+
+def content_digest(md5_hash: str | None, crc32c: str | None, size: int | None) -> int | None:
+    """
+    64-bit content key of an object from the checksums returned by the listing.
+
+    Composite objects have no md5Hash; their crc32c is combined with the size instead.
+
+    Args:
+        md5_hash (str): Base64 MD5 of the object, if any.
+        crc32c (str): Base64 CRC32C of the object, if any.
+        size (int): Object size in bytes.
+
+    Returns:
+        int: Signed 64-bit digest, or None if the object has no checksum.
+    """
+    if not md5_hash and not crc32c:
+        return None
+    key = f"{md5_hash or ''}:{crc32c or ''}:{size or 0}".encode("ascii")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little", signed=True)
+
+class ChecksumIndex:
+    """
+    Content digests of a feed's objects per day partition, over a rolling window of days.
+
+    Each day keeps two int64 arrays, the digests (content_digest) and sizes of its objects,
+    sorted by digest: 16 bytes per object, whatever the object names. An object is a
+    duplicate when the same content was already delivered in an earlier day of the index or
+    earlier in its own day, e.g. a vendor re-uploading a file under a new name. The index
+    is stored as gzipped JSON with base64-encoded arrays, one file per feed.
+    """
+
+    def __init__(self, path: str, days: dict[date, tuple[np.ndarray, np.ndarray]] | None = None):
+        self.path = path
+        self.days = days or {}
+        self._lock = Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "ChecksumIndex":
+        """
+        Load an index from disk, or start an empty one if the file does not exist.
+        """
+        if not os.path.exists(path):
+            return cls(path)
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        days = {
+            date.fromisoformat(day): (_decode(digests), _decode(sizes))
+            for day, (digests, sizes) in data.get("days", {}).items()
+        }
+        return cls(path, days)
+
+    def save(self):
+        """
+        Write the index to disk atomically.
+        """
+        with self._lock:
+            data = {
+                "version": 1,
+                "days": {day.isoformat(): [_encode(digests), _encode(sizes)]
+                         for day, (digests, sizes) in sorted(self.days.items())},
+            }
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def set_day(self, day: date, digests: Iterable[int], sizes: Iterable[int]):
+        """
+        Replace a day with the objects of a complete listing of its partition.
+        """
+        digests = np.fromiter(digests, dtype=np.int64)
+        sizes = np.fromiter(sizes, dtype=np.int64)
+        order = np.argsort(digests, kind="stable")
+        with self._lock:
+            self.days[day] = (digests[order], sizes[order])
+
+    def duplicates(self, day: date) -> tuple[int, int] | None:
+        """
+        Count the objects of a day whose content was already delivered.
+
+        Returns:
+            tuple: (duplicate count, duplicate bytes), or None if the day is not indexed.
+        """
+        with self._lock:
+            if day not in self.days:
+                return None
+            digests, sizes = self.days[day]
+            earlier = [values for other, (values, _) in self.days.items() if other < day]
+
+        # Repeats within the day: every occurrence after the first of a digest (arrays are sorted)
+        duplicate = np.zeros(len(digests), dtype=bool)
+        duplicate[1:] = digests[1:] == digests[:-1]
+        if earlier:
+            duplicate |= np.isin(digests, np.concatenate(earlier))
+        return int(duplicate.sum()), int(sizes[duplicate].sum())
+
+    def evict(self, before: date):
+        """
+        Drop every day older than `before`.
+        """
+        with self._lock:
+            for day in [d for d in self.days if d < before]:
+                del self.days[day]
+
+class ChecksumCollector:
+    """
+    Records the digests of streamed listings, per day, while passing the files through.
+
+    Usage:
+        collector = ChecksumCollector(since, until, min_size)
+        daily_metrics = aggregate_daily_metrics(collector.wrap(listing, window_days))
+        collector.store(index)
+
+    Only the days from `since` to `until` are recorded, so a full-prefix listing buffers no more
+    than the index keeps. Files smaller than `min_size` (e.g. empty or header-only files, which
+    are legitimately identical) are not recorded, so they are never counted as re-deliveries.
+    """
+
+    def __init__(self, since: date | None = None, until: date | None = None, min_size: int = 0):
+        self.since = since
+        self.until = until
+        self.min_size = min_size
+        self.digests = {}
+        self.sizes = {}
+        self.listed_days = set()
+        self.skipped = False
+
+    def _records(self, day: date | None) -> bool:
+        return bool(day) and (self.since is None or day >= self.since) and (self.until is None or day <= self.until)
+
+    def wrap(self, file_metadata: Iterable[dict], listed_days: Iterable[date] = ()) -> Iterator[dict]:
+        """
+        Pass the files of a listing through, recording the digests of the files of the collected days.
+
+        Args:
+            file_metadata (iterable): File metadata with "checksum", "size" and "actual_date" keys.
+            listed_days (iterable): Days the listing covers completely (days without objects
+                become empty in the index).
+        """
+        self.listed_days.update(day for day in listed_days if self._records(day))
+        for file in file_metadata:
+            digest = file.get("checksum")
+            actual_date = file.get("actual_date")
+            size = file["size"] or 0
+            if digest is not None and size >= self.min_size and self._records(actual_date):
+                if actual_date not in self.digests:
+                    self.digests[actual_date] = array("q")
+                    self.sizes[actual_date] = array("q")
+                self.digests[actual_date].append(digest)
+                self.sizes[actual_date].append(size)
+            yield file
+
+    def skip(self):
+        """
+        Record that the window was not listed (e.g. served from event counters), so the
+        indexed days may be stale and should not be used to flag duplicates.
+        """
+        self.skipped = True
+
+    def store(self, index: ChecksumIndex):
+        """
+        Replace the listed days in the index.
+        """
+        for day in self.listed_days | set(self.digests):
+            index.set_day(day, self.digests.get(day, ()), self.sizes.get(day, ()))
+
+def _encode(values: np.ndarray) -> str:
+    return base64.b64encode(values.astype("<i8").tobytes()).decode("ascii")
+
+def _decode(value: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype="<i8").astype(np.int64)
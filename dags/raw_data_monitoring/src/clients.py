@@ -0,0 +1,75 @@
+from threading import Lock
+from config import PROJECT_ID, LISTING_MAX_WORKERS, FEED_MAX_WORKERS
+
+# Connections kept per host: every concurrent partition listing of every feed, plus BigQuery calls
+HTTP_POOL_SIZE = LISTING_MAX_WORKERS * FEED_MAX_WORKERS + 4
+
+_lock = Lock()
+_credentials = None
+_http_session = None
+_bigquery_client = None
+_storage_client = None
+
+def get_http_session():
+    """
+    Return the process-wide authorized HTTP session shared by the BigQuery and GCS clients.
+
+    Credentials are looked up (Application Default Credentials) on first use only.
+    """
+    global _credentials, _http_session
+    with _lock:
+        if _http_session is None:
+            import google.auth
+            from google.auth.transport.requests import AuthorizedSession
+            from requests.adapters import HTTPAdapter
+
+            _credentials, _ = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+            _http_session = AuthorizedSession(_credentials)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            _http_session.mount("https://", adapter)
+        return _http_session
+
+def get_bigquery_client():
+    """
+    Return the process-wide BigQuery client, creating it on first use.
+    """
+    global _bigquery_client
+    if _bigquery_client is None:
+        session = get_http_session()
+        from google.cloud import bigquery
+        with _lock:
+            if _bigquery_client is None:
+                _bigquery_client = bigquery.Client(project=PROJECT_ID, credentials=_credentials, _http=session)
+    return _bigquery_client
+
+def get_storage_client():
+    """
+    Return the process-wide Cloud Storage client, creating it on first use.
+    """
+    global _storage_client
+    if _storage_client is None:
+        session = get_http_session()
+        from google.cloud import storage
+        with _lock:
+            if _storage_client is None:
+                _storage_client = storage.Client(project=PROJECT_ID, credentials=_credentials, _http=session)
+    return _storage_client
+
+def set_clients(bigquery_client=None, storage_client=None):
+    """
+    Install clients to use instead of the default ones (tests, benchmarks). None leaves a client unchanged.
+    """
+    global _bigquery_client, _storage_client
+    with _lock:
+        if bigquery_client is not None:
+            _bigquery_client = bigquery_client
+        if storage_client is not None:
+            _storage_client = storage_client
+
+def reset_clients():
+    """
+    Drop the shared clients and session; the next call creates new ones.
+    """
+    global _credentials, _http_session, _bigquery_client, _storage_client
+    with _lock:
+        _credentials = _http_session = _bigquery_client = _storage_client = None
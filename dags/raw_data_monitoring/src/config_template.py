@@ -11,6 +11,10 @@ ALERT_RECIPIENTS = {
 }
 
 # Data feeds configuration
+# Feeds are expected to use 'year=YYYY/month=MM/day=DD/' folders under the prefix so only the
+# analysis window is listed. Add "partitioned": False to a feed to always list its whole prefix.
+# Add "row_counts": True to a partitioned Parquet feed to also read each new file's footer (row counts,
+# truncated files, schema changes) with small ranged reads.
 FEEDS = {
     "geo": {
         "label": "Geolocation",
@@ -34,5 +38,78 @@ PROJECT_ID = "your-gcp-project-id"
 DATASET_ID = "your_dataset_name"
 TABLE_ID = "your_table_name"
 
+# Optional companion table for the monitor's own runtime/cost metrics (None to disable)
+RUN_METRICS_TABLE_ID = None
+
+# Maximum number of concurrent GCS partition listings per feed
+LISTING_MAX_WORKERS = 8
+
+# Maximum number of feeds processed concurrently (each runs up to LISTING_MAX_WORKERS listings)
+FEED_MAX_WORKERS = 4
+
+# Directory for persistent monitoring state (Composer syncs /home/airflow/gcs/data with the environment bucket)
+STATE_DIR = "/home/airflow/gcs/data/raw_data_monitoring"
+
+# Where the daily metrics are stored: "bigquery" (DATASET_ID.TABLE_ID) or "sqlite" (a local history
+# file at METRICS_STORE_PATH, for dry runs and when BigQuery is unavailable; see metrics_store.py)
+METRICS_STORE = "bigquery"
+METRICS_STORE_PATH = f"{STATE_DIR}/raw_data_monitoring.sqlite"
+
+# Listing manifest: partitions older than MANIFEST_RELIST_DAYS are read from the manifest instead of re-listed.
+# The analysis day (today - 6) is listed, and listed again the next run to catch files delivered a day late;
+# the 6 older days of the upsert window come from the manifest unless notifications flag them as changed.
+# Off by default: without EVENT_TRACKING_ENABLED, files delivered to those older days are not picked up.
+MANIFEST_ENABLED = False
+MANIFEST_RELIST_DAYS = 7
+MANIFEST_RETENTION_DAYS = 45
+
+# Baseline cache: per-feed daily series in STATE_DIR so baselines need no BigQuery read,
+# re-seeded from BigQuery every BASELINE_CACHE_REFRESH_DAYS days. Off by default, like the other state kept in STATE_DIR.
+BASELINE_CACHE_ENABLED = False
+BASELINE_CACHE_REFRESH_DAYS = 7
+
+# Event-driven tracking: per-day counters kept from GCS object notifications (dag_feed_events.py)
+# replace the nightly listing while the consumer has pulled within EVENT_MAX_STALENESS_MINUTES.
+# Each feed bucket needs a notification config (gcloud storage buckets notifications create
+# gs://<bucket> --topic=<topic> --event-types=OBJECT_FINALIZE,OBJECT_DELETE) feeding EVENT_SUBSCRIPTION.
+EVENT_TRACKING_ENABLED = False
+EVENT_SUBSCRIPTION = f"projects/{PROJECT_ID}/subscriptions/gcs-feed-notifications"
+EVENT_MAX_STALENESS_MINUTES = 60
+
+# Parquet footer inspection for feeds with "row_counts": True: concurrent ranged reads per feed
+# and bytes read from the end of each new object (a second read fetches larger footers)
+FOOTER_MAX_WORKERS = 16
+FOOTER_READ_BYTES = 64 * 1024
+
+# Checksum index: the md5Hash/crc32c returned by listings flag files re-delivered under a new name
+# within CHECKSUM_INDEX_DAYS; EXCLUDE_DUPLICATE_FILES also removes them from the upserted metrics.
+# Off by default: it adds md5Hash/crc32c to every listing and keeps an index per feed in STATE_DIR.
+CHECKSUM_INDEX_ENABLED = False
+CHECKSUM_INDEX_DAYS = 35
+# Files smaller than this (e.g. empty or header-only Parquet) are legitimately identical and never flagged
+DUPLICATE_MIN_FILE_BYTES = 1024
+EXCLUDE_DUPLICATE_FILES = False
+
+# Run checkpoints: completed listings, upserts and analyses of an Airflow run are recorded per feed
+# in STATE_DIR so retries resume the missing steps; checkpoints of runs that never completed are
+# removed after RUN_STATE_RETENTION_DAYS days. Off by default, like the other state kept in STATE_DIR.
+RUN_STATE_ENABLED = False
+RUN_STATE_RETENTION_DAYS = 3
+
+# Profiling mode, also switched on by the raw_data_monitoring_profile Airflow Variable or the
+# RAW_DATA_MONITORING_PROFILE environment variable: stack samples of all threads every
+# PROFILING_SAMPLE_INTERVAL_MS, top allocations and per-call GCS/BigQuery latencies, written per run
+# id under PROFILING_DIR (a local directory or a gs://bucket/prefix path)
+PROFILING_ENABLED = False
+PROFILING_DIR = f"{STATE_DIR}/profiles"
+PROFILING_SAMPLE_INTERVAL_MS = 10
+
+# Slack delivery: request timeout, attempts per message chunk (429 Retry-After is honored),
+# chunk size and how long the delivered chunks of an identical message are not re-posted (e.g. on Airflow retries)
+SLACK_TIMEOUT_SECONDS = 10
+SLACK_MAX_ATTEMPTS = 5
+SLACK_MAX_MESSAGE_CHARS = 3500
+SLACK_SUPPRESSION_HOURS = 12
+
 # Looker Studio report link
 LOOKER_LINK = "https://lookerstudio.google.com/reporting/your-report-id"
@@ -0,0 +1,392 @@
+"""
+Event-driven feed tracking from GCS object notifications.
+
+The bucket of each feed publishes OBJECT_FINALIZE/OBJECT_DELETE notifications (JSON_API_V1
+payload) to a Pub/Sub topic. consume_events pulls them, maps each object to its feed and
+partition date and keeps per-feed, per-day counters in STATE_DIR, so the nightly run can
+read the counters instead of listing the buckets.
+
+FileEventSource replays notifications from a newline-delimited JSON file, one
+{"attributes": {...}, "data": {...}} message per line, to run the whole path offline:
+
+    python feed_events.py --events notifications.ndjson --state-dir /tmp/feed_events
+"""
+import argparse
+import gzip
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+from threading import Lock
+from typing import Iterable
+
+from size_sketch import SizeSketch
+from utils import PartitionDateParser
+
+EVENT_FINALIZE = "OBJECT_FINALIZE"
+EVENT_DELETE = "OBJECT_DELETE"
+
+def parse_notification(attributes: dict, data: bytes | str | dict | None) -> dict | None:
+    """
+    Normalize a GCS Pub/Sub notification.
+
+    Args:
+        attributes (dict): Message attributes (eventType, bucketId, objectId, objectGeneration).
+        data (bytes | str | dict): The JSON_API_V1 object resource, if any.
+
+    Returns:
+        dict: type, bucket, name, generation and size, or None for other event types.
+    """
+    event_type = attributes.get("eventType")
+    if event_type not in (EVENT_FINALIZE, EVENT_DELETE):
+        return None
+
+    if isinstance(data, (bytes, str)):
+        data = json.loads(data) if data else {}
+    data = data or {}
+
+    return {
+        "type": event_type,
+        "bucket": attributes.get("bucketId") or data.get("bucket"),
+        "name": attributes.get("objectId") or data.get("name"),
+        "generation": int(attributes.get("objectGeneration") or data.get("generation") or 0),
+        "size": int(data.get("size") or 0),
+    }
+
+def match_feed(bucket: str, name: str, feeds: dict) -> str | None:
+    """
+    Return the key of the feed an object belongs to, or None.
+
+    Prefixes match whole path segments, so a '.../region=USA' prefix does not match '.../region=USA_x/'.
+    """
+    for key, feed in feeds.items():
+        if feed["bucket"] == bucket and name.startswith(feed["prefix"].rstrip("/") + "/"):
+            return key
+    return None
+
+class FeedEventCounters:
+    """
+    Per-day object counters of one feed, maintained from notifications.
+
+    Every partition keeps the (name -> generation, size) map of its live objects and the
+    generations of deleted ones, so redelivered and out-of-order notifications are applied
+    once: a finalize only counts if its generation is newer than what is known, a delete
+    only removes the generation it names. file_count, total_bytes, min_size and max_size
+    are updated incrementally.
+
+    Counters are complete from `complete_from` on, the first day seeded from a listing.
+    """
+
+    def __init__(self, path: str, feed_key: str, data: dict | None = None):
+        self.path = path
+        self.feed_key = feed_key
+        data = data or {}
+        self.partitions = data.get("partitions", {})
+        self.complete_from = date.fromisoformat(data["complete_from"]) if data.get("complete_from") else None
+        self.pulled_at = datetime.fromisoformat(data["pulled_at"]) if data.get("pulled_at") else None
+        self._lock = Lock()
+
+    @classmethod
+    def load(cls, path: str, feed_key: str) -> "FeedEventCounters":
+        """
+        Load a feed's counters from disk, or start empty ones if the file does not exist.
+        """
+        if not os.path.exists(path):
+            return cls(path, feed_key)
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls(path, feed_key, json.load(f))
+
+    def save(self):
+        """
+        Write the counters to disk atomically.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            data = {
+                "version": 1,
+                "feed_key": self.feed_key,
+                "complete_from": self.complete_from.isoformat() if self.complete_from else None,
+                "pulled_at": self.pulled_at.isoformat() if self.pulled_at else None,
+                "partitions": self.partitions,
+            }
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def apply(self, event: dict, date_parser: PartitionDateParser | None = None) -> bool:
+        """
+        Apply a notification from parse_notification.
+
+        Args:
+            event (dict): The notification.
+            date_parser (PartitionDateParser): Parser counting the names without a partition date
+                (nothing is printed per object).
+
+        Returns:
+            bool: True if the counters changed.
+        """
+        if "$folder$" in event["name"]:
+            return False
+        day = (date_parser or PartitionDateParser()).parse(event["name"])
+        if day is None:
+            return False
+
+        name, generation = event["name"], event["generation"]
+        with self._lock:
+            entry = self.partitions.setdefault(day.isoformat(), _empty_partition())
+            current = entry["objects"].get(name)
+
+            if event["type"] == EVENT_FINALIZE:
+                if (current and current[0] >= generation) or entry["deleted"].get(name, -1) >= generation:
+                    return False
+                if current:
+                    _remove_object(entry, current[1])
+                entry["objects"][name] = [generation, event["size"]]
+                _add_object(entry, event["size"])
+                return True
+
+            if current is None or current[0] > generation:
+                # Not live yet (out of order) or an older generation: remember it so it never counts
+                entry["deleted"][name] = max(entry["deleted"].get(name, -1), generation)
+                return False
+
+            del entry["objects"][name]
+            entry["deleted"][name] = generation
+            _remove_object(entry, current[1])
+            return True
+
+    def seed_partition(self, day: date, files: Iterable[dict]):
+        """
+        Replace a partition with a fresh listing (files with name, size and generation keys).
+        """
+        entry = _empty_partition()
+        for file in files:
+            entry["objects"][file["name"]] = [file.get("generation") or 0, file["size"] or 0]
+            _add_object(entry, file["size"] or 0)
+
+        with self._lock:
+            previous = self.partitions.get(day.isoformat())
+            if previous:
+                # Keep tombstones so late notifications about deleted objects stay ignored
+                entry["deleted"] = previous["deleted"]
+            self.partitions[day.isoformat()] = entry
+
+    def get_daily_metrics(self, start_date: date, end_date: date) -> dict[date, dict] | None:
+        """
+        Per-date totals in aggregator.aggregate_daily_metrics format.
+
+        Returns:
+            dict: The non-empty days of the range, or None if the counters are not complete for it.
+        """
+        if self.complete_from is None or start_date < self.complete_from:
+            return None
+
+        daily_metrics = {}
+        with self._lock:
+            for day_key, entry in self.partitions.items():
+                day = date.fromisoformat(day_key)
+                if start_date <= day <= end_date and entry["file_count"]:
+                    totals = {key: entry[key] for key in ("file_count", "total_bytes", "min_size", "max_size")}
+                    totals["size_sketch"] = SizeSketch.from_sizes(size for _, size in entry["objects"].values())
+                    daily_metrics[day] = totals
+        return daily_metrics
+
+    def is_current(self, now: datetime, max_staleness_minutes: int) -> bool:
+        """
+        Return True if notifications were pulled within the last max_staleness_minutes.
+        """
+        return self.pulled_at is not None and now - self.pulled_at <= timedelta(minutes=max_staleness_minutes)
+
+    def evict(self, before: date):
+        """
+        Drop every partition older than `before`.
+        """
+        cutoff = before.isoformat()
+        with self._lock:
+            for day_key in [d for d in self.partitions if d < cutoff]:
+                del self.partitions[day_key]
+            if self.complete_from and self.complete_from < before:
+                self.complete_from = before
+
+def _empty_partition() -> dict:
+    return {"file_count": 0, "total_bytes": 0, "min_size": 0, "max_size": 0, "objects": {}, "deleted": {}}
+
+def _add_object(entry: dict, size: int):
+    entry["min_size"] = size if entry["file_count"] == 0 else min(entry["min_size"], size)
+    entry["max_size"] = size if entry["file_count"] == 0 else max(entry["max_size"], size)
+    entry["file_count"] += 1
+    entry["total_bytes"] += size
+
+def _remove_object(entry: dict, size: int):
+    entry["file_count"] -= 1
+    entry["total_bytes"] -= size
+    if size <= entry["min_size"] or size >= entry["max_size"]:
+        sizes = [object_size for _, object_size in entry["objects"].values()]
+        # The removed object may still be in the map (replaced by a new generation)
+        if len(sizes) > entry["file_count"]:
+            sizes.remove(size)
+        entry["min_size"] = min(sizes, default=0)
+        entry["max_size"] = max(sizes, default=0)
+
+class PubSubEventSource:
+    """
+    Pulls notifications from a Pub/Sub subscription.
+
+    Args:
+        subscription (str): Full subscription path (projects/<project>/subscriptions/<name>).
+    """
+
+    def __init__(self, subscription: str):
+        from google.cloud import pubsub_v1  # Only needed in event-driven mode
+        self.subscription = subscription
+        self.subscriber = pubsub_v1.SubscriberClient()
+
+    def pull(self, max_messages: int) -> list[tuple[str, dict, bytes]]:
+        """
+        Pull up to max_messages as (ack_id, attributes, data) tuples.
+        """
+        response = self.subscriber.pull(
+            request={"subscription": self.subscription, "max_messages": max_messages}, timeout=30
+        )
+        return [
+            (received.ack_id, dict(received.message.attributes), received.message.data)
+            for received in response.received_messages
+        ]
+
+    def ack(self, ack_ids: list[str]):
+        if ack_ids:
+            self.subscriber.acknowledge(request={"subscription": self.subscription, "ack_ids": ack_ids})
+
+class FileEventSource:
+    """
+    Local stand-in for PubSubEventSource reading newline-delimited JSON messages.
+
+    The number of acknowledged lines is kept in "<path>.offset", so messages that were
+    pulled but not acknowledged are delivered again, like with Pub/Sub.
+
+    Args:
+        path (str): File with one {"attributes": {...}, "data": {...}} message per line.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset_path = f"{path}.offset"
+
+    def _offset(self) -> int:
+        if not os.path.exists(self.offset_path):
+            return 0
+        with open(self.offset_path) as f:
+            return int(f.read().strip() or 0)
+
+    def pull(self, max_messages: int) -> list[tuple[int, dict, dict]]:
+        offset = self._offset()
+        messages = []
+        with open(self.path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f):
+                if line_number < offset or not line.strip():
+                    continue
+                message = json.loads(line)
+                messages.append((line_number, message.get("attributes", {}), message.get("data")))
+                if len(messages) == max_messages:
+                    break
+        return messages
+
+    def ack(self, ack_ids: list[int]):
+        if ack_ids:
+            with open(self.offset_path, "w") as f:
+                f.write(str(max(max(ack_ids) + 1, self._offset())))
+
+def counters_path(state_dir: str, feed_key: str) -> str:
+    return os.path.join(state_dir, f"feed_events_{feed_key}.json.gz")
+
+def consume_events(source, state_dir: str, feeds: dict, seed_start: date | None = None,
+                   max_messages: int = 1000, max_batches: int | None = None) -> int:
+    """
+    Apply pending notifications to the per-feed counters.
+
+    Feeds whose counters do not reach back to seed_start are first seeded by listing their
+    partitions from seed_start to today; notifications racing with the listing are safe to
+    apply afterwards. Counters are saved before the messages are acknowledged.
+
+    Args:
+        source: PubSubEventSource or FileEventSource.
+        state_dir (str): Directory of the counter files.
+        feeds (dict): The FEEDS configuration.
+        seed_start (date): First day the counters must be complete from (None to skip seeding).
+        max_messages (int): Messages pulled per batch.
+        max_batches (int): Stop after this many batches (default: until the source is drained).
+
+    Returns:
+        int: The number of notifications that changed a counter.
+    """
+    counters = {key: FeedEventCounters.load(counters_path(state_dir, key), key) for key in feeds}
+
+    if seed_start is not None:
+        for key, feed in feeds.items():
+            if feed.get("partitioned", True) and (counters[key].complete_from is None or counters[key].complete_from > seed_start):
+                seed_counters(counters[key], feed, seed_start, date.today())
+            counters[key].evict(seed_start)
+
+    date_parser = PartitionDateParser()
+    applied = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        messages = source.pull(max_messages)
+        if not messages:
+            break
+        batches += 1
+
+        for _, attributes, data in messages:
+            event = parse_notification(attributes, data)
+            if event is None:
+                continue
+            key = match_feed(event["bucket"], event["name"], feeds)
+            if key is not None and counters[key].apply(event, date_parser):
+                applied += 1
+
+        pulled_at = datetime.now(timezone.utc)
+        for feed_counters in counters.values():
+            feed_counters.pulled_at = pulled_at
+            feed_counters.save()
+        source.ack([ack_id for ack_id, _, _ in messages])
+
+    if not batches:
+        # An empty pull still proves the consumer is alive
+        pulled_at = datetime.now(timezone.utc)
+        for feed_counters in counters.values():
+            feed_counters.pulled_at = pulled_at
+            feed_counters.save()
+
+    date_parser.print_summary("Feed notifications")
+    print(f"[INFO] Applied {applied} feed notifications in {batches} batches")
+    return applied
+
+def seed_counters(feed_counters: FeedEventCounters, feed: dict, start_date: date, end_date: date):
+    """
+    Seed a feed's counters from a listing of its partitions between start_date and end_date.
+    """
+    from gcs_client import iter_partition_metadata
+
+    days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    print(f"[INFO] Seeding event counters of {feed['label']} from {start_date}")
+    for _ in iter_partition_metadata(feed["bucket"], feed["prefix"], days, reduce=feed_counters.seed_partition):
+        pass
+    feed_counters.complete_from = start_date
+    feed_counters.save()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", required=True, help="Newline-delimited JSON notifications")
+    parser.add_argument("--state-dir", required=True, help="Directory of the counter files")
+    args = parser.parse_args()
+
+    from config import FEEDS
+    consume_events(FileEventSource(args.events), args.state_dir, FEEDS)
+    for key in FEEDS:
+        feed_counters = FeedEventCounters.load(counters_path(args.state_dir, key), key)
+        for day_key, entry in sorted(feed_counters.partitions.items()):
+            print(f"{key} {day_key}: {entry['file_count']} files, {entry['total_bytes']} bytes")
+
+if __name__ == "__main__":
+    main()
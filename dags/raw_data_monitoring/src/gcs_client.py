@@ -1,44 +1,237 @@
 # import packages
-from google.cloud import storage
-from datetime import datetime
-from utils import extract_actual_date
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import timedelta
+from itertools import islice
+import instrumentation
+from catalog import ObjectCatalog
+from clients import get_storage_client
+from utils import PartitionDateParser, build_partition_prefixes, build_partition_prefix
+from checksum_index import content_digest
+from config import LISTING_MAX_WORKERS, CHECKSUM_INDEX_ENABLED
 
-def list_gcs_metadata(bucket_name, prefix = "", debug = False): 
+# Only request the blob fields we read (partial response), plus the paging token
+_ITEM_FIELDS = "name,size,updated,md5Hash,crc32c" if CHECKSUM_INDEX_ENABLED else "name,size,updated"
+LISTING_FIELDS = f"items({_ITEM_FIELDS}),nextPageToken"
+LISTING_FIELDS_WITH_GENERATION = f"items({_ITEM_FIELDS},generation),nextPageToken"
+
+def list_gcs_metadata(bucket_name, prefix = "", debug = False, start_date = None, end_date = None): 
     """
     List files in a Google Cloud Storage bucket with metadata.
+
+    When both start_date and end_date are given, only the 'year=/month=/day=' partitions
+    for that window are listed. If none of those partitions contain any objects (e.g. the
+    feed uses a different layout), the whole prefix is listed instead.
     
     Args:
         bucket_name (str): The name of the GCS bucket.
         prefix (str): Optional prefix to filter files.
         debug (bool): If True, print debug information.
+        start_date (date): Optional first day of the listing window (inclusive).
+        end_date (date): Optional last day of the listing window (inclusive).
 
     Returns:
         list: A list of dictionaries containing file metadata.
     """
-    storage_client = storage.Client()
+    return list(iter_gcs_metadata(bucket_name, prefix, debug, start_date, end_date))
 
-    file_list = storage_client.list_blobs(bucket_name, prefix = prefix)
-    
-    metadata = []
+def iter_gcs_metadata(bucket_name, prefix = "", debug = False, start_date = None, end_date = None):
+    """
+    Stream file metadata from a Google Cloud Storage bucket.
+
+    Same listing rules as list_gcs_metadata, but metadata is yielded partition by partition
+    so callers can aggregate it without holding the whole listing in memory.
+
+    Args:
+        bucket_name (str): The name of the GCS bucket.
+        prefix (str): Optional prefix to filter files.
+        debug (bool): If True, print debug information.
+        start_date (date): Optional first day of the listing window (inclusive).
+        end_date (date): Optional last day of the listing window (inclusive).
+
+    Yields:
+        dict: File metadata (name, size, updated, actual_date).
+    """
+    storage_client = get_storage_client()
+
+    if start_date is not None and end_date is not None:
+        partition_prefixes = build_partition_prefixes(prefix, start_date, end_date)
+        found = False
+        for partition_metadata in list_partitions_concurrently(storage_client, bucket_name, partition_prefixes, debug):
+            found = found or bool(partition_metadata)
+            yield from partition_metadata
+
+        if found:
+            return
+
+        print(f"[WARN] No objects found in date partitions under gs://{bucket_name}/{prefix}, listing full prefix.")
+
+    yield from _iter_prefix(storage_client, bucket_name, prefix, debug)
+
+def iter_range_metadata(bucket_name, prefix, start_date, end_date, debug = False):
+    """
+    Stream file metadata of a date range with a single listing of the feed prefix.
+
+    The 'year=/month=/day=' partition names sort in date order, so the listing is bounded with
+    start/end offsets at the first day's and the day after the last day's partition instead of
+    issuing one listing per day. Files of other days (e.g. feeds with a different layout, listed
+    in full when the range holds no partitions) are dropped.
+
+    Args:
+        bucket_name (str): The name of the GCS bucket.
+        prefix (str): The feed prefix.
+        start_date (date): First day of the range (inclusive).
+        end_date (date): Last day of the range (inclusive).
+        debug (bool): If True, print debug information.
+
+    Yields:
+        dict: File metadata (name, size, updated, actual_date) of the days in the range.
+    """
+    storage_client = get_storage_client()
+
+    found = False
+    for file_metadata in _iter_prefix(storage_client, bucket_name, prefix, debug,
+                                      start_offset = build_partition_prefix(prefix, start_date),
+                                      end_offset = build_partition_prefix(prefix, end_date + timedelta(days=1))):
+        found = True
+        if file_metadata["actual_date"] is not None and start_date <= file_metadata["actual_date"] <= end_date:
+            yield file_metadata
+
+    if found:
+        return
+
+    print(f"[WARN] No objects found in date partitions under gs://{bucket_name}/{prefix}, listing full prefix.")
+    for file_metadata in _iter_prefix(storage_client, bucket_name, prefix, debug):
+        if file_metadata["actual_date"] is not None and start_date <= file_metadata["actual_date"] <= end_date:
+            yield file_metadata
+
+def list_gcs_catalog(bucket_name, prefix = "", debug = False, start_date = None, end_date = None):
+    """
+    List file metadata into a compact columnar catalog.ObjectCatalog, for per-file analytics
+    on prefixes too large for a list of dictionaries. Same listing rules as list_gcs_metadata.
+
+    Returns:
+        ObjectCatalog: The listed objects.
+    """
+    return ObjectCatalog.from_metadata(iter_gcs_metadata(bucket_name, prefix, debug, start_date, end_date))
+
+def iter_partition_metadata(bucket_name, prefix, days, debug = False, reduce = None, include_generation = True):
+    """
+    List the 'year=/month=/day=' partitions of specific days, including object generations.
+
+    Args:
+        bucket_name (str): The name of the GCS bucket.
+        prefix (str): The feed prefix.
+        days (list): The days whose partitions should be listed.
+        debug (bool): If True, print debug information.
+        reduce (callable): Called as reduce(day, files) in the listing thread with the partition's
+            streamed file metadata; its result is yielded instead of the list of files, so a
+            partition never has to be held in memory.
+        include_generation (bool): If True, also request each object's generation.
+
+    Yields:
+        tuple: (day, reduce(day, files) or the list of file metadata), in the order of `days`.
+    """
+    storage_client = get_storage_client()
+
+    days_by_prefix = {build_partition_prefix(prefix, day): day for day in days}
+    reduce_prefix = None
+    if reduce is not None:
+        reduce_prefix = lambda partition_prefix, files: reduce(days_by_prefix[partition_prefix], files)
+    partitions = list_partitions_concurrently(storage_client, bucket_name, list(days_by_prefix), debug,
+                                              include_generation=include_generation, reduce=reduce_prefix)
+    yield from zip(days_by_prefix.values(), partitions)
+
+def list_partitions_concurrently(storage_client, bucket_name, prefixes, debug = False, max_workers = LISTING_MAX_WORKERS,
+                                 include_generation = False, reduce = None):
+    """
+    List several prefixes in parallel, one listing per prefix, with bounded concurrency.
+
+    Results are yielded in the order of `prefixes`, so concatenating them gives the same
+    order as a single sequential listing over the parent prefix. At most max_workers
+    listings are submitted at a time; the next one is only submitted once the oldest result
+    is taken, so memory is bounded by max_workers partitions, not by the number of prefixes.
+
+    Args:
+        storage_client (storage.Client): Client shared by all worker threads.
+        bucket_name (str): The name of the GCS bucket.
+        prefixes (list): Prefixes to list (e.g. one per day partition).
+        debug (bool): If True, print debug information.
+        max_workers (int): Maximum number of listings in flight at once.
+        include_generation (bool): If True, also request and return each object's generation.
+        reduce (callable): Called as reduce(prefix, files) in the worker thread with the
+            prefix's file metadata streamed page by page (e.g. to aggregate it into per-day
+            totals); default: collect the files into a list.
+
+    Yields:
+        The result of reduce (or the list of file metadata) of each prefix, in input order.
+    """
+    if not prefixes:
+        return
+
+    def list_prefix(prefix):
+        files = _iter_prefix(storage_client, bucket_name, prefix, debug, include_generation)
+        return reduce(prefix, files) if reduce is not None else list(files)
+
+    workers = max(1, min(max_workers, len(prefixes)))
+    remaining = iter(prefixes)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gcs-list") as executor:
+        # Each listing runs in a copy of the caller's context so its counters go to the caller's feed
+        submit = lambda p: executor.submit(copy_context().run, list_prefix, p)
+        pending = deque(submit(p) for p in islice(remaining, workers))
+        while pending:
+            result = pending.popleft().result()
+            next_prefix = next(remaining, None)
+            if next_prefix is not None:
+                pending.append(submit(next_prefix))
+            yield result
+
+def _iter_prefix(storage_client, bucket_name, prefix, debug = False, include_generation = False,
+                 start_offset = None, end_offset = None):
+    """
+    Stream file metadata for a single prefix, requesting only the fields we use.
+    Object names can be bounded to [start_offset, end_offset).
+    """
+    fields = LISTING_FIELDS_WITH_GENERATION if include_generation else LISTING_FIELDS
+    offsets = {}
+    if start_offset is not None:
+        offsets["start_offset"] = start_offset
+    if end_offset is not None:
+        offsets["end_offset"] = end_offset
+    file_list = storage_client.list_blobs(bucket_name, prefix = prefix, fields = fields, **offsets)
+    date_parser = PartitionDateParser()
+    object_count = 0
     for file in file_list:
+        object_count += 1
 
         #Skip virtual folders for now (possibly flag in the future)
         if "$folder$" in file.name:
             continue
 
-        actual_date = extract_actual_date(file.name)
+        actual_date = date_parser.parse(file.name)
         #print(f"[DEBUG] Checking file: {file.name}")
         if debug and actual_date is None:
             print(f"[DEBUG] Could not extract date from: {file.name}")
 
-        metadata.append({
+        file_metadata = {
             "name": file.name,
             "size": file.size,
             "updated": file.updated,
             "actual_date": actual_date,
-        })
+        }
+        if include_generation:
+            file_metadata["generation"] = file.generation
+        if CHECKSUM_INDEX_ENABLED:
+            file_metadata["checksum"] = content_digest(file.md5_hash, file.crc32c, file.size)
+
+        yield file_metadata
+
+    date_parser.print_summary(f"gs://{bucket_name}/{prefix}")
 
-    return metadata
+    instrumentation.count("gcs_list_calls")
+    instrumentation.count("gcs_pages", getattr(file_list, "page_number", 1))
+    instrumentation.count("gcs_objects", object_count)
 
 def group_by_date(metadata):
     """ 
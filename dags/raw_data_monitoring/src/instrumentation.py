@@ -0,0 +1,119 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from threading import Lock
+
+# Timings and counters recorded outside any feed are attributed to the whole run
+RUN_SCOPE = "_run"
+
+_current_feed = ContextVar("current_feed", default=RUN_SCOPE)
+
+class RunMetrics:
+    """
+    Thread-safe per-feed, per-stage timings and cost counters for one monitoring run.
+    """
+
+    def __init__(self, run_id: str | None = None):
+        self.run_id = run_id or f"manual__{datetime.now(timezone.utc).isoformat()}"
+        self.timings = {}
+        self.counters = {}
+        self._lock = Lock()
+
+    @contextmanager
+    def timed(self, stage: str, feed: str | None = None):
+        """
+        Time a block as `stage`. Counters recorded inside the block default to `feed`.
+
+        Args:
+            stage (str): Stage name (e.g. "listing", "upsert", "slack_delivery").
+            feed (str): Feed label, or None to inherit the current feed (the run scope by default).
+        """
+        token = _current_feed.set(feed) if feed is not None else None
+        feed = _current_feed.get()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                stages = self.timings.setdefault(feed, {})
+                stages[stage] = stages.get(stage, 0.0) + elapsed
+            if token is not None:
+                _current_feed.reset(token)
+
+    def count(self, name: str, value: float = 1, feed: str | None = None):
+        """
+        Add `value` to the counter `name` of `feed` (default: the feed of the enclosing timed block).
+        """
+        feed = feed or _current_feed.get()
+        with self._lock:
+            counters = self.counters.setdefault(feed, {})
+            counters[name] = counters.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        """
+        Return a JSON-serializable snapshot, suitable for XCom.
+        """
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "timings": {feed: dict(stages) for feed, stages in self.timings.items()},
+                "counters": {feed: dict(counters) for feed, counters in self.counters.items()},
+            }
+
+    def merge(self, snapshot: dict):
+        """
+        Add the timings and counters of another run's to_dict snapshot (e.g. a feed's process_feed run).
+        """
+        with self._lock:
+            for kind, target in (("timings", self.timings), ("counters", self.counters)):
+                for feed, values in snapshot[kind].items():
+                    merged = target.setdefault(feed, {})
+                    for name, value in values.items():
+                        merged[name] = merged.get(name, 0) + value
+
+    def to_rows(self) -> list[dict]:
+        """
+        Flatten the metrics into one row per feed and metric (timings as "<stage>_seconds").
+        """
+        snapshot = self.to_dict()
+        rows = []
+        for kind, suffix in (("timings", "_seconds"), ("counters", "")):
+            for feed, values in snapshot[kind].items():
+                for name, value in values.items():
+                    rows.append({"run_id": self.run_id, "datafeed": feed, "metric": f"{name}{suffix}", "value": float(value)})
+        return rows
+
+# Metrics of the run in progress in this context (thread or task), like the current feed;
+# records made outside any run go to a shared default
+_current_run = ContextVar("current_run", default=RunMetrics())
+
+def start_run(run_id: str | None = None) -> RunMetrics:
+    """
+    Start recording a new run in the current context and return its metrics.
+
+    Worker threads record into it when they run in a copy of the caller's context
+    (contextvars.copy_context), as the listing and footer workers do.
+    """
+    metrics = RunMetrics(run_id)
+    _current_run.set(metrics)
+    return metrics
+
+def current_run() -> RunMetrics:
+    """
+    Return the metrics of the run in progress in the current context.
+    """
+    return _current_run.get()
+
+def timed(stage: str, feed: str | None = None):
+    """
+    Time a block in the current run (see RunMetrics.timed).
+    """
+    return _current_run.get().timed(stage, feed)
+
+def count(name: str, value: float = 1, feed: str | None = None):
+    """
+    Add to a counter of the current run (see RunMetrics.count).
+    """
+    _current_run.get().count(name, value, feed)
@@ -1,51 +1,615 @@
-from gcs_client import list_gcs_metadata
-from bq_client import upsert_feed_metrics
+from gcs_client import iter_gcs_metadata, iter_partition_metadata
+from aggregator import aggregate_daily_metrics, get_daily_totals
+from metrics_store import upsert_feed_metrics_bulk, query_historical_baselines, query_daily_metrics, insert_run_metrics
 from analyzer import analyze_feed
-from alert_team import send_alert_to_team, format_overview_table, format_alert_details
-from config import FEEDS, ALERT_RECIPIENTS
-from datetime import date, timedelta
-from collections import defaultdict
+from manifest import ListingManifest
+from baseline_cache import BaselineCache
+from feed_events import FeedEventCounters, counters_path
+from parquet_footer import FooterCache, ObjectCollector, inspect_footers
+from checksum_index import ChecksumIndex, ChecksumCollector
+from run_state import RunState, run_state_path, evict_run_states
+from clients import get_storage_client
+from alert_team import (send_alert_to_team, send_alert_async, format_overview_table, format_alert_details,
+                        format_error_details, format_delivery_changes)
+from config import (FEEDS, FEED_MAX_WORKERS, STATE_DIR, MANIFEST_ENABLED,
+                    MANIFEST_RELIST_DAYS, MANIFEST_RETENTION_DAYS, BASELINE_CACHE_ENABLED, BASELINE_CACHE_REFRESH_DAYS,
+                    EVENT_TRACKING_ENABLED, EVENT_MAX_STALENESS_MINUTES, CHECKSUM_INDEX_ENABLED, CHECKSUM_INDEX_DAYS,
+                    DUPLICATE_MIN_FILE_BYTES, EXCLUDE_DUPLICATE_FILES, RUN_STATE_ENABLED, RUN_STATE_RETENTION_DAYS)
+from utils import baseline_window
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import date, datetime, timedelta, timezone
+from functools import partial
+from typing import Iterable
+import instrumentation
+import profiling
 import os
 
+ERROR_STATUS = "ERROR ⛔"
 
-# Run takes in slack webhook as arg, if none fetch from env variables, set default to NONE
-def run(slack_webhook=None):
+class UpsertFailedError(RuntimeError):
+    """
+    Raised by process_feed after the analysis when the feed's metric rows could not be written.
 
-    if slack_webhook is None:
-        from dotenv import load_dotenv
-        load_dotenv()  # Load environment variables from .env file
-        slack_webhook = os.getenv("SLACK_WEBHOOK_URL")
+    The feed's checkpoint is kept, so a retry restores the listing and result and only redoes
+    the upsert. feed_result holds the report entry, so the analysis can still be reported.
+    """
+
+    def __init__(self, feed_label: str, feed_result: dict):
+        super().__init__(f"Metric rows of {feed_label} were not written")
+        self.feed_result = feed_result
+
+def run_window(today: date | None = None) -> tuple[date, date, date]:
+    """
+    Return the analysis date and the upsert window of a run.
 
-    actual_date = date.today() - timedelta(days=6) # Analysis target date
-    upsert_start = date.today() - timedelta(days=13)  # Start date for upsert
+    Returns:
+        tuple: (actual_date, upsert_start, upsert_end)
+    """
+    today = today or date.today()
+    actual_date = today - timedelta(days=6) # Analysis target date
+    upsert_start = today - timedelta(days=13)  # Start date for upsert
     upsert_end = actual_date # End date for upsert
-    overview_rows = []
-    alert_messages = []
-    
+    return actual_date, upsert_start, upsert_end
 
-    # Single-day analysis for each feed
-    for key, feed in FEEDS.items():
+def collect_feed_metrics(key: str, feed: dict, upsert_start: date, upsert_end: date) -> tuple[dict[date, dict], dict | None]:
+    """
+    List a feed's bucket and aggregate it into per-day totals (see collect_daily_metrics).
+
+    With the checksum index enabled, files re-delivered under a new name are counted in each
+    day's duplicate_count/duplicate_bytes (see flag_duplicates). Partitioned feeds with
+    "row_counts" enabled also get the row counts, unreadable files and
+    schema fingerprints of their Parquet footers (see add_row_counts). Both record the
+    objects they need in the same pass over the listing.
+    """
+    window = [upsert_start + timedelta(days=i) for i in range((upsert_end - upsert_start).days + 1)]
+    index = load_checksum_index(key)
+    checksums = None
+    if index is not None:
+        checksums = ChecksumCollector(upsert_end - timedelta(days=CHECKSUM_INDEX_DAYS), upsert_end,
+                                      DUPLICATE_MIN_FILE_BYTES)
+    objects = ObjectCollector(window) if feed.get("row_counts") and feed.get("partitioned", True) else None
+    collectors = [collector for collector in (checksums, objects) if collector is not None]
+
+    daily_metrics, changes = collect_daily_metrics(key, feed, upsert_start, upsert_end, collectors)
+    if index is not None:
+        flag_duplicates(feed, index, checksums, daily_metrics, upsert_start, upsert_end)
+    if objects is not None:
+        with instrumentation.timed("footers", feed=feed["label"]):
+            try:
+                add_row_counts(key, feed, daily_metrics, window_objects(key, objects, window))
+            except Exception as e:
+                # Row counts stay unknown (NULL keeps the stored ones); file counts are still reported
+                print(f"[WARN] Could not read the Parquet footers of {feed['label']}, row counts skipped: {e}")
+                for totals in daily_metrics.values():
+                    totals.pop("row_count", None)
+    return daily_metrics, changes
+
+def collect_daily_metrics(key: str, feed: dict, upsert_start: date, upsert_end: date,
+                          collectors: list = ()) -> tuple[dict[date, dict], dict | None]:
+    """
+    List a feed's bucket and aggregate it into per-day totals.
+
+    With event tracking enabled, the counters kept from GCS notifications are used and
+    nothing is listed while they are current. With the listing manifest enabled, only the
+    partitions that are new, recent or flagged as changed are listed; the others are read
+    from the feed's manifest.
+
+    Args:
+        key (str): The feed key from FEEDS.
+        feed (dict): The feed configuration from FEEDS.
+        upsert_start (date): First day of the upsert window.
+        upsert_end (date): Last day of the upsert window.
+        collectors (list): Recorders the listed files are passed through (ChecksumCollector,
+            parquet_footer.ObjectCollector); skipped when nothing is listed.
+
+    Returns:
+        tuple: Per-date totals from aggregator.aggregate_daily_metrics, and the previously listed
+               partitions whose files changed (None without a manifest).
+    """
+    with instrumentation.timed("listing", feed=feed["label"]):
         print(f"\nChecking feed: {feed['label']}")
-        metadata = list_gcs_metadata(feed["bucket"], feed["prefix"], debug=False)
+        if not feed.get("partitioned", True):
+            listing = iter_gcs_metadata(feed["bucket"], feed["prefix"], debug=False)
+            return aggregate_daily_metrics(wrap_listing(collectors, listing)), None
+
+        daily_metrics = load_event_metrics(key, upsert_start, upsert_end)
+        if daily_metrics is not None:
+            print(f"[INFO] Using event counters for {feed['label']}, no listing needed")
+            instrumentation.count("event_counter_hits")
+            for collector in collectors:
+                collector.skip()
+            return daily_metrics, None
+
+        manifest = load_manifest(key)
+        if manifest is not None:
+            daily_metrics, changes = collect_partitions_with_manifest(key, feed, upsert_start, upsert_end, manifest,
+                                                                      collectors)
+            save_manifest(manifest)
+            if daily_metrics:
+                return daily_metrics, changes
+            print(f"[WARN] No objects found in date partitions for {feed['label']}, listing without manifest.")
+
+        # Only list the year=/month=/day= partitions inside the upsert window, each aggregated
+        # into per-day totals as its pages stream in
+        window = [upsert_start + timedelta(days=i) for i in range((upsert_end - upsert_start).days + 1)]
+        daily_metrics = {}
+        # Generations are only needed to key the footer cache of the recorded objects
+        include_generation = any(isinstance(collector, ObjectCollector) for collector in collectors)
+        for _, totals in iter_partition_metadata(feed["bucket"], feed["prefix"], window,
+                                                 include_generation=include_generation,
+                                                 reduce=partial(aggregate_partition, collectors)):
+            daily_metrics.update(totals)
+        if daily_metrics:
+            return daily_metrics, None
+
+        print(f"[WARN] No objects found in date partitions for {feed['label']}, listing full prefix.")
+        listing = iter_gcs_metadata(feed["bucket"], feed["prefix"], debug=False)
+        return aggregate_daily_metrics(wrap_listing(collectors, listing, window)), None
+
+def wrap_listing(collectors: list, files: Iterable[dict], listed_days: Iterable[date] = ()) -> Iterable[dict]:
+    """
+    Pass a listing through every collector (see collect_daily_metrics).
+    """
+    listed_days = list(listed_days)
+    for collector in collectors:
+        files = collector.wrap(files, listed_days)
+    return files
+
+def aggregate_partition(collectors: list, day: date, files: Iterable[dict]) -> dict[date, dict]:
+    """
+    Aggregate one listed partition (see gcs_client.iter_partition_metadata), passing it through the collectors.
+    """
+    return aggregate_daily_metrics(wrap_listing(collectors, files, [day]))
+
+def add_row_counts(key: str, feed: dict, daily_metrics: dict[date, dict], objects_by_day: dict[date, dict[str, list]]):
+    """
+    Add row_count, unreadable_files and schema_fingerprints to each day of objects_by_day from the
+    Parquet footers of its objects (see window_objects). Only objects whose name and generation are
+    not in the feed's footer cache are read.
+
+    A day with an object whose footer could not be fetched gets row_count None (unknown)
+    rather than a partial sum, so the row-count check does not see a false drop.
+    """
+    objects = {name: entry for day_objects in objects_by_day.values() for name, entry in day_objects.items()}
+
+    cache_path = os.path.join(STATE_DIR, f"parquet_footers_{key}.json.gz")
+    try:
+        cache = FooterCache.load(cache_path)
+    except Exception as e:
+        print(f"[WARN] Could not load footer cache for {key}, reading all footers: {e}")
+        cache = FooterCache(cache_path)
+
+    footers = inspect_footers(get_storage_client(), feed["bucket"], objects, cache)
+
+    for day, day_objects in objects_by_day.items():
+        totals = daily_metrics.get(day)
+        if totals is None:
+            continue
+        infos = [footers[name] for name in day_objects if name in footers]
+        complete = bool(day_objects) and len(infos) == len(day_objects)
+        totals["row_count"] = sum(info["num_rows"] for info in infos if info) if complete else None
+        totals["unreadable_files"] = sum(1 for info in infos if info is None)
+        totals["schema_fingerprints"] = sorted({info["schema_fingerprint"] for info in infos if info})
+
+    cache.retain(set(objects))
+    try:
+        cache.save()
+    except Exception as e:
+        print(f"[WARN] Could not save footer cache for {key}: {e}")
+
+def flag_duplicates(feed: dict, index: ChecksumIndex, collector: ChecksumCollector, daily_metrics: dict[date, dict],
+                    upsert_start: date, upsert_end: date):
+    """
+    Store the listed checksums in the feed's index and count the re-delivered files of each day.
+
+    Every indexed day of the window gets duplicate_count and duplicate_bytes. With
+    EXCLUDE_DUPLICATE_FILES they are also removed from the day's file_count and total_bytes,
+    so the upserted metrics only count distinct content.
+    """
+    collector.store(index)
+    index.evict(upsert_end - timedelta(days=CHECKSUM_INDEX_DAYS))
+
+    if not collector.skipped:
+        for day, totals in daily_metrics.items():
+            if not upsert_start <= day <= upsert_end:
+                continue
+            duplicates = index.duplicates(day)
+            if duplicates is None:
+                continue
+            totals["duplicate_count"], totals["duplicate_bytes"] = duplicates
+            if duplicates[0]:
+                print(f"[WARN] {duplicates[0]} re-delivered file(s) on {day} for {feed['label']}")
+                if EXCLUDE_DUPLICATE_FILES:
+                    totals["file_count"] -= duplicates[0]
+                    totals["total_bytes"] -= duplicates[1]
+
+    try:
+        index.save()
+    except Exception as e:
+        print(f"[WARN] Could not save checksum index: {e}")
+
+def window_objects(key: str, collector: ObjectCollector, window: list[date]) -> dict[date, dict[str, list]]:
+    """
+    The (name -> [generation, size]) objects of the window's days listed by this run, or of the
+    days the event counters know when they replaced the listing.
+
+    Days served from the listing manifest are not listed, so they are left out: their row
+    counts stay unknown and the stored ones are kept.
+    """
+    if not collector.skipped:
+        return collector.objects
+
+    partitions = FeedEventCounters.load(counters_path(STATE_DIR, key), key).partitions
+    return {day: partitions[day.isoformat()]["objects"] for day in window if day.isoformat() in partitions}
+
+def collect_partitions_with_manifest(key: str, feed: dict, upsert_start: date, upsert_end: date,
+                                     manifest: ListingManifest, collectors: list = ()) -> tuple[dict[date, dict], dict]:
+    """
+    Aggregate a feed's day partitions, listing only those the manifest cannot serve.
+
+    Returns:
+        tuple: Per-date totals and {"partitions": [...]}, the re-listed partitions whose files
+               changed since the previous listing (see ListingManifest.update_partition).
+    """
+    days = [upsert_start + timedelta(days=i) for i in range((upsert_end - upsert_start).days + 1)]
+    flag_changed_partitions(key, manifest, days)
+    to_list = manifest.partitions_to_list(key, days, date.today(), MANIFEST_RELIST_DAYS)
+
+    daily_metrics = {}
+    for day in days:
+        if day not in to_list:
+            totals = manifest.get_daily_metrics(key, day)
+            if totals:
+                daily_metrics[day] = totals
+
+    # Each partition streams into the manifest, which keeps its per-day totals
+    def update_partition(day, files):
+        return manifest.update_partition(key, day, wrap_listing(collectors, files, [day]))
+
+    changes = {"partitions": []}
+    for day, change in iter_partition_metadata(feed["bucket"], feed["prefix"], to_list, reduce=update_partition):
+        if change:
+            changes["partitions"].append(change)
+        totals = manifest.get_daily_metrics(key, day)
+        if totals:
+            daily_metrics[day] = totals
+
+    print(f"[INFO] Listed {len(to_list)} of {len(days)} partitions for {feed['label']} (others from manifest)")
+    return daily_metrics, changes
+
+def flag_changed_partitions(key: str, manifest: ListingManifest, days: list[date]):
+    """
+    Flag the manifest partitions that GCS notifications show to have changed since they were listed.
+
+    Only used when the event counters are not current enough to replace the listing. A partition
+    is re-listed when a notification carries a newer generation than its max_generation (a late
+    or rewritten file) or, on days the counters are complete for, when the file counts differ
+    (a removed file).
+    """
+    if not EVENT_TRACKING_ENABLED:
+        return
+
+    try:
+        counters = FeedEventCounters.load(counters_path(STATE_DIR, key), key)
+    except Exception as e:
+        print(f"[WARN] Could not load event counters for {key}, changed partitions not flagged: {e}")
+        return
+
+    listed = manifest.feeds.get(key, {})
+    for day in days:
+        entry, previous = counters.partitions.get(day.isoformat()), listed.get(day.isoformat())
+        if entry is None or previous is None:
+            continue
+        newest = max((generation for generation, _ in entry["objects"].values()), default=0)
+        complete = counters.complete_from is not None and day >= counters.complete_from
+        if newest > previous["max_generation"] or (complete and entry["file_count"] != previous["object_count"]):
+            manifest.mark_changed(key, day)
+
+def build_metric_rows(feed: dict, daily_metrics: dict[date, dict], upsert_start: date, upsert_end: date) -> list[dict]:
+    """
+    Build the upsert rows of a feed for every day of the upsert window (missing days count as zero).
+    """
+    rows = []
+    upsert_date = upsert_start
+    # Collect metrics for rolling 7 day window
+    while upsert_date <= upsert_end:
+        file_count_res, file_size_res = get_daily_totals(daily_metrics, upsert_date)
+        row = {
+            "feed_label": feed["label"],
+            "event_date": upsert_date,
+            "file_count": file_count_res,
+            "file_size": file_size_res,
+        }
+        sketch = daily_metrics.get(upsert_date, {}).get("size_sketch")
+        row["size_sketch"] = sketch.serialize() if sketch is not None else None
+        if feed.get("row_counts") and feed.get("partitioned", True):
+            # None when no footer count was computed, so the stored row count is kept
+            row["row_count"] = daily_metrics.get(upsert_date, {}).get("row_count")
+        rows.append(row)
+        upsert_date += timedelta(days=1)
+    return rows
+
+def load_event_metrics(key: str, upsert_start: date, upsert_end: date) -> dict[date, dict] | None:
+    """
+    Read a feed's per-day totals from its notification counters (feed_events.consume_events).
+
+    Returns:
+        dict: Per-date totals, or None if event tracking is disabled, the consumer has not
+              pulled within EVENT_MAX_STALENESS_MINUTES or the counters do not cover the window.
+    """
+    if not EVENT_TRACKING_ENABLED:
+        return None
+
+    try:
+        counters = FeedEventCounters.load(counters_path(STATE_DIR, key), key)
+    except Exception as e:
+        print(f"[WARN] Could not load event counters for {key}, listing instead: {e}")
+        return None
+
+    if not counters.is_current(datetime.now(timezone.utc), EVENT_MAX_STALENESS_MINUTES):
+        print(f"[WARN] Event counters for {key} are stale (last pull: {counters.pulled_at}), listing instead")
+        return None
+    return counters.get_daily_metrics(upsert_start, upsert_end)
+
+def load_manifest(key: str) -> ListingManifest | None:
+    """
+    Load a feed's listing manifest from STATE_DIR, or None if it is disabled or unreadable.
+
+    Each feed has its own manifest file so feeds can run in separate Airflow tasks.
+    """
+    if not MANIFEST_ENABLED:
+        return None
+
+    try:
+        return ListingManifest.load(os.path.join(STATE_DIR, f"listing_manifest_{key}.json.gz"))
+    except Exception as e:
+        print(f"[WARN] Could not load listing manifest for {key}, listing all partitions: {e}")
+        return None
+
+def save_manifest(manifest: ListingManifest | None):
+    """
+    Evict expired partitions and persist the listing manifest.
+    """
+    if manifest is None:
+        return
+
+    manifest.evict(date.today() - timedelta(days=MANIFEST_RETENTION_DAYS))
+    try:
+        manifest.save()
+    except Exception as e:
+        print(f"[WARN] Could not save listing manifest: {e}")
+
+def load_checksum_index(key: str) -> ChecksumIndex | None:
+    """
+    Load a feed's checksum index from STATE_DIR, or None if it is disabled or unreadable.
+    """
+    if not CHECKSUM_INDEX_ENABLED:
+        return None
 
-        upsert_date = upsert_start
-        # Upsert metrics for rolling 7 day window
-        while upsert_date <= upsert_end:
-            daily_files = [f for f in metadata if f.get("actual_date") == upsert_date]
-            file_count_res = len(daily_files)
-            file_size_res = sum(f["size"] for f in daily_files) / 1_000_000 if daily_files else 0.0
+    try:
+        return ChecksumIndex.load(os.path.join(STATE_DIR, f"checksum_index_{key}.json.gz"))
+    except Exception as e:
+        print(f"[WARN] Could not load checksum index for {key}, duplicates not flagged: {e}")
+        return None
 
-            # Upsert metrics to BigQuery
-            upsert_feed_metrics(
-                feed_label=feed["label"],
-                event_date=upsert_date,
-                file_count=file_count_res,
-                file_size=file_size_res
-            )
+def load_baseline_cache(key: str) -> BaselineCache | None:
+    """
+    Load a feed's baseline cache from STATE_DIR, or None if it is disabled or unreadable.
+    """
+    if not BASELINE_CACHE_ENABLED:
+        return None
 
-            upsert_date += timedelta(days=1)
+    try:
+        return BaselineCache.load(os.path.join(STATE_DIR, f"baseline_cache_{key}.json.gz"), FEEDS[key]["label"])
+    except Exception as e:
+        print(f"[WARN] Could not load baseline cache for {key}, querying BigQuery: {e}")
+        return None
 
-        result = analyze_feed(feed["label"], metadata, actual_date)
+def cached_baseline(cache: BaselineCache | None, metric_rows: list[dict], expected_date: date) -> tuple[float, float] | None:
+    """
+    Get a feed's baseline from its cache after writing through the rows upserted by the run.
+
+    The cache is seeded from BigQuery when it does not cover the baseline window or every
+    BASELINE_CACHE_REFRESH_DAYS days. If that read fails, a cache that still covers the
+    window is used as is.
+
+    Args:
+        cache (BaselineCache): The feed's cache, or None if disabled.
+        metric_rows (list): The rows upserted for the feed in this run; empty if the upsert
+            failed, so the cache does not diverge from the metrics store.
+        expected_date (date): The analysis date.
+
+    Returns:
+        tuple: (avg_count, avg_size_mb), or None if the baseline must be queried from BigQuery.
+    """
+    if cache is None:
+        return None
+
+    start_date, end_date = baseline_window(expected_date)
+    if cache.needs_refresh(start_date, end_date, date.today(), BASELINE_CACHE_REFRESH_DAYS):
+        try:
+            cache.seed(query_daily_metrics(start_date, end_date, [cache.feed_label]), start_date, end_date, date.today())
+        except Exception as e:
+            print(f"[WARN] Could not refresh baseline cache for {cache.feed_label}: {e}")
+
+    cache.apply_rows(metric_rows)
+    cache.evict(start_date)
+    baseline = cache.baseline(start_date, end_date)
+    instrumentation.count("baseline_cache_hits" if baseline is not None else "baseline_cache_misses")
+
+    try:
+        cache.save()
+    except Exception as e:
+        print(f"[WARN] Could not save baseline cache for {cache.feed_label}: {e}")
+    return baseline
+
+def invalidate_baseline_cache(key: str):
+    """
+    Drop a feed's baseline cache after its table rows were rewritten outside the daily run.
+    """
+    path = os.path.join(STATE_DIR, f"baseline_cache_{key}.json.gz")
+    if os.path.exists(path):
+        os.remove(path)
+        print(f"[INFO] Dropped baseline cache for {key}")
+
+def load_run_state(run_id: str | None, key: str, upsert_start: date, upsert_end: date) -> RunState | None:
+    """
+    Load a feed's checkpoint for an Airflow run, or None if checkpoints are disabled or there is no run id.
+
+    An unreadable checkpoint is replaced by an empty one, so the run starts over.
+    """
+    if not RUN_STATE_ENABLED or run_id is None:
+        return None
+
+    path = run_state_path(STATE_DIR, run_id, key)
+    try:
+        evict_run_states(STATE_DIR, RUN_STATE_RETENTION_DAYS)
+        return RunState.load(path, run_id, (upsert_start, upsert_end))
+    except Exception as e:
+        print(f"[WARN] Could not load run state for {key}, starting over: {e}")
+        return RunState(path, run_id, (upsert_start, upsert_end))
+
+def save_run_state(state: RunState | None):
+    """
+    Persist a checkpoint after a step completed; a failed write only means the step is redone on retry.
+    """
+    if state is None:
+        return
+
+    try:
+        state.save()
+    except Exception as e:
+        print(f"[WARN] Could not save run state {state.path}: {e}")
+
+def clear_run_states(states: list[RunState | None]):
+    """
+    Remove the checkpoints of a completed run, so clearing the task in Airflow runs it again in full.
+    """
+    for state in states:
+        if state is None:
+            continue
+        try:
+            state.clear()
+        except Exception as e:
+            print(f"[WARN] Could not remove run state {state.path}: {e}")
+
+def upsert_metric_rows(metric_rows: list[dict]) -> bool:
+    """
+    Upsert the run's metric rows, logging instead of raising so analysis can go on from the baseline cache.
+
+    The caller raises once the analysis is done (see UpsertFailedError): the oldest day of the
+    window is written for the last time by this run, so the upsert must be retried.
+
+    Returns:
+        bool: True only if the store confirmed the write (a failed MERGE or missing table is False).
+    """
+    try:
+        if upsert_feed_metrics_bulk(metric_rows):
+            return True
+        print(f"[ERROR] Upsert of {len(metric_rows)} rows was not written")
+    except Exception as e:
+        print(f"[ERROR] Upsert of {len(metric_rows)} rows failed: {e}")
+    instrumentation.count("upsert_failures")
+    return False
+
+def record_run_metrics(metrics: instrumentation.RunMetrics):
+    """
+    Record the monitor's own runtime and cost next to the feed metrics.
+    """
+    try:
+        insert_run_metrics(metrics.to_rows(), date.today())
+    except Exception as e:
+        print(f"[WARN] Could not record run metrics: {e}")
+
+def process_feed(feed_key: str, run_id: str | None = None, profile=None) -> dict:
+    """
+    List, upsert and analyze a single feed (one mapped task of the Airflow DAG).
+
+    Errors are raised so the feed's task can be retried on its own. Each completed step is
+    checkpointed (see run_state.RunState), so a retry only redoes the steps that did not complete.
+    A failed upsert raises UpsertFailedError after the analysis, keeping the checkpoint.
+
+    Args:
+        feed_key (str): The feed key from FEEDS.
+        run_id (str): The Airflow run id, used to tag the run metrics and key the checkpoint.
+        profile: Profile the feed (see profiling.profile_run); None for the environment/config default.
+
+    Returns:
+        dict: The feed's report entry (feed_key, result, changes) plus its run_metrics.
+    """
+    feed = FEEDS[feed_key]
+    actual_date, upsert_start, upsert_end = run_window()
+    state = load_run_state(run_id, feed_key, upsert_start, upsert_end)
+
+    metrics = instrumentation.start_run(run_id)
+    with profiling.profile_run(metrics.run_id, feed_key, profile), metrics.timed("total", feed=feed["label"]):
+        if state is not None and state.listed:
+            print(f"[INFO] Resuming {feed['label']} from the checkpoint of {run_id}, no listing needed")
+            instrumentation.count("run_state_hits")
+            daily_metrics, changes = state.daily_metrics, state.changes
+        else:
+            daily_metrics, changes = collect_feed_metrics(feed_key, feed, upsert_start, upsert_end)
+            if state is not None:
+                state.daily_metrics, state.changes = daily_metrics, changes
+                save_run_state(state)
+
+        metric_rows = build_metric_rows(feed, daily_metrics, upsert_start, upsert_end)
+        upserted = state is not None and state.upserted
+        if not upserted:
+            with instrumentation.timed("upsert"):
+                upserted = upsert_metric_rows(metric_rows)
+            if upserted and state is not None:
+                state.upserted = True
+                save_run_state(state)
+
+        result = state.result if state is not None else None
+        if result is None:
+            # Served from the local cache on the happy path, BigQuery otherwise
+            with instrumentation.timed("baseline_query"):
+                baseline = cached_baseline(load_baseline_cache(feed_key), metric_rows if upserted else [], actual_date)
+                if baseline is None:
+                    baseline = query_historical_baselines([(feed["label"], actual_date)])[(feed["label"], actual_date)]
+
+            with instrumentation.timed("analysis"):
+                result = analyze_feed(feed["label"], daily_metrics, actual_date, baseline=baseline)
+            if state is not None:
+                state.result = result
+                save_run_state(state)
+
+    record_run_metrics(metrics)
+    feed_result = {"feed_key": feed_key, "result": result, "changes": changes, "run_metrics": metrics.to_dict()}
+    if not upserted:
+        raise UpsertFailedError(feed["label"], feed_result)
+    clear_run_states([state])
+    return feed_result
+
+def build_report(feed_results: dict[str, dict]) -> str:
+    """
+    Build the Slack report from the per-feed results, in FEEDS order.
+
+    Args:
+        feed_results (dict): Feed key -> {"result": analysis result, "changes": ...} or {"error": message}.
+            Feeds without an entry are reported as errors.
+
+    Returns:
+        str: The full Slack message.
+    """
+    actual_date, _, _ = run_window()
+    overview_rows = []
+    alert_messages = []
+    change_messages = []
+
+    for key, feed in FEEDS.items():
+        entry = feed_results.get(key) or {"error": "No result was produced for this feed."}
+
+        if "error" in entry:
+            # Keep a report row for the failing feed
+            overview_rows.append((feed["label"], ERROR_STATUS, actual_date.strftime("%Y-%m-%d")))
+            alert_messages.append(format_error_details(key, entry["error"]))
+            continue
+
+        result = entry["result"]
 
         # Append to Slack overview table
         overview_rows.append((feed["label"], result["status"], result["date"]))
@@ -54,7 +618,11 @@ def run(slack_webhook=None):
         if result["status"] in ["CRITICAL 🚨", "WARNING ❗️"]:
             alert_messages.append(format_alert_details(key, result))
 
-         
+        # Partitions listed on a previous run whose files changed (late, removed or rewritten files)
+        changes = entry.get("changes")
+        if changes and any(changes.values()):
+            change_messages.append(format_delivery_changes(key, changes))
+
     # Slack message construction
     message_parts = []
     message_parts.append("*Feed Status Overview:*")
@@ -64,11 +632,96 @@ def run(slack_webhook=None):
         message_parts.append("\n*⚠️ Alerts:*")
         message_parts.extend(alert_messages)
 
-    full_message = "\n".join(message_parts)
+    if change_messages:
+        message_parts.append("\n*🔄 Delivery Changes Since Last Run:*")
+        message_parts.extend(change_messages)
+
+    return "\n".join(message_parts)
+
+def send_report(feed_results: list[dict], slack_webhook=None, background: bool = False):
+    """
+    Build and send the Slack report from the results of the per-feed tasks (the DAG's fan-in task).
+
+    Args:
+        feed_results (list): Return values of process_feed; failed or skipped feeds are missing
+            or None and are reported as errors.
+        slack_webhook (str): The Slack webhook URL, or None to only print the report.
+        background (bool): Post the report in the background (see alert_team.send_alert_async).
+
+    Returns:
+        The delivery result (a future of it when background), or None without a webhook.
+    """
+    entries = [entry for entry in feed_results if isinstance(entry, dict) and "feed_key" in entry]
+    full_message = build_report({entry["feed_key"]: entry for entry in entries})
     print(full_message)
 
-    if slack_webhook:
-        send_alert_to_team(slack_webhook, full_message)
+    if not slack_webhook:
+        return None
+    if background:
+        return send_alert_async(slack_webhook, full_message)
+    return send_alert_to_team(slack_webhook, full_message)
+
+def process_all_feeds(run_id: str | None = None, max_workers: int = FEED_MAX_WORKERS) -> list[dict]:
+    """
+    Run process_feed for every feed in parallel, the single-process equivalent of the DAG's mapped task.
+
+    A failing feed does not stop the others; it is returned as an error entry. A feed whose
+    upsert failed keeps its analysis result and gets an "upsert_error" (see UpsertFailedError).
+
+    Args:
+        run_id (str): The run id, passed to each process_feed.
+        max_workers (int): Maximum number of feeds processed at once.
+
+    Returns:
+        list: The process_feed results (feed_key plus result or error), in FEEDS order.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="feed") as executor:
+        # Each feed records its own run metrics in a copy of the caller's context; profiling covers the whole run
+        futures = {key: executor.submit(copy_context().run, process_feed, key, run_id, False) for key in FEEDS}
+
+        feed_results = []
+        for key, future in futures.items():
+            try:
+                feed_results.append(future.result())
+            except UpsertFailedError as e:
+                print(f"[ERROR] {e}")
+                feed_results.append({**e.feed_result, "upsert_error": str(e)})
+            except Exception as e:
+                print(f"[ERROR] Monitoring failed for {FEEDS[key]['label']}: {e}")
+                feed_results.append({"feed_key": key, "error": f"{type(e).__name__}: {e}"})
+    return feed_results
+
+# Run takes in slack webhook as arg, if none fetch from env variables, set default to NONE
+# Returns the run's per-feed/per-stage timings and cost counters
+# profile switches profiling on or off for this run (None: RAW_DATA_MONITORING_PROFILE / PROFILING_ENABLED)
+def run(slack_webhook=None, run_id=None, profile=None):
+
+    if slack_webhook is None:
+        from dotenv import load_dotenv
+        load_dotenv()  # Load environment variables from .env file
+        slack_webhook = os.getenv("SLACK_WEBHOOK_URL")
+
+    metrics = instrumentation.start_run(run_id)
+    with profiling.profile_run(metrics.run_id, "run", profile):
+        with metrics.timed("total"):
+            feed_results = process_all_feeds(metrics.run_id)
+
+        # The report is posted in the background while the run metrics are recorded
+        # (each process_feed recorded its own feed's metrics)
+        delivery = send_report(feed_results, slack_webhook, background=True)
+        record_run_metrics(metrics)
+        if delivery is not None:
+            delivery.result()
+
+    # Reported, but the run fails so a retry writes the rows (the checkpoints were kept)
+    upsert_errors = [entry["upsert_error"] for entry in feed_results if entry.get("upsert_error")]
+    if upsert_errors:
+        raise RuntimeError("; ".join(upsert_errors))
+
+    for entry in feed_results:
+        if "run_metrics" in entry:
+            metrics.merge(entry["run_metrics"])
+    return metrics.to_dict()
 
 if __name__ == "__main__":
     run()
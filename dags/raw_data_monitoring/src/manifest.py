@@ -0,0 +1,210 @@
+import base64
+import gzip
+import hashlib
+import json
+import os
+import sys
+from array import array
+from datetime import date, datetime, timedelta, timezone
+from threading import Lock
+from typing import Iterable
+
+from size_sketch import SizeSketch
+
+# Stored manifests with another version are discarded (every partition is listed once again)
+MANIFEST_VERSION = 3
+
+class ListingManifest:
+    """
+    Persistent record of what was listed in each feed's day partitions.
+
+    For every feed and day the manifest keeps the object count, total bytes, min/max size,
+    size sketch, max generation and last-listed time, plus the 64-bit name digest and the
+    generation of each object as two base64 int64 arrays (16 bytes per object, whatever the
+    object names), stored as gzipped JSON. The arrays stay encoded until the partition is
+    listed again. Closed partitions can then be served from the manifest instead of being
+    listed again, and re-listing a known partition tells which files were added, removed or
+    rewritten since the previous run.
+    """
+
+    def __init__(self, path: str, feeds: dict | None = None):
+        self.path = path
+        self.feeds = feeds or {}
+        self._lock = Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "ListingManifest":
+        """
+        Load a manifest from disk, or start an empty one if the file does not exist.
+
+        Args:
+            path (str): Path of the gzipped JSON manifest.
+
+        Returns:
+            ListingManifest: The loaded manifest.
+        """
+        if not os.path.exists(path):
+            return cls(path)
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("feeds", {}))
+
+    def save(self):
+        """
+        Write the manifest to disk atomically.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "feeds": self.feeds}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def partitions_to_list(self, feed_key: str, days: list[date], today: date, relist_days: int) -> list[date]:
+        """
+        Select the partitions that must be listed again.
+
+        A partition is listed when it is not in the manifest yet, when it is within
+        `relist_days` of today, or when it was flagged with mark_changed.
+
+        Args:
+            feed_key (str): The feed key from FEEDS.
+            days (list): The days needed by the run.
+            today (date): The run date.
+            relist_days (int): Partitions this recent are always listed.
+
+        Returns:
+            list: The days to list, in input order.
+        """
+        recent_start = today - timedelta(days=relist_days)
+        partitions = self.feeds.get(feed_key, {})
+
+        to_list = []
+        for day in days:
+            entry = partitions.get(day.isoformat())
+            if entry is None or day >= recent_start or entry.get("changed"):
+                to_list.append(day)
+        return to_list
+
+    def get_daily_metrics(self, feed_key: str, day: date) -> dict | None:
+        """
+        Get the stored per-day totals of a partition, in aggregator.aggregate_daily_metrics format.
+
+        Returns:
+            dict: file_count, total_bytes, min_size, max_size and size_sketch, or None if the partition
+                  is empty or unknown.
+        """
+        entry = self.feeds.get(feed_key, {}).get(day.isoformat())
+        if not entry or not entry["object_count"]:
+            return None
+        return {
+            "file_count": entry["object_count"],
+            "total_bytes": entry["total_bytes"],
+            "min_size": entry["min_size"],
+            "max_size": entry["max_size"],
+            "size_sketch": SizeSketch.deserialize(entry["size_sketch"]),
+        }
+
+    def update_partition(self, feed_key: str, day: date, files: Iterable[dict]) -> dict | None:
+        """
+        Record a fresh listing of a partition and compare it with the previous one.
+
+        Args:
+            feed_key (str): The feed key from FEEDS.
+            day (date): The partition day.
+            files (iterable): File metadata with name, size and generation keys, consumed once.
+
+        Returns:
+            dict: The partition's date, its [before, after] file_count and total_bytes and the
+                  number of added, removed and rewritten (new generation) files, or None if the
+                  partition had not been listed before or its files did not change.
+        """
+        total = max_generation = 0
+        min_size = max_size = None
+        sketch = SizeSketch()
+        generations = {}
+        for file in files:
+            size, generation = file["size"] or 0, file.get("generation") or 0
+            total += size
+            min_size = size if min_size is None else min(min_size, size)
+            max_size = size if max_size is None else max(max_size, size)
+            max_generation = max(max_generation, generation)
+            sketch.add(size)
+            generations[name_digest(file["name"])] = generation
+
+        names = sorted(generations)
+        entry = {
+            "object_count": len(names),
+            "total_bytes": total,
+            "min_size": min_size or 0,
+            "max_size": max_size or 0,
+            "max_generation": max_generation,
+            "size_sketch": sketch.serialize(),
+            "names": _encode(names),
+            "generations": _encode(generations[name] for name in names),
+            "listed_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+        with self._lock:
+            partitions = self.feeds.setdefault(feed_key, {})
+            previous = partitions.get(day.isoformat())
+            partitions[day.isoformat()] = entry
+
+        if previous is None:
+            return None
+        before = dict(zip(_decode(previous["names"]), _decode(previous["generations"])))
+        added = sum(1 for name in generations if name not in before)
+        rewritten = sum(1 for name, generation in generations.items() if name in before and before[name] != generation)
+        removed = len(before) - (len(generations) - added)
+        if not (added or removed or rewritten):
+            return None
+        return {
+            "date": day.isoformat(),
+            "file_count": [previous["object_count"], entry["object_count"]],
+            "total_bytes": [previous["total_bytes"], total],
+            "added": added,
+            "removed": removed,
+            "rewritten": rewritten,
+        }
+
+    def mark_changed(self, feed_key: str, day: date):
+        """
+        Flag a partition as possibly changed so the next run lists it again (see main.flag_changed_partitions).
+        """
+        with self._lock:
+            entry = self.feeds.get(feed_key, {}).get(day.isoformat())
+            if entry is not None:
+                entry["changed"] = True
+
+    def evict(self, before: date):
+        """
+        Drop every partition older than `before`.
+        """
+        cutoff = before.isoformat()
+        with self._lock:
+            for partitions in self.feeds.values():
+                for day_key in [d for d in partitions if d < cutoff]:
+                    del partitions[day_key]
+
+def name_digest(name: str) -> int:
+    """
+    Signed 64-bit digest of an object name.
+    """
+    return int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big", signed=True)
+
+# Arrays are stored little-endian
+def _encode(values: Iterable[int]) -> str:
+    values = array("q", values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+def _decode(value: str) -> array:
+    values = array("q")
+    values.frombytes(base64.b64decode(value))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
@@ -0,0 +1,287 @@
+"""
+Where the daily feed metrics are stored: BigQuery (production) or a local SQLite file.
+
+The pipeline calls the module-level functions below (upsert_feed_metrics_bulk,
+query_historical_baselines, ...), which forward to the store selected by METRICS_STORE.
+The SQLite store has the same semantics as bq_client: upserts replace the file count and
+size of a feed/date and keep the stored row count and size sketch when the new ones are NULL, and baselines
+are the AVG over the rows present in the window. It makes dry runs, tests and local
+iterations independent of BigQuery, and lets the monitor run from a local history file.
+
+Copy a range of the BigQuery history into a local file:
+
+    python metrics_store.py --export history.sqlite --start 2024-01-01 --end 2025-06-30
+"""
+import argparse
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+from datetime import date, timedelta
+from threading import Lock
+
+from config import METRICS_STORE, METRICS_STORE_PATH
+from utils import baseline_window
+
+class MetricsStore(ABC):
+    """
+    Interface of a daily metrics store. Rows use the upsert format of bq_client
+    (feed_label, event_date, file_count, file_size in MB and optional row_count and size_sketch).
+    A backend missing one of the abstract methods cannot be instantiated.
+    """
+
+    @abstractmethod
+    def ensure_table(self) -> bool:
+        """
+        Create the metrics table if needed. Returns False if the store cannot be used.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def upsert_feed_metrics_bulk(self, rows: list[dict]) -> bool:
+        """
+        Upsert rows. Returns False if they were not written (errors may also be raised).
+        """
+        raise NotImplementedError
+
+    def upsert_feed_metrics(self, feed_label: str, event_date: date, file_count: int, file_size: float) -> bool:
+        return self.upsert_feed_metrics_bulk([{
+            "feed_label": feed_label,
+            "event_date": event_date,
+            "file_count": file_count,
+            "file_size": file_size,
+        }])
+
+    def load_feed_metrics(self, rows: list[dict]) -> bool:
+        """
+        Write many rows at once (backfills). Stores without a bulk path upsert them.
+        """
+        return self.upsert_feed_metrics_bulk(rows)
+
+    @abstractmethod
+    def query_historical_baseline(self, feed_label: str, start_date: date, end_date: date) -> tuple[float, float]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def query_historical_baselines(self, baseline_requests: list[tuple[str, date]]) -> dict[tuple[str, date], tuple[float, float]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def query_daily_metrics(self, start_date: date, end_date: date, feed_labels: list[str] | None = None) -> list[dict]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_run_metrics(self, rows: list[dict], run_date: date):
+        raise NotImplementedError
+
+class BigQueryMetricsStore(MetricsStore):
+    """
+    The monitoring table in BigQuery (bq_client). google-cloud-bigquery is imported on first use.
+    """
+
+    def ensure_table(self) -> bool:
+        import bq_client
+        return bq_client.get_verified_table_ref() is not None
+
+    def upsert_feed_metrics_bulk(self, rows):
+        import bq_client
+        return bq_client.upsert_feed_metrics_bulk(rows)
+
+    def load_feed_metrics(self, rows):
+        import bq_client
+        return bq_client.load_feed_metrics(rows)
+
+    def query_historical_baseline(self, feed_label, start_date, end_date):
+        import bq_client
+        return bq_client.query_historical_baseline(feed_label, start_date, end_date)
+
+    def query_historical_baselines(self, baseline_requests):
+        import bq_client
+        return bq_client.query_historical_baselines(baseline_requests)
+
+    def query_daily_metrics(self, start_date, end_date, feed_labels=None):
+        import bq_client
+        return bq_client.query_daily_metrics(start_date, end_date, feed_labels)
+
+    def insert_run_metrics(self, rows, run_date):
+        import bq_client
+        bq_client.insert_run_metrics(rows, run_date)
+
+class SQLiteMetricsStore(MetricsStore):
+    """
+    The monitoring table in a local SQLite file (":memory:" for a throwaway store).
+
+    One connection is shared by all threads and serialized with a lock; the (date, datafeed)
+    primary key makes upserts and window reads index lookups.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = Lock()
+        self.ensure_table()
+
+    def ensure_table(self) -> bool:
+        with self._lock, self._connection:
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS raw_data_monitoring (
+                    date TEXT NOT NULL,
+                    datafeed TEXT NOT NULL,
+                    filesize REAL NOT NULL,
+                    filecount INTEGER NOT NULL,
+                    rowcount INTEGER,
+                    sizesketch TEXT,
+                    PRIMARY KEY (datafeed, date)
+                )""")
+            # Columns added after a file was created
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(raw_data_monitoring)")}
+            for column, column_type in (("rowcount", "INTEGER"), ("sizesketch", "TEXT")):
+                if column not in columns:
+                    self._connection.execute(f"ALTER TABLE raw_data_monitoring ADD COLUMN {column} {column_type}")
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS raw_data_monitoring_runs (
+                    run_id TEXT NOT NULL,
+                    run_date TEXT NOT NULL,
+                    datafeed TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    value REAL NOT NULL
+                )""")
+        return True
+
+    def upsert_feed_metrics_bulk(self, rows):
+        if not rows:
+            return True
+
+        # Same as the BigQuery MERGE: last row wins, a NULL row count or sketch keeps the stored one
+        unique_rows = {(row["feed_label"], row["event_date"]): row for row in rows}
+        with self._lock, self._connection:
+            self._connection.executemany("""
+                INSERT INTO raw_data_monitoring (date, datafeed, filecount, filesize, rowcount, sizesketch)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (datafeed, date) DO UPDATE SET
+                    filecount = excluded.filecount,
+                    filesize = excluded.filesize,
+                    rowcount = COALESCE(excluded.rowcount, raw_data_monitoring.rowcount),
+                    sizesketch = COALESCE(excluded.sizesketch, raw_data_monitoring.sizesketch)
+                """, [
+                    (row["event_date"].isoformat(), row["feed_label"], row["file_count"], row["file_size"],
+                     row.get("row_count"), row.get("size_sketch"))
+                    for row in unique_rows.values()
+                ])
+        print(f"[INFO] Upserted {len(unique_rows)} rows into {self.path}")
+        return True
+
+    def query_historical_baseline(self, feed_label, start_date, end_date):
+        with self._lock:
+            avg_count, avg_size = self._connection.execute("""
+                SELECT AVG(filecount), AVG(filesize) FROM raw_data_monitoring
+                WHERE datafeed = ? AND date BETWEEN ? AND ?
+                """, (feed_label, start_date.isoformat(), end_date.isoformat())).fetchone()
+        if avg_count is None:
+            print(f"[WARN] No historical data for {feed_label} between {start_date} and {end_date}")
+            return 0.0, 0.0
+        return avg_count, avg_size
+
+    def query_historical_baselines(self, baseline_requests):
+        baselines = {}
+        for feed_label, expected_date in dict.fromkeys(baseline_requests):
+            start_date, end_date = baseline_window(expected_date)
+            baselines[(feed_label, expected_date)] = self.query_historical_baseline(feed_label, start_date, end_date)
+        return baselines
+
+    def query_daily_metrics(self, start_date, end_date, feed_labels=None):
+        query = """
+            SELECT date, datafeed, filecount, filesize, rowcount, sizesketch FROM raw_data_monitoring
+            WHERE date BETWEEN ? AND ?"""
+        params = [start_date.isoformat(), end_date.isoformat()]
+        if feed_labels:
+            query += f" AND datafeed IN ({', '.join('?' for _ in feed_labels)})"
+            params.extend(feed_labels)
+        query += " ORDER BY datafeed, date"
+
+        with self._lock:
+            rows = self._connection.execute(query, params).fetchall()
+        return [
+            {"date": date.fromisoformat(day), "datafeed": feed, "filecount": count, "filesize": size,
+             "rowcount": rowcount, "sizesketch": sketch}
+            for day, feed, count, size, rowcount, sketch in rows
+        ]
+
+    def insert_run_metrics(self, rows, run_date):
+        if not rows:
+            return
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO raw_data_monitoring_runs (run_id, run_date, datafeed, metric, value) VALUES (?, ?, ?, ?, ?)",
+                [(row["run_id"], run_date.isoformat(), row["datafeed"], row["metric"], row["value"]) for row in rows],
+            )
+
+_store = None
+_store_lock = Lock()
+
+def get_metrics_store() -> MetricsStore:
+    """
+    Return the process-wide store selected by METRICS_STORE ("bigquery" or "sqlite").
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            if METRICS_STORE == "sqlite":
+                _store = SQLiteMetricsStore(METRICS_STORE_PATH)
+            elif METRICS_STORE == "bigquery":
+                _store = BigQueryMetricsStore()
+            else:
+                raise ValueError(f"Unknown METRICS_STORE {METRICS_STORE!r} (expected 'bigquery' or 'sqlite')")
+        return _store
+
+def set_metrics_store(store: MetricsStore | None):
+    """
+    Install a store to use instead of the configured one (tests, benchmarks); None resets it.
+    """
+    global _store
+    with _store_lock:
+        _store = store
+
+# The functions used by the pipeline, forwarding to the current store
+
+def upsert_feed_metrics(feed_label: str, event_date: date, file_count: int, file_size: float) -> bool:
+    return get_metrics_store().upsert_feed_metrics(feed_label, event_date, file_count, file_size)
+
+def upsert_feed_metrics_bulk(rows: list[dict]) -> bool:
+    return get_metrics_store().upsert_feed_metrics_bulk(rows)
+
+def load_feed_metrics(rows: list[dict]) -> bool:
+    return get_metrics_store().load_feed_metrics(rows)
+
+def query_historical_baseline(feed_label: str, start_date: date, end_date: date) -> tuple[float, float]:
+    return get_metrics_store().query_historical_baseline(feed_label, start_date, end_date)
+
+def query_historical_baselines(baseline_requests: list[tuple[str, date]]) -> dict[tuple[str, date], tuple[float, float]]:
+    return get_metrics_store().query_historical_baselines(baseline_requests)
+
+def query_daily_metrics(start_date: date, end_date: date, feed_labels: list[str] | None = None) -> list[dict]:
+    return get_metrics_store().query_daily_metrics(start_date, end_date, feed_labels)
+
+def insert_run_metrics(rows: list[dict], run_date: date):
+    get_metrics_store().insert_run_metrics(rows, run_date)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--export", metavar="SQLITE", required=True, help="SQLite file to copy the history into")
+    parser.add_argument("--start", type=date.fromisoformat, required=True, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today() - timedelta(days=1),
+                        help="Last day (YYYY-MM-DD, default: yesterday)")
+    args = parser.parse_args()
+
+    rows = BigQueryMetricsStore().query_daily_metrics(args.start, args.end)
+    SQLiteMetricsStore(args.export).upsert_feed_metrics_bulk([
+        {"feed_label": row["datafeed"], "event_date": row["date"], "file_count": row["filecount"],
+         "file_size": row["filesize"], "row_count": row.get("rowcount"), "size_sketch": row.get("sizesketch")}
+        for row in rows
+    ])
+    print(f"[INFO] Exported {len(rows)} rows to {args.export}; set METRICS_STORE = \"sqlite\" and "
+          f"METRICS_STORE_PATH to use it")
+
+if __name__ == "__main__":
+    main()
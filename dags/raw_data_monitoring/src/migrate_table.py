@@ -0,0 +1,101 @@
+"""
+Convert an existing unpartitioned raw_data_monitoring table into the partitioned and
+clustered layout of bq_client.build_metrics_table (partitioned by day on date, clustered
+by datafeed). BigQuery cannot change the partitioning of a table in place, so:
+
+1. a new table <TABLE_ID>_partitioned is created and filled with one INSERT ... SELECT,
+2. the row counts of both tables are compared,
+3. the old table is renamed to <TABLE_ID>_unpartitioned_<YYYYMMDD> (kept as a backup)
+   and the new one takes its name, so reports and the DAG keep working unchanged.
+
+Pause the monitoring DAG while it runs.
+
+    python migrate_table.py --dry-run
+    python migrate_table.py
+"""
+import argparse
+from datetime import date
+
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from bq_client import (METRICS_SCHEMA, CLUSTERING_FIELDS, PARTITION_FIELD, build_metrics_table,
+                       ensure_dataset_and_table_exist, run_query)
+from clients import get_bigquery_client
+from config import PROJECT_ID, DATASET_ID, TABLE_ID
+
+def is_partitioned(table: bigquery.Table) -> bool:
+    """
+    Return True if the table already has the partitioning and clustering of build_metrics_table.
+    """
+    partitioning = table.time_partitioning
+    return (partitioning is not None and partitioning.field == PARTITION_FIELD
+            and list(table.clustering_fields or []) == CLUSTERING_FIELDS)
+
+def count_rows(table_ref) -> int:
+    return next(iter(run_query(f"SELECT COUNT(*) AS n FROM `{table_ref}`")))["n"]
+
+def migrate_metrics_table(dry_run: bool = False) -> bool:
+    """
+    Copy the monitoring table into a partitioned and clustered table and swap their names.
+
+    Args:
+        dry_run (bool): Only print what would be done.
+
+    Returns:
+        bool: True if the table is partitioned at the end (or would be, for a dry run).
+    """
+    client = get_bigquery_client()
+    dataset_ref = bigquery.DatasetReference(PROJECT_ID, DATASET_ID)
+    table_ref = dataset_ref.table(TABLE_ID)
+    new_ref = dataset_ref.table(f"{TABLE_ID}_partitioned")
+    backup_id = f"{TABLE_ID}_unpartitioned_{date.today():%Y%m%d}"
+
+    try:
+        table = client.get_table(table_ref)
+    except NotFound:
+        print(f"[ERROR] Table {TABLE_ID} does not exist; the monitoring run creates it partitioned.")
+        return False
+
+    if is_partitioned(table):
+        print(f"[INFO] Table {TABLE_ID} is already partitioned on {PARTITION_FIELD} and clustered by "
+              f"{', '.join(CLUSTERING_FIELDS)}. Nothing to do.")
+        return True
+
+    print(f"[INFO] Migrating {table.num_rows} rows of {TABLE_ID} ({(table.num_bytes or 0) / 1_000_000:.1f} MB)")
+    print(f"[INFO]   create {new_ref.table_id}, partitioned on {PARTITION_FIELD}, clustered by {', '.join(CLUSTERING_FIELDS)}")
+    print(f"[INFO]   rename {TABLE_ID} -> {backup_id}, {new_ref.table_id} -> {TABLE_ID}")
+    if dry_run:
+        return True
+
+    # Bring the old table to the current schema first, so every column can be copied
+    if ensure_dataset_and_table_exist() is None:
+        return False
+
+    client.delete_table(new_ref, not_found_ok=True)  # Leftover of an interrupted migration
+    client.create_table(build_metrics_table(new_ref))
+
+    columns = ", ".join(field.name for field in METRICS_SCHEMA)
+    run_query(f"INSERT INTO `{new_ref}` ({columns}) SELECT {columns} FROM `{table_ref}`")
+
+    old_count, new_count = count_rows(table_ref), count_rows(new_ref)
+    if old_count != new_count:
+        print(f"[ERROR] Copied {new_count} of {old_count} rows; {TABLE_ID} left unchanged, {new_ref.table_id} kept for inspection.")
+        return False
+
+    run_query(f"ALTER TABLE `{table_ref}` RENAME TO `{backup_id}`")
+    run_query(f"ALTER TABLE `{new_ref}` RENAME TO `{TABLE_ID}`")
+    print(f"[INFO] {TABLE_ID} is now partitioned ({new_count} rows). The old table is kept as {backup_id}; "
+          f"drop it once the next runs look right.")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Only print the migration plan")
+    args = parser.parse_args()
+
+    if not migrate_metrics_table(args.dry_run):
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Row counts and schema fingerprints from Parquet footers, read with HTTP range requests.
+
+A Parquet file ends with its Thrift-encoded FileMetaData, a 4-byte little-endian footer
+length and the "PAR1" magic. Only the last FOOTER_READ_BYTES of an object are fetched
+(plus the rest of the footer when it is larger), so inspecting a multi-GB file costs
+one or two small ranged GETs. Results are cached by object name and generation.
+"""
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import date
+from threading import Lock
+from typing import Iterable, Iterator
+
+import instrumentation
+from config import FOOTER_MAX_WORKERS, FOOTER_READ_BYTES
+
+PARQUET_MAGIC = b"PAR1"
+
+# Thrift compact protocol type ids
+_BOOL_TRUE, _BOOL_FALSE, _BYTE, _I16, _I32, _I64, _DOUBLE, _BINARY, _LIST, _SET, _MAP, _STRUCT = range(1, 13)
+
+class InvalidParquetFile(ValueError):
+    """
+    The object does not end with a readable Parquet footer (truncated or not Parquet).
+    """
+
+class _CompactReader:
+    """
+    Minimal Thrift compact protocol decoder: structs become {field id: value} dictionaries.
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def _byte(self) -> int:
+        if self.pos >= len(self.data):
+            raise InvalidParquetFile("footer ends unexpectedly")
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def _varint(self) -> int:
+        shift = result = 0
+        while True:
+            byte = self._byte()
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def _zigzag(self) -> int:
+        value = self._varint()
+        return (value >> 1) ^ -(value & 1)
+
+    def _value(self, type_id: int):
+        if type_id == _BOOL_TRUE:
+            return True
+        if type_id == _BOOL_FALSE:
+            return False
+        if type_id == _BYTE:
+            return self._byte()
+        if type_id in (_I16, _I32, _I64):
+            return self._zigzag()
+        if type_id == _DOUBLE:
+            self.pos += 8
+            return None
+        if type_id == _BINARY:
+            length = self._varint()
+            value = self.data[self.pos:self.pos + length]
+            self.pos += length
+            return value
+        if type_id in (_LIST, _SET):
+            header = self._byte()
+            size, element_type = header >> 4, header & 0x0F
+            if size == 15:
+                size = self._varint()
+            if element_type in (_BOOL_TRUE, _BOOL_FALSE):
+                return [self._byte() == 1 for _ in range(size)]
+            return [self._value(element_type) for _ in range(size)]
+        if type_id == _MAP:
+            size = self._varint()
+            if not size:
+                return {}
+            types = self._byte()
+            return {self._value(types >> 4): self._value(types & 0x0F) for _ in range(size)}
+        if type_id == _STRUCT:
+            return self.read_struct()
+        raise InvalidParquetFile(f"unknown thrift type {type_id}")
+
+    def read_struct(self) -> dict:
+        fields = {}
+        field_id = 0
+        while True:
+            header = self._byte()
+            if header == 0:
+                return fields
+            delta, type_id = header >> 4, header & 0x0F
+            field_id = field_id + delta if delta else self._zigzag()
+            fields[field_id] = self._value(type_id)
+
+def parse_footer(footer: bytes) -> dict:
+    """
+    Decode a Parquet FileMetaData.
+
+    Args:
+        footer (bytes): The Thrift-encoded FileMetaData (without length and magic).
+
+    Returns:
+        dict: num_rows, num_row_groups and schema_fingerprint (a hash of the column names,
+              physical/converted types, repetitions and nesting, stable across writers).
+    """
+    metadata = _CompactReader(footer).read_struct()
+    if 3 not in metadata or 2 not in metadata:
+        raise InvalidParquetFile("footer has no row count or schema")
+
+    # SchemaElement: 1 type, 3 repetition_type, 4 name, 5 num_children, 6 converted_type
+    schema = [
+        [element.get(4, b"").decode("utf-8", "replace") if i else "", element.get(1), element.get(3),
+         element.get(5), element.get(6)]
+        for i, element in enumerate(metadata[2])
+    ]
+    fingerprint = hashlib.sha256(json.dumps(schema).encode("utf-8")).hexdigest()[:16]
+    return {"num_rows": metadata[3], "num_row_groups": len(metadata.get(4, [])), "schema_fingerprint": fingerprint}
+
+def read_footer(storage_client, bucket_name: str, name: str, generation: int | None, size: int) -> dict:
+    """
+    Fetch and decode the footer of one object with ranged reads of that exact generation.
+
+    Raises:
+        InvalidParquetFile: If the object does not end with a valid footer.
+    """
+    if size < 2 * len(PARQUET_MAGIC) + 4:
+        raise InvalidParquetFile("object is too small")
+
+    blob = storage_client.bucket(bucket_name).blob(name, generation=generation or None)
+    tail = blob.download_as_bytes(start=max(0, size - FOOTER_READ_BYTES), end=size - 1)
+    instrumentation.count("footer_reads")
+    instrumentation.count("footer_bytes", len(tail))
+
+    if tail[-4:] != PARQUET_MAGIC:
+        raise InvalidParquetFile("missing PAR1 magic at the end")
+    footer_length = int.from_bytes(tail[-8:-4], "little")
+    if footer_length + 8 + len(PARQUET_MAGIC) > size:
+        raise InvalidParquetFile(f"footer length {footer_length} exceeds the object size")
+
+    if footer_length + 8 > len(tail):
+        # Footer larger than the first read: fetch the missing head of it
+        start = size - footer_length - 8
+        head = blob.download_as_bytes(start=start, end=size - len(tail) - 1)
+        instrumentation.count("footer_reads")
+        instrumentation.count("footer_bytes", len(head))
+        tail = head + tail
+
+    return parse_footer(tail[-footer_length - 8:-8])
+
+class FooterCache:
+    """
+    Footer results by object name and generation, stored as gzipped JSON, so no file is read twice.
+
+    Unreadable footers are cached too (num_rows None), since a generation never changes.
+    """
+
+    def __init__(self, path: str, entries: dict | None = None):
+        self.path = path
+        self.entries = entries or {}
+        self._lock = Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "FooterCache":
+        if not os.path.exists(path):
+            return cls(path)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return cls(path, json.load(f).get("entries", {}))
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with self._lock:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump({"version": 1, "entries": self.entries}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def get(self, name: str, generation: int) -> dict | None:
+        """
+        Return the cached num_rows/schema_fingerprint (num_rows None if unreadable), or None if not cached.
+        """
+        entry = self.entries.get(name)
+        if entry is None or entry[0] != generation:
+            return None
+        return {"num_rows": entry[1], "schema_fingerprint": entry[2]}
+
+    def put(self, name: str, generation: int, info: dict | None):
+        with self._lock:
+            self.entries[name] = [generation, info and info["num_rows"], info and info["schema_fingerprint"]]
+
+    def retain(self, names: set[str]):
+        """
+        Drop the entries of objects that are no longer in the monitored window.
+        """
+        with self._lock:
+            self.entries = {name: entry for name, entry in self.entries.items() if name in names}
+
+class ObjectCollector:
+    """
+    Records the name -> [generation, size] objects of the window's days from streamed listings,
+    while passing the files through, so their footers can be read without listing them again.
+
+    Usage:
+        collector = ObjectCollector(window_days)
+        daily_metrics = aggregate_daily_metrics(collector.wrap(listing, listed_days))
+        objects_by_day = collector.objects
+    """
+
+    def __init__(self, days: Iterable[date]):
+        self.days = set(days)
+        self.objects = {}
+        self.skipped = False
+
+    def wrap(self, file_metadata: Iterable[dict], listed_days: Iterable[date] = ()) -> Iterator[dict]:
+        """
+        Pass the files of a listing through, recording the objects of the window's days.
+
+        Args:
+            file_metadata (iterable): File metadata with name, size, generation and actual_date keys.
+            listed_days (iterable): Days the listing covers completely (days without objects are recorded empty).
+        """
+        for day in listed_days:
+            if day in self.days:
+                self.objects.setdefault(day, {})
+        for file in file_metadata:
+            day = file.get("actual_date")
+            if day in self.days:
+                self.objects.setdefault(day, {})[file["name"]] = [file.get("generation") or 0, file["size"] or 0]
+            yield file
+
+    def skip(self):
+        """
+        Record that the window was not listed (e.g. served from event counters).
+        """
+        self.skipped = True
+
+def inspect_footers(storage_client, bucket_name: str, objects: dict[str, list], cache: FooterCache,
+                    max_workers: int = FOOTER_MAX_WORKERS) -> dict[str, dict | None]:
+    """
+    Get the footer of every object, reading only those not in the cache, concurrently.
+
+    Args:
+        storage_client (storage.Client): Client shared by all worker threads.
+        bucket_name (str): The bucket.
+        objects (dict): Object name -> [generation, size] (the manifest's object map).
+        cache (FooterCache): Results of previous runs; updated in place.
+        max_workers (int): Maximum concurrent ranged reads.
+
+    Returns:
+        dict: Object name -> num_rows/schema_fingerprint, or None if the footer is unreadable.
+              Objects that could not be fetched are left out (callers treat their day's
+              row count as unknown).
+    """
+    results = {}
+    to_read = []
+    for name, (generation, size) in objects.items():
+        cached = cache.get(name, generation)
+        if cached is None:
+            to_read.append((name, generation, size))
+        else:
+            results[name] = cached if cached["num_rows"] is not None else None
+    instrumentation.count("footer_cache_hits", len(objects) - len(to_read))
+
+    def read(name, generation, size):
+        try:
+            info = read_footer(storage_client, bucket_name, name, generation, size)
+        except InvalidParquetFile as e:
+            print(f"[WARN] Unreadable Parquet footer in gs://{bucket_name}/{name}: {e}")
+            info = None
+        cache.put(name, generation, info)
+        results[name] = info
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="footer") as executor:
+        # Each read runs in a copy of the caller's context so counters go to the caller's feed
+        futures = {name: executor.submit(copy_context().run, read, name, generation, size)
+                   for name, generation, size in to_read}
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                # e.g. deleted since it was listed: unknown rather than unreadable, retried next run
+                print(f"[WARN] Could not read the footer of gs://{bucket_name}/{name}: {e}")
+    return results
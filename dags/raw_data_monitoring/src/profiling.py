@@ -0,0 +1,321 @@
+"""
+On-demand profiling of a monitoring run (main.run or one feed's process_feed).
+
+Switched on per run by the raw_data_monitoring_profile Airflow Variable, the
+RAW_DATA_MONITORING_PROFILE environment variable or PROFILING_ENABLED. While a run is
+profiled:
+
+- a background thread samples the stacks of every thread (wall clock, so time spent
+  waiting on GCS or BigQuery shows up next to CPU time),
+- tracemalloc records allocations, reported as the top source lines at the end of the run,
+- every HTTP call made through requests (the GCS and BigQuery clients share one
+  AuthorizedSession) is timed into a per-service latency histogram.
+
+The artifacts are written to PROFILING_DIR/<run id>/<scope>/:
+
+    summary.json           wall time, sample count, traced memory peak and call latencies
+    stack_samples.folded   one "frame;frame;... count" line per stack (flamegraph.pl, speedscope)
+    top_functions.txt      functions by inclusive and self samples
+    memory_top.txt         source lines holding the most memory at the end of the run
+
+When profiling is off nothing is patched or started, so runs have no overhead.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from config import PROFILING_ENABLED, PROFILING_DIR, PROFILING_SAMPLE_INTERVAL_MS
+from size_sketch import SizeSketch
+
+PROFILE_ENV_VAR = "RAW_DATA_MONITORING_PROFILE"
+PROFILE_VARIABLE = "raw_data_monitoring_profile"
+
+# Lines kept in the top functions and memory reports
+TOP_N = 30
+
+# Latency histograms are keyed by service, other hosts by their name
+SERVICE_HOSTS = {
+    "storage.googleapis.com": "gcs",
+    "bigquery.googleapis.com": "bigquery",
+    "hooks.slack.com": "slack",
+}
+
+_active_lock = threading.Lock()
+_active = False
+
+def profiling_enabled(flag=None) -> bool:
+    """
+    Return True if a run should be profiled.
+
+    Args:
+        flag: The Airflow Variable value (bool or "true"/"1"/"yes"/"on"), or None to read
+            RAW_DATA_MONITORING_PROFILE and then PROFILING_ENABLED.
+    """
+    if flag is None:
+        flag = os.getenv(PROFILE_ENV_VAR)
+    if flag is None:
+        return PROFILING_ENABLED
+    if isinstance(flag, str):
+        return flag.strip().lower() in ("1", "true", "yes", "on")
+    return bool(flag)
+
+class StackSampler:
+    """
+    Counts the stacks of every thread, sampled from a background thread every `interval` seconds.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def folded(self) -> str:
+        """
+        The samples in collapsed stack format, heaviest stacks first.
+        """
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = TOP_N) -> str:
+        """
+        The functions found in most samples (inclusive) and on top of most stacks (self).
+        """
+        inclusive = Counter()
+        exclusive = Counter()
+        for stack, count in self.stacks.items():
+            for function in set(stack):
+                inclusive[function] += count
+            exclusive[stack[-1]] += count
+
+        total = sum(self.stacks.values()) or 1
+        lines = [f"{self.samples} samples every {self.interval * 1000:.0f} ms, all threads (wall clock)", ""]
+        for title, counter in (("Inclusive", inclusive), ("Self", exclusive)):
+            lines.append(f"{title}:")
+            lines.extend(f"{count:>8} {100 * count / total:6.1f}%  {function}" for function, count in counter.most_common(limit))
+            lines.append("")
+        return "\n".join(lines)
+
+class CallLatencies:
+    """
+    Thread-safe per-service latency histograms (microseconds in a size_sketch.SizeSketch, ~6% error).
+    """
+
+    def __init__(self):
+        self.sketches = {}
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, service: str, seconds: float):
+        with self._lock:
+            self.sketches.setdefault(service, SizeSketch()).add(int(seconds * 1_000_000))
+            total, longest = self.totals.get(service, (0.0, 0.0))
+            self.totals[service] = (total + seconds, max(longest, seconds))
+
+    def to_dict(self) -> dict:
+        """
+        Calls, total and max seconds, p50/p90/p99 in ms and the serialized histogram per service.
+        """
+        with self._lock:
+            summary = {}
+            for service, sketch in sorted(self.sketches.items()):
+                total, longest = self.totals[service]
+                summary[service] = {
+                    "calls": sketch.count,
+                    "total_seconds": round(total, 6),
+                    "max_ms": round(longest * 1000, 3),
+                    **{f"p{int(q * 100)}_ms": round(sketch.quantile(q) / 1000, 3) for q in (0.5, 0.9, 0.99)},
+                    "histogram": sketch.serialize(),
+                }
+            return summary
+
+def call_service(url: str) -> str:
+    """
+    The latency histogram of a request URL ("gcs", "bigquery", "slack" or the host name).
+    """
+    host = urlsplit(str(url)).hostname or "unknown"
+    return SERVICE_HOSTS.get(host, host)
+
+class RunProfile:
+    """
+    The samplers of one profiled run; see profile_run.
+    """
+
+    def __init__(self, run_id: str, scope: str, sample_interval_ms: float = PROFILING_SAMPLE_INTERVAL_MS):
+        self.run_id = run_id
+        self.scope = scope
+        self.sampler = StackSampler(sample_interval_ms / 1000)
+        self.latencies = CallLatencies()
+        self.started_at = None
+        self.wall_seconds = None
+        self.memory_snapshot = None
+        self.memory_peak = None
+        self._start = None
+        self._original_request = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        import requests
+        import tracemalloc
+
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+
+        # Time every HTTP call; Session.request also serves the GCS/BigQuery AuthorizedSession
+        original = self._original_request = requests.Session.request
+        latencies = self.latencies
+
+        def timed_request(session, method, url, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(session, method, url, *args, **kwargs)
+            finally:
+                latencies.record(call_service(url), time.perf_counter() - start)
+
+        requests.Session.request = timed_request
+        self.sampler.start()
+
+    def stop(self):
+        import requests
+        import tracemalloc
+
+        self.sampler.stop()
+        requests.Session.request = self._original_request
+        self.memory_snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        self.memory_peak = tracemalloc.get_traced_memory()[1]
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        self.wall_seconds = time.perf_counter() - self._start
+
+    def summary(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "scope": self.scope,
+            "started_at": self.started_at.isoformat(),
+            "wall_seconds": round(self.wall_seconds, 3),
+            "samples": self.sampler.samples,
+            "sample_interval_ms": self.sampler.interval * 1000,
+            "traced_memory_peak_mb": round(self.memory_peak / 1_000_000, 3),
+            "call_latencies": self.latencies.to_dict(),
+        }
+
+    def memory_top(self, limit: int = TOP_N) -> str:
+        statistics = self.memory_snapshot.statistics("lineno")
+        lines = [f"Traced memory peak: {self.memory_peak / 1_000_000:.1f} MB; held at the end of the run:", ""]
+        for stat in statistics[:limit]:
+            frame = stat.traceback[0]
+            lines.append(f"{stat.size / 1_000_000:10.2f} MB {stat.count:>9} blocks  {frame.filename}:{frame.lineno}")
+        return "\n".join(lines) + "\n"
+
+    def artifacts(self) -> dict[str, str]:
+        return {
+            "summary.json": json.dumps(self.summary(), indent=2),
+            "stack_samples.folded": self.sampler.folded(),
+            "top_functions.txt": self.sampler.top_functions(),
+            "memory_top.txt": self.memory_top(),
+        }
+
+    def write(self, target: str | None = None) -> str:
+        """
+        Write the artifacts to target/<run id>/<scope>/, a local directory or gs://bucket/prefix
+        (default: PROFILING_DIR).
+
+        Returns:
+            str: The directory or gs:// path written to.
+        """
+        target = target or PROFILING_DIR
+        safe_run_id = re.sub(r"[^A-Za-z0-9_.-]", "_", self.run_id)
+        location = f"{target.rstrip('/')}/{safe_run_id}/{self.scope}"
+        artifacts = self.artifacts()
+
+        if location.startswith("gs://"):
+            from clients import get_storage_client
+            bucket_name, _, prefix = location[len("gs://"):].partition("/")
+            bucket = get_storage_client().bucket(bucket_name)
+            for name, content in artifacts.items():
+                bucket.blob(f"{prefix}/{name}").upload_from_string(content)
+        else:
+            os.makedirs(location, exist_ok=True)
+            for name, content in artifacts.items():
+                with open(os.path.join(location, name), "w", encoding="utf-8") as f:
+                    f.write(content)
+        return location
+
+@contextmanager
+def profile_run(run_id: str, scope: str, enabled=None):
+    """
+    Profile the block if profiling is enabled (see profiling_enabled) and write its artifacts.
+
+    Only one block is profiled at a time in a process; nested or concurrent blocks run unprofiled.
+
+    Args:
+        run_id (str): The Airflow run id, used in the artifact path.
+        scope (str): "run" for main.run, the feed key for process_feed.
+        enabled: The Airflow Variable value, or None for the environment/config default.
+
+    Yields:
+        RunProfile: The profile in progress, or None if the block is not profiled.
+    """
+    global _active
+    if not profiling_enabled(enabled):
+        yield None
+        return
+
+    with _active_lock:
+        claimed = not _active
+        _active = True
+    if not claimed:
+        yield None
+        return
+
+    profile = RunProfile(run_id, scope)
+    try:
+        profile.start()
+        print(f"[INFO] Profiling {scope} of {run_id}")
+        try:
+            yield profile
+        finally:
+            profile.stop()
+            try:
+                print(f"[INFO] Profile of {scope} written to {profile.write()}")
+            except Exception as e:
+                print(f"[WARN] Could not write profile of {run_id}: {e}")
+    finally:
+        with _active_lock:
+            _active = False
@@ -0,0 +1,127 @@
+import gzip
+import json
+import os
+import re
+import time
+from datetime import date
+
+from size_sketch import SizeSketch
+
+class RunState:
+    """
+    Checkpoint of a feed's progress in one DAG run, so an Airflow retry resumes where the failed try stopped.
+
+    Each step of main.process_feed / main.run is recorded once it has completed: the listing
+    (with the aggregated per-day totals and delivery changes), the upsert of the metric rows
+    and the analysis result. A retry of the same run restores the listing and result instead
+    of listing the bucket again and skips an upsert that already went through.
+
+    The state is tied to the run's upsert window: a retry on another day (new window) starts
+    over. It is stored as gzipped JSON in STATE_DIR, one file per run and feed, and removed
+    once the run has completed.
+    """
+
+    def __init__(self, path: str, run_id: str, window: tuple[date, date], data: dict | None = None):
+        self.path = path
+        self.run_id = run_id
+        self.window = window
+        data = data or {}
+        self.daily_metrics = _decode_metrics(data["daily_metrics"]) if "daily_metrics" in data else None
+        self.changes = data.get("changes")
+        self.upserted = data.get("upserted", False)
+        self.result = data.get("result")
+
+    @classmethod
+    def load(cls, path: str, run_id: str, window: tuple[date, date]) -> "RunState":
+        """
+        Load the checkpoint of a run, or start an empty one if there is none for this run and window.
+
+        Args:
+            path (str): Path of the gzipped JSON checkpoint (see run_state_path).
+            run_id (str): The Airflow run id.
+            window (tuple): The run's (upsert_start, upsert_end).
+
+        Returns:
+            RunState: The loaded checkpoint.
+        """
+        if not os.path.exists(path):
+            return cls(path, run_id, window)
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("run_id") != run_id or data.get("window") != [day.isoformat() for day in window]:
+            return cls(path, run_id, window)
+        return cls(path, run_id, window, data)
+
+    @property
+    def listed(self) -> bool:
+        return self.daily_metrics is not None
+
+    def save(self):
+        """
+        Write the checkpoint to disk atomically.
+        """
+        data = {
+            "version": 1,
+            "run_id": self.run_id,
+            "window": [day.isoformat() for day in self.window],
+            "changes": self.changes,
+            "upserted": self.upserted,
+            "result": self.result,
+        }
+        if self.daily_metrics is not None:
+            data["daily_metrics"] = _encode_metrics(self.daily_metrics)
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """
+        Remove the checkpoint once the run has completed.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def run_state_path(state_dir: str, run_id: str, feed_key: str) -> str:
+    # Airflow run ids contain ':' and '+' (scheduled__2025-01-01T04:00:00+00:00)
+    safe_run_id = re.sub(r"[^A-Za-z0-9_.-]", "_", run_id)
+    return os.path.join(state_dir, f"run_state_{safe_run_id}_{feed_key}.json.gz")
+
+def evict_run_states(state_dir: str, retention_days: int, now: float | None = None) -> int:
+    """
+    Remove the checkpoints of runs that never completed, once older than retention_days.
+
+    Returns:
+        int: The number of files removed.
+    """
+    if not os.path.isdir(state_dir):
+        return 0
+
+    cutoff = (now or time.time()) - retention_days * 86400
+    removed = 0
+    for name in os.listdir(state_dir):
+        path = os.path.join(state_dir, name)
+        if name.startswith("run_state_") and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed += 1
+    return removed
+
+def _encode_metrics(daily_metrics: dict[date, dict]) -> dict[str, dict]:
+    encoded = {}
+    for day, totals in daily_metrics.items():
+        totals = dict(totals)
+        if totals.get("size_sketch") is not None:
+            totals["size_sketch"] = totals["size_sketch"].serialize()
+        encoded[day.isoformat()] = totals
+    return encoded
+
+def _decode_metrics(encoded: dict[str, dict]) -> dict[date, dict]:
+    daily_metrics = {}
+    for day, totals in encoded.items():
+        if "size_sketch" in totals:
+            totals["size_sketch"] = SizeSketch.deserialize(totals["size_sketch"])
+        daily_metrics[date.fromisoformat(day)] = totals
+    return daily_metrics
@@ -0,0 +1,158 @@
+import base64
+import math
+from typing import Iterable
+
+# Each power of two is split into 2**SUB_BITS buckets, so a bucket spans at most 12.5% of its lower bound
+SUB_BITS = 3
+SUB_BUCKETS = 1 << SUB_BITS
+# Sizes below 2 * SUB_BUCKETS have a bucket each; bucket count covers every int64 size
+NUM_BUCKETS = SUB_BUCKETS + (63 - SUB_BITS) * SUB_BUCKETS
+
+def bucket_index(size: int) -> int:
+    """
+    Log-linear bucket of an object size in bytes.
+    """
+    if size < 2 * SUB_BUCKETS:
+        return max(size, 0)
+    exponent = size.bit_length() - 1
+    return (exponent - SUB_BITS + 1) * SUB_BUCKETS + (size >> (exponent - SUB_BITS)) - SUB_BUCKETS
+
+def bucket_indices(sizes: "np.ndarray") -> "np.ndarray":
+    """
+    bucket_index of every size of an int64 array.
+    """
+    import numpy as np  # Only needed for catalogs
+
+    sizes = np.maximum(sizes.astype(np.int64), 0)
+    _, exponents = np.frexp(sizes.astype(np.float64))
+    exponents = exponents.astype(np.int64) - 1
+    # frexp rounds sizes above 2**53; fix the exponent where it overshoots
+    exponents -= (exponents >= 0) & ((sizes >> np.clip(exponents, 0, 62)) == 0)
+    shift = np.clip(exponents - SUB_BITS, 0, None)
+    indices = (exponents - SUB_BITS + 1) * SUB_BUCKETS + (sizes >> shift) - SUB_BUCKETS
+    return np.where(sizes < 2 * SUB_BUCKETS, sizes, indices)
+
+def bucket_bounds(index: int) -> tuple[int, int]:
+    """
+    Smallest and largest size of a bucket.
+    """
+    if index < 2 * SUB_BUCKETS:
+        return index, index
+    exponent = index // SUB_BUCKETS + SUB_BITS - 1
+    mantissa = index % SUB_BUCKETS + SUB_BUCKETS
+    shift = exponent - SUB_BITS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+class SizeSketch:
+    """
+    Mergeable histogram of object sizes with log-linear buckets (fixed memory, ~6% quantile error).
+
+    A sketch is a list of NUM_BUCKETS counts however many objects were added; merging two
+    sketches adds their counts, so a baseline over many days is the sum of daily sketches.
+    It serializes to a short base64 string of (bucket delta, count) varints, stored next to
+    the daily metrics.
+    """
+
+    __slots__ = ("counts",)
+
+    def __init__(self, counts: list[int] | None = None):
+        self.counts = counts if counts is not None else [0] * NUM_BUCKETS
+
+    @classmethod
+    def from_sizes(cls, sizes: Iterable[int]) -> "SizeSketch":
+        sketch = cls()
+        for size in sizes:
+            sketch.add(size)
+        return sketch
+
+    @classmethod
+    def from_array(cls, sizes: "np.ndarray") -> "SizeSketch":
+        """
+        Build a sketch from a NumPy array of sizes at once.
+        """
+        import numpy as np  # Only needed for catalogs
+
+        counts = np.bincount(bucket_indices(sizes), minlength=NUM_BUCKETS)
+        return cls(counts.tolist())
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, SizeSketch) and self.counts == other.counts
+
+    def __repr__(self) -> str:
+        return f"SizeSketch({self.serialize()!r})"
+
+    def add(self, size: int):
+        self.counts[bucket_index(size)] += 1
+
+    def merge(self, other: "SizeSketch") -> "SizeSketch":
+        """
+        Add the counts of another sketch to this one (in place) and return it.
+        """
+        counts = self.counts
+        for index, count in enumerate(other.counts):
+            if count:
+                counts[index] += count
+        return self
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Approximate q-quantile of the sizes (middle of the bucket holding it), or None if empty.
+        """
+        total = self.count
+        if not total:
+            return None
+        rank = max(1, min(total, math.ceil(q * total)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                low, high = bucket_bounds(index)
+                return (low + high) / 2
+        return None
+
+    def serialize(self) -> str:
+        """
+        Compact text form: base64 of (bucket index delta, count) unsigned varints.
+        """
+        encoded = bytearray()
+        previous = 0
+        for index, count in enumerate(self.counts):
+            if count:
+                _write_varint(encoded, index - previous)
+                _write_varint(encoded, count)
+                previous = index
+        return base64.b64encode(bytes(encoded)).decode("ascii")
+
+    @classmethod
+    def deserialize(cls, value: str | None) -> "SizeSketch | None":
+        if not value:
+            return None
+        data = base64.b64decode(value)
+        counts = [0] * NUM_BUCKETS
+        position = index = 0
+        while position < len(data):
+            delta, position = _read_varint(data, position)
+            count, position = _read_varint(data, position)
+            index += delta
+            counts[index] += count
+        return cls(counts)
+
+def _write_varint(buffer: bytearray, value: int):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def _read_varint(data: bytes, position: int) -> tuple[int, int]:
+    shift = value = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
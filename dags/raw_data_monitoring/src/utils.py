@@ -1,5 +1,9 @@
 import re
-from datetime import date
+from datetime import date, timedelta
+from typing import Iterable
+
+# Hive-style date partition, e.g. 'year=2025/month=06/day=01'
+PARTITION_DATE_PATTERN = re.compile(r"year=(\d{4})/month=(\d{2})/day=(\d{2})")
 
 def extract_actual_date(filename: str) -> date | None:
     """
@@ -9,8 +13,7 @@ def extract_actual_date(filename: str) -> date | None:
     if "$folder$" in filename:
         return None
 
-    pattern = r"year=(\d{4})/month=(\d{2})/day=(\d{2})"
-    match = re.search(pattern, filename)
+    match = PARTITION_DATE_PATTERN.search(filename)
 
     if match:
         try:
@@ -25,3 +28,121 @@ def extract_actual_date(filename: str) -> date | None:
         if not filename.endswith("/"): 
             print(f"[!] No date found in path: {filename}")
         return None
+
+class PartitionDateParser:
+    """
+    Parses partition dates from object names, caching the result per partition directory.
+
+    All files of a day partition share a directory, so the pattern only runs once per
+    directory. Nothing is printed per file; unparseable names are counted in `summary`.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self.summary = {"parsed": 0, "no_date": 0, "invalid_date": 0}
+
+    def parse(self, filename: str) -> date | None:
+        """
+        Parse the date of a file name. Virtual folder markers must be filtered out by the caller.
+
+        Args:
+            filename (str): The object name.
+
+        Returns:
+            date: The partition date, or None if it cannot be extracted.
+        """
+        directory = filename[:filename.rfind("/") + 1]
+        try:
+            actual_date, outcome = self._cache[directory]
+        except KeyError:
+            actual_date, outcome = self._parse_path(directory)
+            self._cache[directory] = (actual_date, outcome)
+
+        if outcome != "parsed" and filename != directory:
+            # The partition may end in the file name itself (e.g. '.../month=01/day=02')
+            actual_date, outcome = self._parse_path(filename)
+
+        if outcome == "parsed" or filename != directory:
+            self.summary[outcome] += 1
+        return actual_date
+
+    def _parse_path(self, path: str) -> tuple[date | None, str]:
+        match = PARTITION_DATE_PATTERN.search(path)
+        if not match:
+            return None, "no_date"
+
+        try:
+            year, month, day = map(int, match.groups())
+            return date(year, month, day), "parsed"
+        except ValueError:
+            return None, "invalid_date"
+
+    def print_summary(self, source: str):
+        """
+        Print one line summarizing the names whose date could not be extracted, if any.
+        """
+        if self.summary["no_date"] or self.summary["invalid_date"]:
+            print(f"[WARN] {source}: no date found in {self.summary['no_date']} paths, "
+                  f"invalid date in {self.summary['invalid_date']} paths ({self.summary['parsed']} parsed)")
+
+def parse_partition_dates(filenames: Iterable[str]) -> tuple[list[int | None], dict]:
+    """
+    Parses the partition dates of many object names at once.
+
+    Args:
+        filenames (iterable): Object names.
+
+    Returns:
+        tuple: The date ordinal of each name (None when it cannot be extracted, including
+               '$folder$' markers and folder placeholders), and a summary dictionary counting
+               parsed, no_date and invalid_date names.
+    """
+    parser = PartitionDateParser()
+    parse = parser.parse
+
+    ordinals = []
+    for filename in filenames:
+        if "$folder$" in filename:
+            ordinals.append(None)
+            continue
+
+        actual_date = parse(filename)
+        ordinals.append(actual_date.toordinal() if actual_date else None)
+
+    return ordinals, parser.summary
+
+def build_partition_prefixes(prefix: str, start_date: date, end_date: date) -> list[str]:
+    """
+    Builds the 'year=YYYY/month=MM/day=DD/' partition prefixes under a feed prefix for a date range.
+
+    Args:
+        prefix (str): The feed prefix (with or without a trailing slash).
+        start_date (date): First day of the range (inclusive).
+        end_date (date): Last day of the range (inclusive).
+
+    Returns:
+        list: One prefix per day, in ascending (and therefore lexicographic) order.
+    """
+    prefixes = []
+    day = start_date
+    while day <= end_date:
+        prefixes.append(build_partition_prefix(prefix, day))
+        day += timedelta(days=1)
+
+    return prefixes
+
+def build_partition_prefix(prefix: str, day: date) -> str:
+    """
+    Builds the 'year=YYYY/month=MM/day=DD/' partition prefix under a feed prefix for a single day.
+    """
+    base = prefix.rstrip("/") + "/" if prefix else ""
+    return f"{base}year={day.year:04d}/month={day.month:02d}/day={day.day:02d}/"
+
+def baseline_window(expected_date: date) -> tuple[date, date]:
+    """
+    Returns the historical baseline window (start_date, end_date) used to evaluate an expected date.
+    The window ends the day before the expected date and spans the previous month.
+    """
+    end_date = expected_date - timedelta(days=1)
+    start_date = end_date - timedelta(days=31)
+    return start_date, end_date
@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+from aggregator import aggregate_daily_metrics, get_daily_totals
+from size_sketch import SizeSketch
+
+def make_file(size, actual_date):
+    return {"size": size, "actual_date": actual_date}
+
+def test_aggregate_daily_metrics():
+    day = date(2025, 1, 1)
+    files = (make_file(size, day) for size in [300, 100, 200])
+    files = list(files) + [make_file(50, day + timedelta(days=1)), make_file(999, None)]
+
+    # Accepts any iterator and consumes it once
+    daily_metrics = aggregate_daily_metrics(iter(files))
+
+    assert set(daily_metrics) == {day, day + timedelta(days=1)}
+    assert daily_metrics[day] == {"file_count": 3, "total_bytes": 600, "min_size": 100, "max_size": 300,
+                                  "size_sketch": SizeSketch.from_sizes([100, 200, 300])}
+
+def test_get_daily_totals():
+    day = date(2025, 1, 1)
+    daily_metrics = aggregate_daily_metrics([make_file(1_500_000, day), make_file(500_000, day)])
+    assert get_daily_totals(daily_metrics, day) == (2, 2.0)
+    assert get_daily_totals(daily_metrics, day + timedelta(days=1)) == (0, 0.0)
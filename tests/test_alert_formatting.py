@@ -41,4 +41,12 @@ def test_slack_message_format(monkeypatch):
     send_alert_to_team(slack_webhook_url, full_message)
     print(full_message)
 
-    print("Test alert for Web Impressions sent successfully.")
\ No newline at end of file
+    print("Test alert for Web Impressions sent successfully.")
+# A file replaced by another shows up as added and removed, not as an unchanged count
+def test_delivery_changes_format():
+    from alert_team import format_delivery_changes
+    changes = {"partitions": [{"date": "2025-03-01", "file_count": [2, 2], "total_bytes": [30_000_000, 40_000_000],
+                               "added": 1, "removed": 1, "rewritten": 1}]}
+    message = format_delivery_changes("web", changes)
+    assert "Files added: 1, removed: 1, rewritten: 1" in message
+    assert "2025-03-01: +1 / -1 / ~1 files (2 → 2), 30.00 → 40.00 MB" in message
@@ -1,4 +1,5 @@
 from datetime import date, timedelta
+import pytest
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
@@ -82,4 +83,86 @@ def test_analyze_feed_warning_both(monkeypatch):
     assert result["status"] == "WARNING ❗️"
     assert len(result["issues"]) == 2
     assert any("File count deviates" in issue for issue in result["issues"])
-    assert any("Size deviates" in issue for issue in result["issues"])
\ No newline at end of file
+    assert any("Size deviates" in issue for issue in result["issues"])
+
+# Precomputed baseline - no BigQuery query
+def test_analyze_feed_precomputed_baseline(monkeypatch):
+    today = date.today()
+    file_metadata = [make_file(100, today) for _ in range(5)]
+    def fail(*a, **kw):
+        raise AssertionError("baseline should not be queried")
+    monkeypatch.setattr("analyzer.query_historical_baseline", fail)
+    result = analyze_feed("TestFeed", file_metadata, today, baseline=(10, 500))
+    assert result["status"] == "WARNING ❗️"
+    assert result["monthly_avg_count"] == 10
+    assert any("File count deviates" in issue for issue in result["issues"])
+
+# Vectorized history scoring matches analyze_feed on every feed and date
+def test_analyze_history_matches_analyze_feed():
+    import random
+    import pandas as pd
+    from analyzer import analyze_history
+    from utils import baseline_window
+
+    random.seed(7)
+    start = date(2025, 1, 1)
+    rows = []
+    for feed in ["Web", "Media"]:
+        for i in range(90):
+            day = start + timedelta(days=i)
+            if random.random() < 0.1:
+                continue  # Missing day
+            count = random.choice([0, 8, 10, 10, 10, 12, 15])
+            rows.append({"date": day, "datafeed": feed, "filecount": count,
+                         "filesize": count * random.choice([9.0, 10.0, 10.0, 14.0])})
+    frame = pd.DataFrame(rows)
+
+    score_start, score_end = start + timedelta(days=40), start + timedelta(days=89)
+    scored = analyze_history(frame, score_start, score_end)
+    assert len(scored) == 2 * 50
+
+    for row in scored.itertuples(index=False):
+        window_start, window_end = baseline_window(row.date)
+        history = [r for r in rows if r["datafeed"] == row.datafeed and window_start <= r["date"] <= window_end]
+        baseline = (sum(r["filecount"] for r in history) / len(history), sum(r["filesize"] for r in history) / len(history))
+        today = [r for r in rows if r["datafeed"] == row.datafeed and r["date"] == row.date]
+        daily_metrics = {row.date: {"file_count": today[0]["filecount"], "total_bytes": today[0]["filesize"] * 1_000_000,
+                                    "min_size": 0, "max_size": 0}} if today else {}
+        expected = analyze_feed(row.datafeed, daily_metrics, row.date, baseline=baseline)
+        assert row.status == expected["status"]
+        assert row.file_count == expected["file_count"]
+        assert row.monthly_avg_count == pytest.approx(expected["monthly_avg_count"])
+        assert row.issues == expected["issues"]
+
+# Replaying history gives the live verdicts of the day rules too (row counts, size distribution)
+def test_analyze_history_replays_day_rules():
+    import pandas as pd
+    from analyzer import analyze_history, DAY_RULES_LOOKBACK_DAYS
+    from size_sketch import SizeSketch
+
+    start = date(2025, 1, 1)
+    rows = []
+    for i in range(60):
+        day = start + timedelta(days=i)
+        sizes = [1_000_000] * 10 if i != 50 else [100_000] * 9 + [9_100_000]  # same total, other shape
+        row_count = 5000 if i != 55 else 1000
+        rows.append({"date": day, "datafeed": "Web", "filecount": 10, "filesize": sum(sizes) / 1_000_000,
+                     "rowcount": row_count if i != 45 else None, "sizesketch": SizeSketch.from_sizes(sizes).serialize()})
+    frame = pd.DataFrame(rows)
+
+    scored = analyze_history(frame, start + timedelta(days=40), start + timedelta(days=59))
+    by_date = {r["date"]: r for r in rows}
+    for row in scored.itertuples(index=False):
+        daily_metrics = {}
+        for n in range(DAY_RULES_LOOKBACK_DAYS, -1, -1):
+            stored = by_date[row.date - timedelta(days=n)]
+            daily_metrics[stored["date"]] = {
+                "file_count": stored["filecount"], "total_bytes": stored["filesize"] * 1_000_000,
+                "row_count": stored["rowcount"], "size_sketch": SizeSketch.deserialize(stored["sizesketch"]),
+            }
+        expected = analyze_feed("Web", daily_metrics, row.date, baseline=(row.monthly_avg_count, row.monthly_avg_size_mb))
+        assert (row.status, row.issues, row.row_count) == (expected["status"], expected["issues"], expected["row_count"])
+
+    flagged = scored.set_index("date")["issues"]
+    assert any("Median file size" in issue for issue in flagged[start + timedelta(days=50)])
+    assert any("Row count deviates" in issue for issue in flagged[start + timedelta(days=55)])
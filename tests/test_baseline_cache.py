@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+import random
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+from baseline_cache import BaselineCache
+from utils import baseline_window
+
+def brute_force_average(table, start_date, end_date):
+    values = [v for d, v in table.items() if start_date <= d <= end_date]
+    if not values:
+        return 0.0, 0.0
+    return sum(v[0] for v in values) / len(values), sum(v[1] for v in values) / len(values)
+
+# Daily runs with incremental window moves and write-through match a full AVG over the table
+def test_incremental_baseline_matches_full_average(tmp_path):
+    rng = random.Random(7)
+    first_run = date(2025, 3, 1)
+    # Table rows with a few missing days, as left by partial history
+    table = {first_run - timedelta(days=i): (rng.randint(0, 20), rng.uniform(0, 500))
+             for i in range(7, 60) if i % 11}
+
+    path = str(tmp_path / "baseline_cache_web.json.gz")
+    start, end = baseline_window(first_run - timedelta(days=6))
+    cache = BaselineCache(path, "Web")
+    cache.seed([{"date": d, "datafeed": "Web", "filecount": v[0], "filesize": v[1]} for d, v in table.items()
+                if start <= d <= end], start, end, first_run)
+    cache.save()
+
+    for i in range(20):
+        today = first_run + timedelta(days=i)
+        rows = [{"feed_label": "Web", "event_date": today - timedelta(days=13 - j),
+                 "file_count": rng.randint(0, 20), "file_size": rng.uniform(0, 500)} for j in range(8)]
+        table.update({row["event_date"]: (row["file_count"], row["file_size"]) for row in rows})
+
+        cache = BaselineCache.load(path, "Web")
+        cache.apply_rows(rows)
+        start, end = baseline_window(today - timedelta(days=6))
+        cache.evict(start)
+        baseline = cache.baseline(start, end)
+        cache.save()
+
+        expected = brute_force_average(table, start, end)
+        assert baseline[0] == pytest.approx(expected[0])
+        assert baseline[1] == pytest.approx(expected[1])
+
+# A window the cache does not cover, or rows leaving a gap, are not served
+def test_uncovered_window_and_gap():
+    cache = BaselineCache("unused", "Web")
+    assert cache.baseline(date(2025, 1, 1), date(2025, 1, 31)) is None
+
+    cache.seed([], date(2025, 1, 1), date(2025, 1, 31), date(2025, 2, 7))
+    assert cache.baseline(date(2025, 1, 1), date(2025, 1, 31)) == (0.0, 0.0)
+    assert cache.baseline(date(2025, 1, 2), date(2025, 2, 1)) is None
+
+    cache.apply_rows([{"feed_label": "Web", "event_date": date(2025, 2, 10), "file_count": 1, "file_size": 1.0}])
+    assert cache.covered is None
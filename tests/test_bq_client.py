@@ -0,0 +1,159 @@
+from datetime import date, timedelta
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+import bq_client
+import clients
+from bq_client import upsert_feed_metrics_bulk, query_historical_baselines, load_feed_metrics
+
+class FakeJob:
+    def __init__(self, rows=None):
+        self.rows = rows or []
+
+    def result(self):
+        return iter(self.rows)
+
+class FakeBigQueryClient:
+    def __init__(self, rows=None):
+        self.queries = []
+        self.rows = rows
+
+    def query(self, query, job_config=None):
+        self.queries.append((query, job_config))
+        return FakeJob(self.rows)
+
+    def create_table(self, table):
+        self.created = table
+
+    def load_table_from_json(self, rows, destination, job_config=None):
+        self.loaded = (rows, destination)
+        return FakeJob()
+
+    def delete_table(self, table, not_found_ok=False):
+        self.deleted = table
+
+def make_row(feed_label, event_date, file_count=10, file_size=100.0):
+    return {"feed_label": feed_label, "event_date": event_date, "file_count": file_count, "file_size": file_size}
+
+# All feeds and days go through one MERGE job and one table check
+def test_upsert_feed_metrics_bulk_single_job(monkeypatch):
+    fake = FakeBigQueryClient()
+    checks = []
+    monkeypatch.setattr(clients, "_bigquery_client", fake)
+    monkeypatch.setattr(bq_client, "_verified_table_ref", None)
+    monkeypatch.setattr(bq_client, "ensure_dataset_and_table_exist", lambda: checks.append(1) or "p.d.t")
+
+    start = date(2025, 1, 1)
+    rows = [make_row(feed, start + timedelta(days=i)) for feed in ["Web", "Media", "Geo"] for i in range(8)]
+    upsert_feed_metrics_bulk(rows)
+    upsert_feed_metrics_bulk(rows)
+
+    assert len(fake.queries) == 2
+    assert len(checks) == 1
+    query, job_config = fake.queries[0]
+    assert "UNNEST(@rows)" in query
+    assert len(job_config.query_parameters[0].values) == 24
+
+# Duplicate feed/date rows are collapsed, last one wins
+def test_upsert_feed_metrics_bulk_dedupes(monkeypatch):
+    fake = FakeBigQueryClient()
+    monkeypatch.setattr(clients, "_bigquery_client", fake)
+    monkeypatch.setattr(bq_client, "_verified_table_ref", "p.d.t")
+
+    day = date(2025, 1, 1)
+    upsert_feed_metrics_bulk([make_row("Web", day, 1), make_row("Web", day, 2)])
+
+    values = fake.queries[0][1].query_parameters[0].values
+    assert len(values) == 1
+    assert values[0].struct_values["filecount"] == 2
+
+# A failed MERGE or a missing table is reported to the caller instead of only logged
+def test_upsert_feed_metrics_bulk_reports_failure(monkeypatch):
+    class FailingClient(FakeBigQueryClient):
+        def query(self, query, job_config=None):
+            raise RuntimeError("quota exceeded")
+
+    monkeypatch.setattr(clients, "_bigquery_client", FailingClient())
+    monkeypatch.setattr(bq_client, "_verified_table_ref", "p.d.t")
+    assert upsert_feed_metrics_bulk([make_row("Web", date(2025, 1, 1))]) is False
+
+    monkeypatch.setattr(bq_client, "_verified_table_ref", None)
+    monkeypatch.setattr(bq_client, "ensure_dataset_and_table_exist", lambda: None)
+    assert upsert_feed_metrics_bulk([make_row("Web", date(2025, 1, 1))]) is False
+    assert upsert_feed_metrics_bulk([]) is True
+
+# Baselines for every feed come back from one grouped query
+def test_query_historical_baselines_single_query(monkeypatch):
+    expected_date = date(2025, 2, 1)
+    fake = FakeBigQueryClient(rows=[
+        {"datafeed": "Web", "expected_date": expected_date, "avg_count": 10.0, "avg_size": 100.0},
+        {"datafeed": "Media", "expected_date": expected_date, "avg_count": 4.0, "avg_size": 40.0},
+    ])
+    monkeypatch.setattr(clients, "_bigquery_client", fake)
+
+    baselines = query_historical_baselines([(feed, expected_date) for feed in ["Web", "Media", "Geo"]])
+
+    assert len(fake.queries) == 1
+    assert "GROUP BY" in fake.queries[0][0]
+    struct = fake.queries[0][1].query_parameters[0].values[0].struct_values
+    assert str(struct["start_date"]) == "2024-12-31"
+    assert str(struct["end_date"]) == "2025-01-31"
+    assert baselines[("Web", expected_date)] == (10.0, 100.0)
+    assert baselines[("Media", expected_date)] == (4.0, 40.0)
+    assert baselines[("Geo", expected_date)] == (0.0, 0.0)
+
+# Backfill rows go through one load job and one MERGE, and the staging table is dropped
+def test_load_feed_metrics(monkeypatch):
+    fake = FakeBigQueryClient()
+    monkeypatch.setattr(clients, "_bigquery_client", fake)
+    monkeypatch.setattr(bq_client, "_verified_table_ref", "p.d.t")
+
+    start = date(2024, 1, 1)
+    rows = [make_row(feed, start + timedelta(days=i)) for feed in ["Web", "Geo"] for i in range(366)]
+    assert load_feed_metrics(rows)
+
+    loaded_rows, staging_ref = fake.loaded
+    assert len(loaded_rows) == 732
+    assert loaded_rows[0] == {"date": "2024-01-01", "datafeed": "Web", "filesize": 100.0, "filecount": 10,
+                              "rowcount": None, "sizesketch": None}
+    assert len(fake.queries) == 1
+    assert f"`{staging_ref}`" in fake.queries[0][0]
+    assert fake.deleted == staging_ref
+    assert fake.created.expires is not None
+
+# The MERGE and the batched baselines only read the partitions of the days they touch
+def test_queries_carry_partition_filters(monkeypatch):
+    fake = FakeBigQueryClient()
+    monkeypatch.setattr(clients, "_bigquery_client", fake)
+    monkeypatch.setattr(bq_client, "_verified_table_ref", "p.d.t")
+
+    start = date(2025, 1, 1)
+    upsert_feed_metrics_bulk([make_row("Web", start + timedelta(days=i)) for i in range(8)])
+    query, job_config = fake.queries[0]
+    params = {p.name: p.value for p in job_config.query_parameters[1:]}
+    assert "T.date BETWEEN @merge_start AND @merge_end" in query
+    assert (str(params["merge_start"]), str(params["merge_end"])) == ("2025-01-01", "2025-01-08")
+
+    query_historical_baselines([("Web", date(2025, 2, 1)), ("Geo", date(2025, 2, 3))])
+    query, job_config = fake.queries[1]
+    params = {p.name: p.value for p in job_config.query_parameters[1:]}
+    assert "t.date BETWEEN @window_start AND @window_end" in query
+    assert (str(params["window_start"]), str(params["window_end"])) == ("2024-12-31", "2025-02-02")
+
+# A missing table is created partitioned on date and clustered by datafeed
+def test_create_partitioned_table(monkeypatch):
+    from google.api_core.exceptions import NotFound
+
+    class MissingTableClient(FakeBigQueryClient):
+        def get_dataset(self, dataset_ref):
+            return dataset_ref
+
+        def get_table(self, table_ref):
+            raise NotFound("table")
+
+    fake = MissingTableClient()
+    monkeypatch.setattr(clients, "_bigquery_client", fake)
+    assert bq_client.ensure_dataset_and_table_exist() is not None
+    assert fake.created.time_partitioning.field == "date"
+    assert fake.created.clustering_fields == ["datafeed"]
@@ -0,0 +1,53 @@
+from datetime import date, datetime, timezone
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+import pytest
+from aggregator import aggregate_daily_metrics
+from catalog import ObjectCatalog
+from utils import extract_actual_date
+
+def make_files():
+    files = []
+    for day in (1, 2, 3):
+        for i in range(4):
+            name = f"web/year=2025/month=03/day={day:02d}/part-{i}-é.parquet"
+            files.append({"name": name, "size": day * 1000 + i, "actual_date": extract_actual_date(name),
+                          "updated": datetime(2025, 3, day, 6, tzinfo=timezone.utc), "generation": 10 * day + i})
+    files.append({"name": "web/_SUCCESS", "size": 0, "actual_date": None, "updated": None, "generation": 1})
+    return files
+
+# Same per-date totals as the dictionary aggregation, with interned directories
+def test_group_by_date_matches_aggregator():
+    files = make_files()
+    catalog = ObjectCatalog.from_metadata(files)
+
+    assert len(catalog) == 13
+    assert len(catalog.directories) == 4
+    assert catalog.names() == [file["name"] for file in files]
+    assert catalog.group_by_date() == aggregate_daily_metrics(files)
+    assert aggregate_daily_metrics(catalog) == aggregate_daily_metrics(files)
+
+def test_filter():
+    catalog = ObjectCatalog.from_metadata(make_files())
+
+    day = catalog.filter(start_date=date(2025, 3, 2), end_date=date(2025, 3, 2))
+    assert day.names() == [f"web/year=2025/month=03/day=02/part-{i}-é.parquet" for i in range(4)]
+    assert list(day.generations) == [20, 21, 22, 23]
+
+    small = catalog.filter(max_size=1001)
+    assert small.names() == ["web/year=2025/month=03/day=01/part-0-é.parquet",
+                             "web/year=2025/month=03/day=01/part-1-é.parquet", "web/_SUCCESS"]
+
+def test_parquet_snapshot_round_trip(tmp_path):
+    pytest.importorskip("pyarrow")
+    catalog = ObjectCatalog.from_metadata(make_files())
+    path = str(tmp_path / "catalog.parquet")
+    catalog.save_parquet(path)
+
+    restored = ObjectCatalog.load_parquet(path)
+    assert restored.names() == catalog.names()
+    for column in ("sizes", "date_ordinals", "updated", "generations"):
+        assert list(restored.column(column)) == list(catalog.column(column))
+    assert restored.group_by_date() == catalog.group_by_date()
@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+from aggregator import aggregate_daily_metrics
+from checksum_index import ChecksumIndex, ChecksumCollector, content_digest
+
+def make_file(name, day, md5, size=100):
+    return {"name": name, "size": size, "actual_date": day, "checksum": content_digest(md5, None, size)}
+
+# Re-uploads of earlier content and repeats within a day are duplicates, first copies are not
+def test_duplicates_across_and_within_days(tmp_path):
+    day1 = date(2025, 1, 1)
+    day2 = day1 + timedelta(days=1)
+    listing = [
+        make_file("d1/a", day1, "A"), make_file("d1/b", day1, "B"),
+        make_file("d2/c", day2, "C"), make_file("d2/a-copy", day2, "A"), make_file("d2/c-copy", day2, "C"),
+    ]
+    collector = ChecksumCollector()
+    daily_metrics = aggregate_daily_metrics(collector.wrap(listing, [day1, day2, day2 + timedelta(days=1)]))
+    index = ChecksumIndex(str(tmp_path / "index.json.gz"))
+    collector.store(index)
+
+    assert daily_metrics[day2]["file_count"] == 3
+    assert index.duplicates(day1) == (0, 0)
+    assert index.duplicates(day2) == (2, 200)
+    assert index.duplicates(day2 + timedelta(days=1)) == (0, 0)
+    assert index.duplicates(day2 + timedelta(days=2)) is None
+
+    index.save()
+    loaded = ChecksumIndex.load(index.path)
+    assert loaded.duplicates(day2) == (2, 200)
+
+    # Once the original day is evicted, only the repeat within the day is left
+    loaded.evict(day2)
+    assert loaded.duplicates(day2) == (1, 100)
+
+# The same checksum with a different size is different content
+def test_content_digest():
+    assert content_digest("A", None, 1) == content_digest("A", None, 1)
+    assert content_digest("A", None, 1) != content_digest("A", None, 2)
+    assert content_digest(None, "crc", 1) != content_digest("A", "crc", 1)
+    assert content_digest(None, None, 1) is None
+
+# With EXCLUDE_DUPLICATE_FILES the upserted totals only count distinct content
+def test_flag_duplicates_excludes(monkeypatch, tmp_path):
+    import main
+    monkeypatch.setattr(main, "EXCLUDE_DUPLICATE_FILES", True)
+    day = date(2025, 1, 2)
+    collector = ChecksumCollector()
+    listing = [make_file("a", day - timedelta(days=1), "A"), make_file("b", day, "B"), make_file("a2", day, "A")]
+    daily_metrics = aggregate_daily_metrics(collector.wrap(listing, [day - timedelta(days=1), day]))
+    index = ChecksumIndex(str(tmp_path / "index.json.gz"))
+
+    main.flag_duplicates({"label": "Test"}, index, collector, daily_metrics, day, day)
+
+    assert daily_metrics[day]["file_count"] == 1
+    assert daily_metrics[day]["total_bytes"] == 100
+    assert daily_metrics[day]["duplicate_count"] == 1
+    assert os.path.exists(index.path)
+
+# A full-prefix listing only buffers the indexed days, and empty or header-only files are never duplicates
+def test_collector_bounds_days_and_sizes():
+    since, until = date(2025, 1, 10), date(2025, 1, 12)
+    listing = [
+        make_file("old", since - timedelta(days=1), "A"), make_file("new", until + timedelta(days=1), "A"),
+        make_file("a", since, "A"), make_file("empty", since, "E", size=0),
+        make_file("header", until, "H", size=10), make_file("header-copy", until, "H", size=10),
+    ]
+    collector = ChecksumCollector(since, until, min_size=20)
+    daily_metrics = aggregate_daily_metrics(collector.wrap(listing, [since - timedelta(days=1), since, until]))
+
+    assert set(collector.digests) == {since}
+    assert collector.listed_days == {since, until}
+    assert len(collector.digests[since]) == 1
+    assert daily_metrics[until]["file_count"] == 2
+
+    index = ChecksumIndex("unused")
+    collector.store(index)
+    assert index.duplicates(until) == (0, 0)
@@ -0,0 +1,101 @@
+from datetime import date, datetime, timedelta, timezone
+import json
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+import gcs_client
+import main
+from feed_events import FileEventSource, FeedEventCounters, consume_events, counters_path, match_feed
+
+FEEDS = {"web": {"label": "Web", "bucket": "web-bucket", "prefix": "web/"}}
+
+def notification(event_type, name, generation, size=0):
+    return {
+        "attributes": {"eventType": event_type, "bucketId": "web-bucket", "objectId": name,
+                       "objectGeneration": str(generation)},
+        "data": {"name": name, "bucket": "web-bucket", "size": str(size), "generation": str(generation)},
+    }
+
+def write_events(path, messages):
+    with open(path, "a") as f:
+        for message in messages:
+            f.write(json.dumps(message) + "\n")
+
+# Redelivered, overwritten and out-of-order notifications are counted once
+def test_consume_events_from_file(tmp_path):
+    events = str(tmp_path / "events.ndjson")
+    a = "web/year=2025/month=03/day=01/a.parquet"
+    b = "web/year=2025/month=03/day=01/b.parquet"
+    c = "web/year=2025/month=03/day=01/c.parquet"
+    write_events(events, [
+        notification("OBJECT_FINALIZE", a, 1, 100),
+        notification("OBJECT_FINALIZE", a, 1, 100),         # redelivery
+        notification("OBJECT_FINALIZE", b, 1, 50),
+        notification("OBJECT_FINALIZE", b, 2, 70),          # overwrite
+        notification("OBJECT_DELETE", b, 1),                # delete of the overwritten generation
+        notification("OBJECT_DELETE", c, 5),                # delete before its finalize
+        notification("OBJECT_FINALIZE", c, 5, 999),
+        notification("OBJECT_FINALIZE", "other/year=2025/month=03/day=01/x", 1, 1),
+        {"attributes": {"eventType": "OBJECT_METADATA_UPDATE", "bucketId": "web-bucket", "objectId": a}},
+    ])
+
+    source = FileEventSource(events)
+    consume_events(source, str(tmp_path), FEEDS, max_messages=4)
+    assert source.pull(10) == []
+
+    counters = FeedEventCounters.load(counters_path(str(tmp_path), "web"), "web")
+    entry = counters.partitions["2025-03-01"]
+    assert (entry["file_count"], entry["total_bytes"], entry["min_size"], entry["max_size"]) == (2, 170, 70, 100)
+
+    write_events(events, [notification("OBJECT_DELETE", a, 1)])
+    consume_events(source, str(tmp_path), FEEDS)
+    entry = FeedEventCounters.load(counters_path(str(tmp_path), "web"), "web").partitions["2025-03-01"]
+    assert (entry["file_count"], entry["total_bytes"], entry["min_size"], entry["max_size"]) == (1, 70, 70, 70)
+
+# The nightly run reads current, complete counters instead of listing
+def test_collect_feed_metrics_from_event_counters(tmp_path, monkeypatch):
+    today = date.today()
+    _, upsert_start, upsert_end = main.run_window(today)
+    seeded = []
+    def fake_partitions(bucket, prefix, days, reduce):
+        seeded.extend(days)
+        for day in days:
+            yield day, reduce(day, iter([{"name": f"web/{day:year=%Y/month=%m/day=%d}/seed.parquet", "size": 10, "generation": 1}]))
+
+    monkeypatch.setattr(gcs_client, "iter_partition_metadata", fake_partitions)
+    events = str(tmp_path / "events.ndjson")
+    write_events(events, [notification("OBJECT_FINALIZE", f"web/{upsert_end:year=%Y/month=%m/day=%d}/late.parquet", 1, 30)])
+    consume_events(FileEventSource(events), str(tmp_path), FEEDS, seed_start=upsert_start)
+    assert seeded[0] == upsert_start
+
+    monkeypatch.setattr(main, "FEEDS", FEEDS)
+    monkeypatch.setattr(main, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "EVENT_TRACKING_ENABLED", True)
+    monkeypatch.setattr(main, "iter_gcs_metadata", lambda *args, **kwargs: (_ for _ in ()).throw(AssertionError("listed")))
+    monkeypatch.setattr(main, "iter_partition_metadata", lambda *args, **kwargs: (_ for _ in ()).throw(AssertionError("listed")))
+    monkeypatch.setattr(main, "load_manifest", lambda key: (_ for _ in ()).throw(AssertionError("listed")))
+
+    daily_metrics, _ = main.collect_feed_metrics("web", FEEDS["web"], upsert_start, upsert_end)
+    assert daily_metrics[upsert_end]["file_count"] == 2
+    assert daily_metrics[upsert_end]["total_bytes"] == 40
+
+    # A consumer that stopped pulling falls back to listing
+    counters = FeedEventCounters.load(counters_path(str(tmp_path), "web"), "web")
+    counters.pulled_at = datetime.now(timezone.utc) - timedelta(hours=5)
+    counters.save()
+    assert main.load_event_metrics("web", upsert_start, upsert_end) is None
+
+# Prefixes match whole path segments, and objects without a partition date are summarized, not printed one by one
+def test_match_feed_and_undated_objects(tmp_path, capsys):
+    feeds = {"usa": {"label": "USA", "bucket": "web-bucket", "prefix": "loc/region=USA"}}
+    assert match_feed("web-bucket", "loc/region=USA/year=2025/month=03/day=01/a.parquet", feeds) == "usa"
+    assert match_feed("web-bucket", "loc/region=USA_x/year=2025/month=03/day=01/a.parquet", feeds) is None
+
+    events = str(tmp_path / "events.ndjson")
+    write_events(events, [notification("OBJECT_FINALIZE", f"loc/region=USA/_SUCCESS{i}", i) for i in range(1, 4)])
+    assert consume_events(FileEventSource(events), str(tmp_path / "state"), feeds) == 0
+
+    output = capsys.readouterr().out
+    assert "[!]" not in output
+    assert "no date found in 3 paths" in output
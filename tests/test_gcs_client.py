@@ -0,0 +1,100 @@
+from datetime import date, datetime
+import random
+import threading
+import time
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+import clients
+import gcs_client
+from gcs_client import list_gcs_metadata, iter_range_metadata
+from utils import build_partition_prefixes
+
+class FakeBlob:
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.updated = datetime(2025, 1, 1)
+        self.generation = 1
+        self.md5_hash = None
+        self.crc32c = "AAAAAA=="
+
+class FakeStorageClient:
+    def __init__(self, names):
+        self.names = sorted(names)
+        self.prefixes = []
+        self.fields = []
+        self.delay = 0.0
+        self._lock = threading.Lock()
+
+    def list_blobs(self, bucket_name, prefix=None, fields=None, start_offset=None, end_offset=None, **kwargs):
+        with self._lock:
+            self.prefixes.append(prefix)
+            self.fields.append(fields)
+        if self.delay:
+            time.sleep(random.uniform(0, self.delay))
+        return [FakeBlob(n, 10) for n in self.names if n.startswith(prefix or "")
+                and (start_offset is None or n >= start_offset) and (end_offset is None or n < end_offset)]
+
+def test_build_partition_prefixes():
+    prefixes = build_partition_prefixes("feed", date(2025, 2, 27), date(2025, 3, 1))
+    assert prefixes == [
+        "feed/year=2025/month=02/day=27/",
+        "feed/year=2025/month=02/day=28/",
+        "feed/year=2025/month=03/day=01/",
+    ]
+    assert build_partition_prefixes("feed/", date(2025, 1, 1), date(2025, 1, 1)) == ["feed/year=2025/month=01/day=01/"]
+
+# Window mode lists only the partitions inside the date range
+def test_list_gcs_metadata_window(monkeypatch):
+    fake = FakeStorageClient([
+        "feed/year=2024/month=12/day=31/a.parquet",
+        "feed/year=2025/month=01/day=01/a.parquet",
+        "feed/year=2025/month=01/day=02/a.parquet",
+        "feed/year=2025/month=01/day=02/b.parquet",
+    ])
+    monkeypatch.setattr(clients, "_storage_client", fake)
+    metadata = list_gcs_metadata("bucket", "feed/", start_date=date(2025, 1, 1), end_date=date(2025, 1, 2))
+    assert [f["name"] for f in metadata] == fake.names[1:]
+    assert sorted(fake.prefixes) == ["feed/year=2025/month=01/day=01/", "feed/year=2025/month=01/day=02/"]
+    assert set(fake.fields) == {gcs_client.LISTING_FIELDS}
+
+# Concurrent partition listings keep the same order as one sequential listing
+def test_list_gcs_metadata_concurrent_order(monkeypatch):
+    names = [f"feed/year=2025/month=01/day={d:02d}/part-{i}.parquet" for d in range(1, 29) for i in range(3)]
+    fake = FakeStorageClient(names)
+    fake.delay = 0.01
+    monkeypatch.setattr(clients, "_storage_client", fake)
+    metadata = list_gcs_metadata("bucket", "feed", start_date=date(2025, 1, 1), end_date=date(2025, 1, 28))
+    assert [f["name"] for f in metadata] == sorted(names)
+    assert [f["actual_date"] for f in metadata] == sorted(f["actual_date"] for f in metadata)
+
+# Feeds with a different layout fall back to a full-prefix listing
+def test_list_gcs_metadata_fallback(monkeypatch):
+    fake = FakeStorageClient(["feed/2025-01-01/a.parquet"])
+    monkeypatch.setattr(clients, "_storage_client", fake)
+    metadata = list_gcs_metadata("bucket", "feed/", start_date=date(2025, 1, 1), end_date=date(2025, 1, 2))
+    assert [f["name"] for f in metadata] == ["feed/2025-01-01/a.parquet"]
+    assert fake.prefixes[-1] == "feed/"
+
+# A backfill range is one listing of the feed prefix, bounded by its first and last partitions
+def test_iter_range_metadata_single_listing(monkeypatch):
+    names = [f"feed/year={y}/month={m:02d}/day={d:02d}/a.parquet" for y, m, d in
+             [(2024, 12, 31), (2025, 1, 1), (2025, 1, 31), (2025, 2, 1), (2025, 2, 2)]]
+    fake = FakeStorageClient(names)
+    monkeypatch.setattr(clients, "_storage_client", fake)
+    metadata = list(iter_range_metadata("bucket", "feed", date(2025, 1, 1), date(2025, 2, 1)))
+    assert [f["name"] for f in metadata] == names[1:4]
+    assert fake.prefixes == ["feed"]
+
+# Only max_workers listings are submitted ahead of the consumer, each reduced as it streams
+def test_list_partitions_bounded_and_reduced():
+    prefixes = build_partition_prefixes("feed", date(2025, 1, 1), date(2025, 1, 20))
+    fake = FakeStorageClient([f"{p}part-{i}.parquet" for p in prefixes for i in range(3)])
+    results = gcs_client.list_partitions_concurrently(fake, "bucket", prefixes, max_workers=2,
+                                                      reduce=lambda prefix, files: (prefix, sum(f["size"] for f in files)))
+    assert next(results) == (prefixes[0], 30)
+    assert len(fake.prefixes) <= 3
+    assert list(results) == [(p, 30) for p in prefixes[1:]]
+    assert sorted(fake.prefixes) == prefixes
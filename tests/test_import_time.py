@@ -0,0 +1,40 @@
+import json
+import subprocess
+import sys
+import os
+import pytest
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src'))
+DAG_DIR = os.path.dirname(SRC_DIR)
+
+# Stacks that must not be loaded while Airflow parses the DAG files
+HEAVY_MODULES = ("google.cloud.bigquery", "google.cloud.storage", "google.cloud.pubsub_v1", "pandas", "numpy", "pyarrow")
+
+def loaded_after(setup, code, env=None):
+    """
+    Run `code` in a fresh interpreter after `setup` and return the heavy modules it loaded.
+    """
+    script = (
+        f"import sys, json\nsys.path.insert(0, {SRC_DIR!r})\n{setup}\nbefore = set(sys.modules)\n{code}\n"
+        f"print(json.dumps(sorted(m for m in set(sys.modules) - before if m in {HEAVY_MODULES!r})))"
+    )
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, env=env)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+def test_config_import_is_light():
+    assert loaded_after("", "import config") == []
+
+# Importing the pipeline creates no client, so it works without any GCP credentials
+def test_pipeline_import_needs_no_credentials(tmp_path):
+    env = {key: value for key, value in os.environ.items() if key != "GOOGLE_APPLICATION_CREDENTIALS"}
+    env["HOME"] = str(tmp_path)
+    env["CLOUDSDK_CONFIG"] = str(tmp_path)
+    loaded_after("", "import main, backfill, clients\nassert clients._bigquery_client is None and clients._storage_client is None",
+                 env=env)
+
+def test_dag_parse_is_light():
+    pytest.importorskip("airflow")
+    for dag_file in ("dag_gcs_monitoring.py", "dag_feed_events.py"):
+        path = os.path.join(DAG_DIR, dag_file)
+        code = f"exec(compile(open({path!r}).read(), {path!r}, 'exec'), {{'__name__': 'dag_module'}})"
+        assert loaded_after("import airflow.decorators, airflow.models, pytz", code) == []
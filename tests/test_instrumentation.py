@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+import instrumentation
+from instrumentation import RUN_SCOPE
+
+def test_run_metrics_per_feed_and_stage():
+    metrics = instrumentation.start_run("test-run")
+
+    def work(feed):
+        with instrumentation.timed("listing", feed=feed):
+            instrumentation.count("gcs_pages", 2)
+            instrumentation.count("gcs_objects", 100)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Workers run in a copy of the caller's context, so they record into its run
+        futures = [executor.submit(copy_context().run, work, feed) for feed in ["Web", "Media"]]
+        [future.result() for future in futures]
+    instrumentation.count("bq_jobs")
+
+    snapshot = metrics.to_dict()
+    assert snapshot["run_id"] == "test-run"
+    assert set(snapshot["timings"]) == {"Web", "Media"}
+    assert snapshot["counters"]["Web"] == {"gcs_pages": 2, "gcs_objects": 100}
+    assert snapshot["counters"][RUN_SCOPE] == {"bq_jobs": 1}
+
+    rows = metrics.to_rows()
+    assert {"run_id": "test-run", "datafeed": "Media", "metric": "gcs_objects", "value": 100.0} in rows
+    assert any(row["metric"] == "listing_seconds" for row in rows)
+
+# Runs started in separate contexts (concurrent tasks, threads) keep their own counts
+def test_concurrent_runs_are_isolated():
+    def task(run_id):
+        metrics = instrumentation.start_run(run_id)
+        for _ in range(100):
+            instrumentation.count("gcs_pages")
+        return metrics.to_dict()
+
+    outer = instrumentation.start_run("outer")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(copy_context().run, task, run_id) for run_id in ["a", "b", "c", "d"]]
+        snapshots = [future.result() for future in futures]
+
+    assert [s["counters"][RUN_SCOPE]["gcs_pages"] for s in snapshots] == [100] * 4
+    assert instrumentation.current_run() is outer and not outer.counters
@@ -0,0 +1,221 @@
+from concurrent.futures import Future
+from datetime import timedelta
+import random
+import pytest
+import time
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+import main
+from aggregator import aggregate_daily_metrics
+from analyzer import analyze_feed
+from config import FEEDS
+from size_sketch import SizeSketch
+
+def fake_collect(key, feed, upsert_start, upsert_end):
+    time.sleep(random.uniform(0, 0.02))
+    if key == "web":
+        raise RuntimeError("bucket unavailable")
+    return {upsert_end: {"file_count": 10, "total_bytes": 100_000_000, "min_size": 1, "max_size": 1}}, None
+
+def fake_send_async(messages):
+    def send(url, message):
+        messages.append(message)
+        future = Future()
+        future.set_result(True)
+        return future
+    return send
+
+# One failing feed still leaves a report row, in FEEDS order
+def test_run_isolates_feed_errors(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "query_daily_metrics", lambda start, end, labels: [])
+    upserts = []
+    messages = []
+    monkeypatch.setattr(main, "collect_feed_metrics", fake_collect)
+    monkeypatch.setattr(main, "upsert_feed_metrics_bulk", lambda rows: upserts.extend(rows) or True)
+    monkeypatch.setattr(main, "query_historical_baselines", lambda pairs: {p: (10, 100) for p in pairs})
+    monkeypatch.setattr(main, "send_alert_async", fake_send_async(messages))
+    monkeypatch.setattr(main, "insert_run_metrics", lambda rows, run_date: None)
+
+    run_metrics = main.run(slack_webhook="https://hooks.example/test", run_id="test-run")
+
+    assert run_metrics["run_id"] == "test-run"
+    assert "Media Impressions" in run_metrics["timings"]
+    assert "total" in run_metrics["timings"]["_run"]
+    assert "upsert" in run_metrics["timings"]["Media Impressions"]  # each feed ran process_feed
+
+    assert {row["feed_label"] for row in upserts} == {FEEDS[k]["label"] for k in FEEDS if k != "web"}
+    assert len(messages) == 1
+    table = messages[0].split("```")[1]
+    positions = [table.index(feed["label"]) for feed in FEEDS.values()]
+    assert positions == sorted(positions)
+    assert main.ERROR_STATUS in messages[0]
+    assert "bucket unavailable" in messages[0]
+
+# Per-feed task result feeds the fan-in report; failed feeds are reported as errors
+def test_process_feed_and_send_report(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "query_daily_metrics", lambda start, end, labels: [])
+    upserts = []
+    messages = []
+    monkeypatch.setattr(main, "collect_feed_metrics", fake_collect)
+    monkeypatch.setattr(main, "upsert_feed_metrics_bulk", lambda rows: upserts.append(rows) or True)
+    monkeypatch.setattr(main, "query_historical_baselines", lambda pairs: {p: (10, 100) for p in pairs})
+    monkeypatch.setattr(main, "send_alert_to_team", lambda url, message: messages.append(message))
+    monkeypatch.setattr(main, "insert_run_metrics", lambda rows, run_date: None)
+
+    feed_result = main.process_feed("media", run_id="test-run")
+
+    assert len(upserts) == 1 and len(upserts[0]) == 8
+    assert feed_result["feed_key"] == "media"
+    assert feed_result["result"]["status"] == "OK ✅"
+    assert "Media Impressions" in feed_result["run_metrics"]["timings"]
+
+    main.send_report([feed_result, None, {"error": "skipped"}], slack_webhook="https://hooks.example/test")
+
+    assert len(messages) == 1
+    assert "No result was produced for this feed." in messages[0]
+    assert messages[0].count(main.ERROR_STATUS) == len(FEEDS) - 1
+
+# Once seeded, the baseline cache serves the next runs without BigQuery reads, even if BigQuery is down
+def test_process_feed_uses_baseline_cache(monkeypatch, tmp_path):
+    reads = []
+    def seed_rows(start, end, labels):
+        reads.append("daily_metrics")
+        day, rows = start, []
+        while day <= end:
+            rows.append({"date": day, "datafeed": labels[0], "filecount": 10, "filesize": 100.0})
+            day += timedelta(days=1)
+        return rows
+    def unavailable(*args):
+        reads.append("unavailable")
+        raise RuntimeError("BigQuery unavailable")
+
+    monkeypatch.setattr(main, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "BASELINE_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "collect_feed_metrics", fake_collect)
+    monkeypatch.setattr(main, "query_daily_metrics", seed_rows)
+    monkeypatch.setattr(main, "query_historical_baselines", unavailable)
+    monkeypatch.setattr(main, "upsert_feed_metrics_bulk", lambda rows: True)
+    monkeypatch.setattr(main, "insert_run_metrics", lambda rows, run_date: None)
+
+    first = main.process_feed("media")
+    assert reads == ["daily_metrics"]
+
+    monkeypatch.setattr(main, "query_daily_metrics", unavailable)
+    monkeypatch.setattr(main, "upsert_feed_metrics_bulk", unavailable)
+    with pytest.raises(main.UpsertFailedError) as failed:
+        main.process_feed("media")
+    second = failed.value.feed_result
+
+    assert reads == ["daily_metrics", "unavailable"]  # only the failed upsert
+    assert second["result"]["monthly_avg_count"] == first["result"]["monthly_avg_count"]
+    assert second["run_metrics"]["counters"]["Media Impressions"]["baseline_cache_hits"] == 1
+
+# A retry of the same run resumes from the checkpoint: no relisting, no second upsert, same sketch
+def test_process_feed_resumes_from_run_state(monkeypatch, tmp_path):
+    _, _, upsert_end = main.run_window()
+    listings = []
+    upserts = []
+    def collect(key, feed, upsert_start, upsert_end):
+        listings.append(key)
+        return aggregate_daily_metrics([{"size": 1_000_000, "actual_date": upsert_end} for _ in range(10)]), None
+    def failing_analysis(*args, **kwargs):
+        raise RuntimeError("analysis failed")
+
+    monkeypatch.setattr(main, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "RUN_STATE_ENABLED", True)
+    monkeypatch.setattr(main, "collect_feed_metrics", collect)
+    monkeypatch.setattr(main, "query_daily_metrics", lambda start, end, labels: [])
+    monkeypatch.setattr(main, "upsert_feed_metrics_bulk", lambda rows: upserts.append(rows) or True)
+    monkeypatch.setattr(main, "query_historical_baselines", lambda pairs: {p: (10, 10) for p in pairs})
+    monkeypatch.setattr(main, "insert_run_metrics", lambda rows, run_date: None)
+    monkeypatch.setattr(main, "analyze_feed", failing_analysis)
+
+    with pytest.raises(RuntimeError):
+        main.process_feed("media", run_id="scheduled__2025-01-01T04:00:00+00:00")
+    assert listings == ["media"] and len(upserts) == 1
+
+    analyzed = []
+    monkeypatch.setattr(main, "analyze_feed", lambda *args, **kwargs: analyzed.append(args[1]) or analyze_feed(*args, **kwargs))
+
+    feed_result = main.process_feed("media", run_id="scheduled__2025-01-01T04:00:00+00:00")
+    assert listings == ["media"] and len(upserts) == 1
+    assert analyzed[0][upsert_end]["size_sketch"] == SizeSketch.from_sizes([1_000_000] * 10)
+    assert feed_result["result"]["status"] == "OK ✅"
+    assert feed_result["run_metrics"]["counters"]["Media Impressions"]["run_state_hits"] == 1
+    assert not list(tmp_path.glob("run_state_*"))  # removed once the feed completed
+
+# A failed MERGE fails the feed after its analysis and keeps the checkpoint: the retry only writes the rows
+def test_retry_reruns_failed_upsert(monkeypatch, tmp_path):
+    listings = []
+    upserts = []
+    analyzed = []
+    def collect(key, feed, upsert_start, upsert_end):
+        listings.append(key)
+        return fake_collect(key, feed, upsert_start, upsert_end)
+    def counted_analysis(*args, **kwargs):
+        analyzed.append(args[0])
+        return analyze_feed(*args, **kwargs)
+
+    monkeypatch.setattr(main, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "RUN_STATE_ENABLED", True)
+    monkeypatch.setattr(main, "collect_feed_metrics", collect)
+    monkeypatch.setattr(main, "query_daily_metrics", lambda start, end, labels: [])
+    monkeypatch.setattr(main, "upsert_feed_metrics_bulk", lambda rows: upserts.append(rows) or False)
+    monkeypatch.setattr(main, "query_historical_baselines", lambda pairs: {p: (10, 100) for p in pairs})
+    monkeypatch.setattr(main, "insert_run_metrics", lambda rows, run_date: None)
+    monkeypatch.setattr(main, "analyze_feed", counted_analysis)
+
+    with pytest.raises(main.UpsertFailedError) as failed:
+        main.process_feed("media", run_id="scheduled__2025-01-01T04:00:00+00:00")
+    assert failed.value.feed_result["result"]["status"] == "OK ✅"  # still reportable
+    assert main.instrumentation.current_run().counters["Media Impressions"]["upsert_failures"] == 1
+    assert list(tmp_path.glob("run_state_*"))
+
+    monkeypatch.setattr(main, "upsert_feed_metrics_bulk", lambda rows: upserts.append(rows) or True)
+    main.process_feed("media", run_id="scheduled__2025-01-01T04:00:00+00:00")
+    assert listings == ["media"] and len(upserts) == 2 and len(analyzed) == 1
+    assert not list(tmp_path.glob("run_state_*"))
+
+# run() still reports a feed whose upsert failed, then fails so the retry writes its rows
+def test_run_reports_then_fails_on_upsert_error(monkeypatch, tmp_path):
+    messages = []
+    monkeypatch.setattr(main, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "collect_feed_metrics", fake_collect)
+    monkeypatch.setattr(main, "query_daily_metrics", lambda start, end, labels: [])
+    monkeypatch.setattr(main, "upsert_feed_metrics_bulk", lambda rows: rows[0]["feed_label"] != "Media Impressions")
+    monkeypatch.setattr(main, "query_historical_baselines", lambda pairs: {p: (10, 100) for p in pairs})
+    monkeypatch.setattr(main, "send_alert_async", fake_send_async(messages))
+    monkeypatch.setattr(main, "insert_run_metrics", lambda rows, run_date: None)
+
+    with pytest.raises(RuntimeError, match="Media Impressions"):
+        main.run(slack_webhook="https://hooks.example/test", run_id="test-run")
+    assert len(messages) == 1 and messages[0].count(main.ERROR_STATUS) == 1  # only the web listing error
+
+# Rows whose upsert failed are not written through to the baseline cache
+def test_failed_upsert_not_written_to_baseline_cache(monkeypatch, tmp_path):
+    _, upsert_start, _ = main.run_window()
+    def seed_rows(start, end, labels):
+        return [{"date": start + timedelta(days=i), "datafeed": labels[0], "filecount": 10, "filesize": 100.0}
+                for i in range((end - start).days + 1)]
+    def collect(key, feed, start, end):
+        return {upsert_start: {"file_count": 1000, "total_bytes": 100_000_000, "min_size": 1, "max_size": 1}}, None
+
+    monkeypatch.setattr(main, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "BASELINE_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "collect_feed_metrics", collect)
+    monkeypatch.setattr(main, "query_daily_metrics", seed_rows)
+    monkeypatch.setattr(main, "query_historical_baselines", lambda pairs: pytest.fail("cache not used"))
+    monkeypatch.setattr(main, "upsert_feed_metrics_bulk", lambda rows: False)
+    monkeypatch.setattr(main, "insert_run_metrics", lambda rows, run_date: None)
+
+    with pytest.raises(main.UpsertFailedError) as failed:
+        main.process_feed("media")
+    assert failed.value.feed_result["result"]["monthly_avg_count"] == 10
+
+    monkeypatch.setattr(main, "upsert_feed_metrics_bulk", lambda rows: True)
+    written = main.process_feed("media")
+    assert written["result"]["monthly_avg_count"] > 10
@@ -0,0 +1,75 @@
+from datetime import date, timedelta
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+from manifest import ListingManifest
+from size_sketch import SizeSketch
+
+def make_file(name, size, generation):
+    return {"name": name, "size": size, "generation": generation}
+
+# Only new, recent or flagged partitions are listed again
+def test_partitions_to_list(tmp_path):
+    today = date(2025, 3, 1)
+    old_day, recent_day, new_day = today - timedelta(days=12), today - timedelta(days=2), today - timedelta(days=11)
+    manifest = ListingManifest(str(tmp_path / "manifest.json.gz"))
+    manifest.update_partition("web", old_day, [make_file("a", 10, 1)])
+    manifest.update_partition("web", recent_day, [make_file("b", 10, 1)])
+
+    assert manifest.partitions_to_list("web", [old_day, new_day, recent_day], today, 5) == [new_day, recent_day]
+
+    manifest.mark_changed("web", old_day)
+    assert manifest.partitions_to_list("web", [old_day], today, 5) == [old_day]
+
+# Re-listing a partition reports the files added, removed and rewritten since the previous listing
+def test_update_partition_diff(tmp_path):
+    day = date(2025, 3, 1)
+    manifest = ListingManifest(str(tmp_path / "manifest.json.gz"))
+    assert manifest.update_partition("web", day, [make_file("a", 10, 1), make_file("b", 20, 1)]) is None
+    assert manifest.update_partition("web", day, [make_file("b", 20, 1), make_file("a", 10, 1)]) is None
+
+    # b replaced by c (same count) and a rewritten
+    diff = manifest.update_partition("web", day, [make_file("a", 10, 2), make_file("c", 30, 1)])
+    assert diff == {"date": "2025-03-01", "file_count": [2, 2], "total_bytes": [30, 40],
+                    "added": 1, "removed": 1, "rewritten": 1}
+
+    manifest.save()
+    manifest = ListingManifest.load(manifest.path)
+    diff = manifest.update_partition("web", day, [make_file("a", 10, 3), make_file("c", 30, 1), make_file("d", 1, 1)])
+    assert (diff["added"], diff["removed"], diff["rewritten"]) == (1, 0, 1)
+    assert manifest.get_daily_metrics("web", day) == {"file_count": 3, "total_bytes": 41, "min_size": 1, "max_size": 30,
+                                                    "size_sketch": SizeSketch.from_sizes([1, 10, 30])}
+
+# Notifications newer than the last listing flag the partition, which the next run lists again
+def test_changed_partitions_flagged_from_events(monkeypatch, tmp_path):
+    import main
+    from feed_events import FeedEventCounters, counters_path
+    today = date.today()
+    old_day, other_day = today - timedelta(days=12), today - timedelta(days=11)
+    manifest = ListingManifest(str(tmp_path / "manifest.json.gz"))
+    manifest.update_partition("web", old_day, [make_file("a", 10, 100)])
+    manifest.update_partition("web", other_day, [make_file("b", 10, 100)])
+
+    counters = FeedEventCounters(counters_path(str(tmp_path), "web"), "web")
+    counters.seed_partition(old_day, [make_file("a", 10, 100), make_file("late", 10, 200)])
+    counters.seed_partition(other_day, [make_file("b", 10, 100)])
+    counters.save()
+
+    monkeypatch.setattr(main, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "EVENT_TRACKING_ENABLED", True)
+    main.flag_changed_partitions("web", manifest, [old_day, other_day])
+    assert manifest.partitions_to_list("web", [old_day, other_day], today, 7) == [old_day]
+
+def test_manifest_roundtrip_and_evict(tmp_path):
+    path = str(tmp_path / "state" / "manifest.json.gz")
+    manifest = ListingManifest(path)
+    manifest.update_partition("web", date(2025, 1, 1), [make_file("a", 10, 1)])
+    manifest.update_partition("web", date(2025, 3, 1), [make_file("b", 10, 1)])
+    manifest.evict(date(2025, 2, 1))
+    manifest.save()
+
+    loaded = ListingManifest.load(path)
+    assert loaded.get_daily_metrics("web", date(2025, 1, 1)) is None
+    assert loaded.get_daily_metrics("web", date(2025, 3, 1))["file_count"] == 1
+    assert loaded.feeds["web"]["2025-03-01"]["max_generation"] == 1
@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+import metrics_store
+from metrics_store import SQLiteMetricsStore
+from analyzer import analyze_feed, STATUS_OK
+
+def make_row(feed_label, event_date, file_count=10, file_size=100.0, row_count=None):
+    return {"feed_label": feed_label, "event_date": event_date, "file_count": file_count, "file_size": file_size,
+            "row_count": row_count}
+
+# Upserts behave like the MERGE: last row wins and a NULL row count keeps the stored one
+def test_sqlite_upsert_semantics(tmp_path):
+    store = SQLiteMetricsStore(str(tmp_path / "history.sqlite"))
+    day = date(2025, 1, 1)
+    store.upsert_feed_metrics_bulk([make_row("Web", day, 1, row_count=500), make_row("Geo", day, 3)])
+    store.upsert_feed_metrics_bulk([make_row("Web", day, 2), make_row("Web", day, 4)])
+
+    rows = SQLiteMetricsStore(store.path).query_daily_metrics(day, day, ["Web"])
+    assert rows == [{"date": day, "datafeed": "Web", "filecount": 4, "filesize": 100.0, "rowcount": 500,
+                     "sizesketch": None}]
+    assert len(store.query_daily_metrics(day, day)) == 2
+
+# Baselines average the rows present in each window, like the BigQuery AVG
+def test_sqlite_baselines():
+    store = SQLiteMetricsStore(":memory:")
+    expected_date = date(2025, 2, 1)
+    store.upsert_feed_metrics_bulk([
+        make_row("Web", expected_date - timedelta(days=i), file_count=i, file_size=2.0 * i) for i in range(1, 40)
+    ])
+
+    baselines = store.query_historical_baselines([("Web", expected_date), ("Geo", expected_date)])
+    start, end = metrics_store.baseline_window(expected_date)
+    count = (end - start).days + 1
+    first = (expected_date - end).days
+    assert baselines[("Web", expected_date)] == (first + (count - 1) / 2, 2 * first + (count - 1))
+    assert baselines[("Geo", expected_date)] == (0.0, 0.0)
+
+# The analyzer reads its baseline from the configured store, no BigQuery needed
+def test_analyze_feed_with_local_store(monkeypatch):
+    store = SQLiteMetricsStore(":memory:")
+    today = date(2025, 3, 1)
+    store.upsert_feed_metrics_bulk([make_row("Web", today - timedelta(days=i), 10, 100.0) for i in range(1, 40)])
+    monkeypatch.setattr(metrics_store, "_store", store)
+
+    daily_metrics = {today: {"file_count": 10, "total_bytes": 100_000_000, "min_size": 1, "max_size": 1}}
+    result = analyze_feed("Web", daily_metrics, today)
+    assert result["status"] == STATUS_OK
+    assert result["monthly_avg_count"] == 10
+
+# A backend missing part of the interface fails when it is created, not in the middle of a run
+def test_incomplete_store_cannot_be_instantiated():
+    class UpsertOnlyStore(metrics_store.MetricsStore):
+        def ensure_table(self):
+            return True
+
+        def upsert_feed_metrics_bulk(self, rows):
+            return True
+
+    with pytest.raises(TypeError):
+        UpsertOnlyStore()
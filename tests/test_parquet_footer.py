@@ -0,0 +1,136 @@
+from datetime import date, timedelta
+import io
+import pytest
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+from parquet_footer import FooterCache, inspect_footers, read_footer, InvalidParquetFile
+from analyzer import analyze_feed, STATUS_CRITICAL, STATUS_WARNING
+
+class FakeBlob:
+    def __init__(self, data, reads):
+        self.data = data
+        self.reads = reads
+
+    def download_as_bytes(self, start=None, end=None):
+        self.reads.append((start, end))
+        return self.data[start:end + 1]
+
+class FakeStorageClient:
+    def __init__(self, objects):
+        self.objects = objects
+        self.reads = []
+
+    def bucket(self, name):
+        return self
+
+    def blob(self, name, generation=None):
+        return FakeBlob(self.objects[name], self.reads)
+
+def make_parquet(num_rows, columns=("a", "b")):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+    buffer = io.BytesIO()
+    table = pa.table({column: list(range(num_rows)) for column in columns})
+    pq.write_table(table, buffer, row_group_size=max(1, num_rows // 3))
+    return buffer.getvalue()
+
+# Row count and schema come from a ranged read of the footer only
+def test_read_footer_matches_pyarrow():
+    data, renamed = make_parquet(900), make_parquet(900, ("a", "c"))
+    client = FakeStorageClient({"f.parquet": data, "g.parquet": renamed})
+
+    info = read_footer(client, "bucket", "f.parquet", 1, len(data))
+
+    assert info["num_rows"] == 900
+    assert info["num_row_groups"] == 3
+    assert client.reads == [(max(0, len(data) - 64 * 1024), len(data) - 1)]
+    other = read_footer(client, "bucket", "g.parquet", 1, len(renamed))
+    assert other["schema_fingerprint"] != info["schema_fingerprint"]
+
+# Large footers are completed with a second read
+def test_read_footer_second_read(monkeypatch):
+    monkeypatch.setattr("parquet_footer.FOOTER_READ_BYTES", 16)
+    data = make_parquet(50)
+    client = FakeStorageClient({"f.parquet": data})
+
+    assert read_footer(client, "bucket", "f.parquet", 1, len(data))["num_rows"] == 50
+    assert len(client.reads) == 2
+
+# Truncated objects are reported as unreadable and cached so they are not read again
+def test_inspect_footers_cache(tmp_path):
+    good, truncated = make_parquet(10), make_parquet(10)[:-100]
+    client = FakeStorageClient({"good": good, "truncated": truncated})
+    objects = {"good": [1, len(good)], "truncated": [1, len(truncated)]}
+    cache = FooterCache(str(tmp_path / "footers.json.gz"))
+
+    results = inspect_footers(client, "bucket", objects, cache)
+    assert results["good"]["num_rows"] == 10
+    assert results["truncated"] is None
+    cache.save()
+
+    client.reads.clear()
+    cached = inspect_footers(client, "bucket", objects, FooterCache.load(cache.path))
+    assert client.reads == []
+    assert cached == {name: info and {k: info[k] for k in ("num_rows", "schema_fingerprint")}
+                      for name, info in results.items()}
+
+    # A new generation is read again
+    objects["good"] = [2, len(good)]
+    inspect_footers(client, "bucket", objects, FooterCache.load(cache.path))
+    assert len(client.reads) == 1
+
+def test_read_footer_rejects_non_parquet():
+    with pytest.raises(InvalidParquetFile):
+        read_footer(FakeStorageClient({"x.csv": b"a,b\n1,2\n" * 10}), "bucket", "x.csv", 1, 80)
+
+# Files without rows are critical, a changed layout is a warning
+def test_analyze_feed_row_checks():
+    today = date(2025, 3, 10)
+    yesterday = today - timedelta(days=1)
+    daily_metrics = {
+        yesterday: {"file_count": 10, "total_bytes": 10_000_000, "row_count": 500, "schema_fingerprints": ["a"]},
+        today: {"file_count": 10, "total_bytes": 10_000_000, "row_count": 0, "schema_fingerprints": ["a"]},
+    }
+    result = analyze_feed("TestFeed", daily_metrics, today, baseline=(10, 10))
+    assert result["status"] == STATUS_CRITICAL
+    assert "Files contain no rows." in result["issues"]
+
+    daily_metrics[today].update(row_count=480, schema_fingerprints=["b"])
+    result = analyze_feed("TestFeed", daily_metrics, today, baseline=(10, 10))
+    assert result["status"] == STATUS_WARNING
+    assert result["row_count"] == 480
+    assert any(issue.startswith("Schema changed") for issue in result["issues"])
+
+# Footers that could not be fetched leave the day's row count unknown, never a partial sum or 0
+def test_row_counts_unknown_when_footers_missing(monkeypatch, tmp_path):
+    import main
+    day, other = date(2025, 3, 10), date(2025, 3, 9)
+    feed = {"label": "Web", "bucket": "bucket", "prefix": "p/", "row_counts": True}
+    objects = {day: {"a": [1, 10], "b": [1, 10]}, other: {"c": [1, 10]}}
+    monkeypatch.setattr(main, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "get_storage_client", lambda: None)
+    monkeypatch.setattr(main, "inspect_footers", lambda *args: {"a": {"num_rows": 5, "schema_fingerprint": "x"},
+                                                                  "c": {"num_rows": 7, "schema_fingerprint": "x"}})
+
+    # The objects are recorded from the same listing the totals are aggregated from
+    def collect(key, feed, start, end, collectors):
+        listing = [{"name": name, "generation": generation, "size": size, "actual_date": d}
+                   for d in objects for name, (generation, size) in objects[d].items()]
+        return main.aggregate_daily_metrics(main.wrap_listing(collectors, listing, list(objects))), None
+    monkeypatch.setattr(main, "collect_daily_metrics", collect)
+    monkeypatch.setattr(main, "iter_partition_metadata", lambda *args, **kwargs: pytest.fail("window listed twice"))
+    monkeypatch.setattr(main, "load_checksum_index", lambda key: None)
+
+    daily_metrics, _ = main.collect_feed_metrics("web", feed, other, day)
+    assert daily_metrics[day]["row_count"] is None
+    assert daily_metrics[other]["row_count"] == 7
+    rows = main.build_metric_rows(feed, daily_metrics, other - timedelta(days=1), day)
+    assert [row["row_count"] for row in rows] == [None, 7, None]
+
+    def unavailable(*args):
+        raise RuntimeError("storage unavailable")
+    monkeypatch.setattr(main, "inspect_footers", unavailable)
+    daily_metrics, _ = main.collect_feed_metrics("web", feed, other, day)
+    assert all(totals.get("row_count") is None for totals in daily_metrics.values())
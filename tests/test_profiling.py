@@ -0,0 +1,70 @@
+import json
+import requests
+from requests.adapters import BaseAdapter
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+import profiling
+from profiling import profile_run, profiling_enabled
+
+class StubAdapter(BaseAdapter):
+    """
+    Answers every request with an empty 200, without any network.
+    """
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response._content = b"{}"
+        return response
+
+    def close(self):
+        pass
+
+def test_profiling_enabled(monkeypatch):
+    monkeypatch.delenv(profiling.PROFILE_ENV_VAR, raising=False)
+    assert not profiling_enabled()
+    assert profiling_enabled("True") and not profiling_enabled("false")
+    monkeypatch.setenv(profiling.PROFILE_ENV_VAR, "1")
+    assert profiling_enabled()
+    assert not profiling_enabled(False)
+
+# A profiled block writes its samples, allocations and per-service call latencies
+def test_profile_run_writes_artifacts(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILING_DIR", str(tmp_path))
+    original_request = requests.Session.request
+    session = requests.Session()
+    session.mount("https://", StubAdapter())
+
+    with profile_run("scheduled__2025-01-01T04:00:00+00:00", "media", enabled="true") as profile:
+        assert profile is not None
+        for _ in range(3):
+            session.get("https://storage.googleapis.com/storage/v1/b/bucket/o")
+        session.post("https://bigquery.googleapis.com/bigquery/v2/projects/p/queries")
+        blocks = [bytearray(100_000) for _ in range(50)]
+        with profile_run("nested", "web", enabled=True) as nested:
+            assert nested is None  # one profile at a time
+        deadline = profile.sampler.samples + 5
+        while profile.sampler.samples < deadline:
+            sum(range(10_000))
+
+    assert requests.Session.request is original_request
+    location = tmp_path / "scheduled__2025-01-01T04_00_00_00_00" / "media"
+    summary = json.loads((location / "summary.json").read_text())
+    assert summary["call_latencies"]["gcs"]["calls"] == 3
+    assert summary["call_latencies"]["bigquery"]["calls"] == 1
+    assert summary["samples"] >= 5 and summary["traced_memory_peak_mb"] >= 5
+    assert "test_profile_run_writes_artifacts" in (location / "stack_samples.folded").read_text()
+    assert "test_profiling.py" in (location / "memory_top.txt").read_text()
+    assert len(blocks) == 50
+
+# Disabled, nothing is patched or written
+def test_profile_run_disabled(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILING_DIR", str(tmp_path))
+    original_request = requests.Session.request
+    with profile_run("run", "run", enabled=False) as profile:
+        assert profile is None
+        assert requests.Session.request is original_request
+    assert not list(tmp_path.iterdir())
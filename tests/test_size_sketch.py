@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+import random
+import numpy as np
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+from size_sketch import SizeSketch, bucket_index, bucket_indices, bucket_bounds
+from aggregator import aggregate_daily_metrics
+from analyzer import analyze_feed, STATUS_WARNING
+
+# Vectorized and scalar bucketing agree, and every size falls inside its bucket
+def test_buckets():
+    rng = random.Random(7)
+    sizes = [0, 1, 15, 16, 17, 2**40 + 5, 2**53 + 1, 2**62 + 12345] + [rng.randrange(0, 2**50) for _ in range(5000)]
+    assert bucket_indices(np.array(sizes, dtype=np.int64)).tolist() == [bucket_index(size) for size in sizes]
+    for size in sizes:
+        low, high = bucket_bounds(bucket_index(size))
+        assert low <= size <= high
+
+# Quantiles are within the bucket error, and merged sketches equal one sketch of all sizes
+def test_quantiles_merge_and_serialize():
+    rng = random.Random(3)
+    first = [rng.randrange(1_000, 100_000_000) for _ in range(10_000)]
+    second = [rng.randrange(1_000, 100_000_000) for _ in range(10_000)]
+
+    merged = SizeSketch.from_sizes(first).merge(SizeSketch.from_sizes(second))
+    assert merged == SizeSketch.from_sizes(first + second)
+    assert merged == SizeSketch.from_array(np.array(first + second))
+
+    exact = sorted(first + second)
+    for q in (0.5, 0.99):
+        assert abs(merged.quantile(q) / exact[int(q * len(exact)) - 1] - 1) < 0.07
+
+    serialized = merged.serialize()
+    assert len(serialized) < 1000
+    assert SizeSketch.deserialize(serialized) == merged
+
+# Same totals, but thousands of tiny files instead of ten large ones
+def test_analyze_feed_size_shift():
+    today = date(2025, 3, 10)
+    files = [{"size": 100_000_000, "actual_date": today - timedelta(days=i)} for i in range(1, 4) for _ in range(10)]
+    files += [{"size": 1_000_000_000 // 2000, "actual_date": today} for _ in range(2000)]
+
+    result = analyze_feed("TestFeed", aggregate_daily_metrics(files), today, baseline=(2000, 1000))
+    assert result["status"] == STATUS_WARNING
+    assert any(issue.startswith("Median file size changed") for issue in result["issues"])
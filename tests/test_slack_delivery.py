@@ -0,0 +1,97 @@
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+import requests
+import alert_team
+from alert_team import SlackDelivery, split_message
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, text=""):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = text
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.posts = []
+
+    def post(self, url, data=None, timeout=None):
+        self.posts.append((url, data, timeout))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+# Chunks respect the size limit and keep code blocks closed
+def test_split_message_keeps_code_blocks():
+    table = "\n".join(f"| feed {i:03d} | OK |" for i in range(200))
+    message = f"*Feed Status Overview:*\n```\n{table}\n```\nFooter"
+    chunks = split_message(message, max_chars=500)
+
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert all(chunk.count("```") % 2 == 0 for chunk in chunks)
+    assert "".join(chunks).count("| OK |") == 200
+    assert split_message("short") == ["short"]
+
+# 429 waits for Retry-After, 5xx and connection errors back off, and delivered chunks are not re-posted
+def test_slack_delivery_retries_and_suppresses(tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(alert_team.time, "sleep", sleeps.append)
+    session = FakeSession([
+        FakeResponse(429, {"Retry-After": "3"}),
+        requests.ConnectionError("reset"),
+        FakeResponse(503),
+        FakeResponse(200),
+    ])
+    delivery = SlackDelivery("https://hooks.example/test", suppression_path=str(tmp_path / "sent.json"),
+                             session=session, timeout=5)
+
+    assert delivery.send("report")
+    assert len(session.posts) == 4
+    assert sleeps == [3.0, 4, 8]
+    assert all(timeout == 5 for _, _, timeout in session.posts)
+
+    # Airflow retry of the same report
+    assert delivery.send("report")
+    assert len(session.posts) == 4
+
+    session.responses = [FakeResponse(400, text="invalid_payload")]
+    assert not delivery.send("another report")
+    assert len(session.posts) == 5
+
+# A missing webhook is skipped instead of failing
+def test_send_alert_without_webhook():
+    assert alert_team.send_alert_to_team(None, "report") is False
+
+# Suppression is keyed on the whole message: a retry resumes after the delivered chunks, repeated
+# chunks of one message are all posted, and a changed report is posted in full
+def test_slack_suppression_keyed_on_message(tmp_path, monkeypatch):
+    monkeypatch.setattr(alert_team.time, "sleep", lambda seconds: None)
+    line = "x" * 90
+    message = "\n".join([line] * 4)
+    session = FakeSession([FakeResponse(200), FakeResponse(400), FakeResponse(200)])
+    delivery = SlackDelivery("https://hooks.example/test", suppression_path=str(tmp_path / "sent.json"),
+                             session=session, max_chars=100)
+
+    assert not delivery.send(message)
+    assert len(session.posts) == 2
+
+    # The retry only posts the chunks that were not delivered
+    session.responses = [FakeResponse(200), FakeResponse(200), FakeResponse(200)]
+    assert delivery.send(message)
+    assert len(session.posts) == 5
+
+    # Same first chunks, different report: every chunk is posted
+    session.responses = [FakeResponse(200)] * 5
+    assert delivery.send(message + "\nchanged")
+    assert len(session.posts) == 10
+
+# Retry-After may be seconds or an HTTP date; anything else falls back to the backoff
+def test_parse_retry_after():
+    assert alert_team.parse_retry_after("3", 8) == 3.0
+    assert alert_team.parse_retry_after(None, 8) == 8
+    assert alert_team.parse_retry_after("soon", 8) == 8
+    assert alert_team.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT", 8) == 0.0
@@ -0,0 +1,25 @@
+from datetime import date
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../dags/raw_data_monitoring/src')))
+
+from utils import extract_actual_date, parse_partition_dates
+
+# Batch parser agrees with extract_actual_date and counts failures instead of printing
+def test_parse_partition_dates_matches_extract(capsys):
+    names = [
+        "feed/year=2025/month=01/day=02/a.parquet",
+        "feed/year=2025/month=01/day=02/b.parquet",
+        "feed/year=2025/month=02/day=30/a.parquet",
+        "feed/year=2025/month=01/day=03",
+        "feed/year=2025_$folder$",
+        "feed/manifest.json",
+        "feed/year=2025/",
+    ]
+    ordinals, summary = parse_partition_dates(names)
+
+    assert capsys.readouterr().out == ""
+    expected = [extract_actual_date(name) for name in names]
+    assert ordinals == [d.toordinal() if d else None for d in expected]
+    assert ordinals[0] == date(2025, 1, 2).toordinal()
+    assert summary == {"parsed": 3, "no_date": 1, "invalid_date": 1}